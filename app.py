@@ -1,29 +1,314 @@
+import asyncio
 import os
+import threading
+import time
 import traceback
+from typing import List, Optional
 
-from flask import Flask, render_template
+from flask import Flask, Response, render_template, request
 
+from service.auxiliary.admission import AdmissionController, Rejection
+from service.auxiliary.profiling import StackSampler
+from storage.auxiliary.timing import PhaseTimer, start_timing
+from storage.core.models.prefix_shard import OutOfShardError, PrefixShard
+from storage.core.models.range_provider import PwnedRangeProvider
+from storage.implementations.binary_range import MEDIA_TYPE as BINARY_RANGE_MEDIA_TYPE
+from storage.implementations.binary_range import encode_range
 from storage.implementations.pwned_storage import PwnedStorage
 
 
+def get_read_through_provider() -> Optional[PwnedRangeProvider]:
+    """
+    Get the provider of ranges missing in the storage based on the environment.
+
+    READ_THROUGH_URL sets the range API URL (of the upstream or a peer instance, e.g.
+    http://peer:5000/range/), READ_THROUGH_FILE sets a file with sorted hashes.
+
+    :return: The read-through provider or None if read-through mode is disabled.
+    """
+    # Providers are imported on demand, so serving processes load only what they use.
+    if os.getenv("READ_THROUGH_URL"):
+        from storage.implementations.requester import PwnedRequester
+
+        return PwnedRequester(os.environ["READ_THROUGH_URL"])
+    if os.getenv("READ_THROUGH_FILE"):
+        from storage.implementations.file_range_provider import FileRangeImporter
+
+        return FileRangeImporter(os.environ["READ_THROUGH_FILE"])
+    return None
+
+
+def get_dump_provider() -> Optional[PwnedRangeProvider]:
+    """
+    Get the provider serving ranges directly from a dump file based on the environment.
+
+    DUMP_FILE sets a file with sorted hashes (in the format of the official pwned
+    passwords downloader). Its offset index must be built in advance with
+    the index_dump script, so workers do not scan the dump at start.
+
+    :return: The dump provider or None if ranges are served from the storage.
+    :raises RuntimeError: If the index of the dump is missing or outdated.
+    """
+    if not os.getenv("DUMP_FILE"):
+        return None
+    from storage.implementations.dump_range_provider import DumpRangeProvider
+
+    return DumpRangeProvider(os.environ["DUMP_FILE"], build_index=False)
+
+
+def get_shard_forwarder() -> Optional[PwnedRangeProvider]:
+    """
+    Get the provider of ranges that do not belong to the shard of the storage.
+
+    SHARD_FORWARD_URL sets the range API URL to forward such requests to
+    (e.g. the one of the shard router), otherwise they are rejected.
+
+    :return: The forwarding provider or None if forwarding is disabled.
+    """
+    if not os.getenv("SHARD_FORWARD_URL"):
+        return None
+    from storage.implementations.requester import PwnedRequester
+
+    return PwnedRequester(os.environ["SHARD_FORWARD_URL"], prefix_deadline_seconds=5)
+
+
+def get_warm_up_prefixes() -> List[str]:
+    """
+    Get the hash prefixes to be preloaded before the app reports readiness.
+
+    WARMUP_PREFIXES sets a file with one hash prefix per line.
+
+    :return: The hash prefixes.
+    """
+    if not os.getenv("WARMUP_PREFIXES"):
+        return []
+    with open(os.environ["WARMUP_PREFIXES"], "r") as file:
+        return [line.strip() for line in file if line.strip()]
+
+
+def get_admission_controller() -> AdmissionController:
+    """
+    Get the admission controller of the range endpoint based on the environment.
+
+    MAX_IN_FLIGHT limits the number of requests processed at once, MAX_QUEUE and
+    QUEUE_TIMEOUT_SECONDS limit the number of waiting requests and their wait time,
+    CLIENT_RATE_LIMIT and CLIENT_RATE_BURST set the token bucket of every client.
+
+    :return: The admission controller (not limiting anything by default).
+    """
+    client_rate = float(os.getenv("CLIENT_RATE_LIMIT", "0"))
+    return AdmissionController(
+        int(os.getenv("MAX_IN_FLIGHT", "0")),
+        int(os.getenv("MAX_QUEUE", "0")),
+        float(os.getenv("QUEUE_TIMEOUT_SECONDS", "1")),
+        client_rate,
+        int(os.getenv("CLIENT_RATE_BURST", str(max(1, int(client_rate))))),
+    )
+
+
+def is_authorized_admin() -> bool:
+    """
+    Check if the current request is made by an administrator.
+
+    ADMIN_TOKEN sets the bearer token of administrators, admin endpoints are
+    disabled without it.
+
+    :return: True if the request has the admin token, False otherwise.
+    """
+    token = os.getenv("ADMIN_TOKEN")
+    return bool(token) and request.headers.get("Authorization") == f"Bearer {token}"
+
+
 def create_app():
     app = Flask(__name__, template_folder="templates")
 
     storage_path = os.getenv("RESOURCE_DIR", "/tmp/pwned-storage")
-    storage = PwnedStorage(storage_path)
+    storage = PwnedStorage(
+        storage_path,
+        read_through_provider=get_read_through_provider(),
+        cache_size=int(os.getenv("RANGE_CACHE_SIZE", "0")),
+        shard=PrefixShard.parse(os.environ["SHARD"]) if os.getenv("SHARD") else None,
+        track_access=os.getenv("ACCESS_TRACKING", "0") != "0",
+    )
+    shard_forwarder = get_shard_forwarder()
+    dump_provider = get_dump_provider()
+    if os.getenv("READ_THROUGH_FILL"):
+        threading.Thread(
+            target=lambda: asyncio.run(storage.fill()), daemon=True
+        ).start()
+
+    admission = get_admission_controller()
+    is_server_timing_enabled = os.getenv("SERVER_TIMING") == "1"
+    is_warmed_up = threading.Event()
+
+    def warm_up() -> None:
+        try:
+            prefixes = get_warm_up_prefixes()
+            if prefixes and storage.active_dataset is not None:
+                to_cache = os.getenv("WARMUP_TARGET") == "cache"
+                asyncio.run(storage.warm_up(prefixes, to_cache))
+        except Exception:
+            traceback.print_exc()
+        finally:
+            is_warmed_up.set()
+
+    threading.Thread(target=warm_up, daemon=True).start()
 
     @app.route("/")
     def home():
         return render_template("client-page.html")
 
+    def get_range_headers(
+        content_type: str, timer: Optional[PhaseTimer], request_ts: float
+    ) -> dict:
+        headers = {"Content-Type": content_type, "Vary": "Accept"}
+        if timer is not None:
+            timer.measure("total", request_ts)
+            headers["Server-Timing"] = timer.to_server_timing()
+        return headers
+
     @app.route("/range/<prefix>")
     async def prefix_search(prefix):
+        request_ts = time.perf_counter()
+        timer = start_timing() if is_server_timing_enabled else None
         try:
-            response = await storage.get_range(prefix)
-            return response, 200, {"Content-Type": "text/plain"}
+            # Blocks only this request: every async view runs in its own event loop.
+            admission.acquire(request.remote_addr or "")
+        except Rejection as rejection:
+            headers = {
+                "Content-Type": "text/plain",
+                "Retry-After": str(rejection.retry_after_seconds),
+            }
+            return str(rejection), rejection.status_code, headers
+        if timer is not None:
+            timer.measure("admission", request_ts)
+        try:
+            is_binary = request.args.get("format") == "binary" or (
+                request.accept_mimetypes.best_match(
+                    ["text/plain", BINARY_RANGE_MEDIA_TYPE]
+                )
+                == BINARY_RANGE_MEDIA_TYPE
+            )
+            content_type = BINARY_RANGE_MEDIA_TYPE if is_binary else "text/plain"
+            if dump_provider is not None:
+                response = await dump_provider.get_range(prefix.upper())
+                if is_binary:
+                    response = encode_range(response)
+            elif is_binary:
+                response = await storage.get_binary_range(prefix)
+            else:
+                response = await storage.get_range(prefix)
+            return response, 200, get_range_headers(content_type, timer, request_ts)
+        except OutOfShardError:
+            if shard_forwarder is None:
+                return "Misdirected prefix", 421, {"Content-Type": "text/plain"}
+            try:
+                response = await shard_forwarder.get_range(prefix.upper())
+            except Exception:
+                traceback.print_exc()
+                return "Shard unavailable", 502, {"Content-Type": "text/plain"}
+            if is_binary:
+                response = encode_range(response)
+            return response, 200, get_range_headers(content_type, timer, request_ts)
         except Exception:
             traceback.print_exc()
             return "Bad prefix", 400, {"Content-Type": "text/plain"}
+        finally:
+            admission.release()
+
+    @app.route("/healthz")
+    def healthz():
+        return "OK", 200, {"Content-Type": "text/plain"}
+
+    @app.route("/readyz")
+    def readyz():
+        state = {
+            "dataset": "dump" if dump_provider else storage.active_dataset,
+            "shard": str(storage.shard),
+            "generation": storage.generation,
+            "partial": storage.is_partial,
+            "warmed_up": is_warmed_up.is_set(),
+        }
+        is_ready = state["dataset"] is not None and state["warmed_up"]
+        return state, 200 if is_ready else 503
+
+    @app.route("/stats")
+    def stats():
+        coalescing = storage.coalescing_statistics
+        return {
+            "generation": storage.generation,
+            "coalescing": {
+                "requests": coalescing.request_number,
+                "reads": coalescing.read_number,
+                "coalesced": coalescing.coalesced_request_number,
+                "failed_reads": coalescing.failed_read_number,
+                "in_flight_reads": coalescing.in_flight_read_number,
+            },
+            "admission": admission.statistics,
+        }
+
+    @app.route("/access")
+    async def access():
+        if not os.getenv("ADMIN_TOKEN"):
+            return "Not found", 404, {"Content-Type": "text/plain"}
+        if not is_authorized_admin():
+            return "Unauthorized", 401, {"Content-Type": "text/plain"}
+        top = request.args.get("top", type=int)
+        # Merging and ranking all counts takes a while, so it runs off the event loop.
+        counts = await asyncio.to_thread(
+            lambda: storage.get_access_counts(None if top is None else max(top, 0))
+        )
+        lines = ["prefix,count\n"] + [f"{prefix},{count}\n" for prefix, count in counts]
+        return "".join(lines), 200, {"Content-Type": "text/csv"}
+
+    @app.route("/changes")
+    def changes():
+        since_generation = request.args.get("since", type=int)
+        if since_generation is None:
+            return (
+                "The since generation is required",
+                400,
+                {"Content-Type": "text/plain"},
+            )
+        change_set = storage.get_changes(since_generation)
+        if change_set is None:
+            # The consumer has to refetch everything.
+            return "The changes are not recorded", 410, {"Content-Type": "text/plain"}
+        lines = ["prefix,digest\n"] + [
+            f"{prefix},{digest or ''}\n" for prefix, digest in change_set.changes
+        ]
+        headers = {
+            "Content-Type": "text/csv",
+            "X-Generation": str(change_set.generation),
+        }
+        return "".join(lines), 200, headers
+
+    @app.route("/admin/profile")
+    def profile():
+        if not os.getenv("ADMIN_TOKEN"):
+            return "Not found", 404, {"Content-Type": "text/plain"}
+        if not is_authorized_admin():
+            return "Unauthorized", 401, {"Content-Type": "text/plain"}
+        seconds = min(request.args.get("seconds", 10, type=float), 60)
+        # Samples all threads of this worker process only, including concurrent
+        # requests; other workers are not profiled, so the pid is reported.
+        sampler = StackSampler()
+        sampler.sample_for(seconds)
+        headers = {"Content-Type": "text/plain", "X-Profiled-Pid": str(os.getpid())}
+        return sampler.to_folded(), 200, headers
+
+    @app.route("/snapshot")
+    def snapshot():
+        if not os.getenv("ADMIN_TOKEN"):
+            return "Not found", 404, {"Content-Type": "text/plain"}
+        if not is_authorized_admin():
+            return "Unauthorized", 401, {"Content-Type": "text/plain"}
+        try:
+            chunks = storage.export_snapshot()
+        except Exception:
+            traceback.print_exc()
+            return "No active dataset", 503, {"Content-Type": "text/plain"}
+        return Response(chunks, 200, {"Content-Type": "application/octet-stream"})
 
     return app
 
@@ -0,0 +1,46 @@
+import argparse
+import asyncio
+import os
+
+from devops_cli.auxiliary import programs
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(
+        description="Audit passwords against Pwned leak record storage."
+    )
+    parser.add_argument(
+        "resource_dir",
+        type=str,
+        help="The directory where the storage data is stored.",
+    )
+    parser.add_argument(
+        "input",
+        type=str,
+        help="The file with one password (or SHA-1 hash, see --hashes) per line.",
+    )
+    parser.add_argument(
+        "report",
+        type=str,
+        help="The CSV file to write the leaked entries to (line, hash, count).",
+    )
+    parser.add_argument(
+        "-s",
+        "--hashes",
+        action="store_true",
+        help="Whether the input file contains SHA-1 hashes instead of passwords.",
+    )
+    parser.add_argument(
+        "-p",
+        "--processes",
+        type=int,
+        default=os.cpu_count() or 1,
+        help="The number of processes to be used for hashing passwords."
+        " Default: the number of CPUs.",
+    )
+
+    args = parser.parse_args()
+    asyncio.run(
+        programs.audit_passwords(
+            args.resource_dir, args.input, args.report, args.hashes, args.processes
+        )
+    )
@@ -0,0 +1,154 @@
+import asyncio
+import hashlib
+from concurrent.futures import ProcessPoolExecutor
+from typing import List, Tuple
+
+import numpy as np
+
+from storage.auxiliary.pwned.model import PWNED_PREFIX_LENGTH
+from storage.implementations.pwned_storage import PwnedStorage
+
+HASH_LENGTH = 40
+HASH_CHUNK_SIZE = 100_000
+WINDOW_RANGE_NUMBER = 4096
+READER_NUMBER = 8
+
+
+def hash_passwords(passwords: List[str]) -> bytes:
+    """
+    Hash passwords with SHA-1.
+
+    :param passwords: The passwords.
+    :return: The concatenated upper-case hex digests.
+    """
+    return (
+        "".join(
+            hashlib.sha1(password.encode("utf-8")).hexdigest() for password in passwords
+        )
+        .upper()
+        .encode("ascii")
+    )
+
+
+def load_hashes(path: str, are_hashes: bool, process_number: int) -> np.ndarray:
+    """
+    Load the hashes to be audited from a file with one password or hash per line.
+
+    :param path: The path to the file.
+    :param are_hashes: Whether the file contains SHA-1 hashes instead of passwords.
+    :param process_number: The number of processes to be used for hashing.
+    :return: The upper-case hex hashes in the order of the file lines.
+    """
+    with open(path, "r", encoding="utf-8") as file:
+        lines = file.read().splitlines()
+    if are_hashes:
+        hashes = [line.strip().upper() for line in lines]
+        for line_index, password_hash in enumerate(hashes):
+            if len(password_hash) != HASH_LENGTH or not all(
+                symbol in "0123456789ABCDEF" for symbol in password_hash
+            ):
+                raise ValueError(f"Line {line_index + 1} is not a SHA-1 hash.")
+        return np.array(hashes, dtype=f"S{HASH_LENGTH}")
+    chunks = [
+        lines[index : index + HASH_CHUNK_SIZE]
+        for index in range(0, len(lines), HASH_CHUNK_SIZE)
+    ]
+    with ProcessPoolExecutor(process_number) as executor:
+        digests = b"".join(executor.map(hash_passwords, chunks))
+    return np.frombuffer(digests, dtype=f"S{HASH_LENGTH}")
+
+
+async def audit_hashes(storage: PwnedStorage, hashes: np.ndarray) -> np.ndarray:
+    """
+    Find leak occasion numbers of hashes by a merge-join of sorted hashes and ranges.
+
+    The ranges of consecutive prefixes are joined into one sorted array of full hashes,
+    so every window of prefixes is matched with a single vectorized search.
+
+    :param storage: The storage to check the hashes against.
+    :param hashes: The upper-case hex hashes.
+    :return: The leak occasion numbers of the hashes (0 for not leaked ones).
+    """
+    order = np.argsort(hashes, kind="stable")
+    sorted_hashes = hashes[order]
+    symbols = sorted_hashes.view(np.uint8).reshape(-1, HASH_LENGTH)
+    prefixes = __to_strings(symbols[:, :PWNED_PREFIX_LENGTH])
+    group_prefixes, group_starts = np.unique(prefixes, return_index=True)
+    group_starts = np.append(group_starts, len(hashes))
+    sorted_counts = np.zeros(len(hashes), dtype=np.int64)
+    for window_start in range(0, len(group_prefixes), WINDOW_RANGE_NUMBER):
+        window_end = min(window_start + WINDOW_RANGE_NUMBER, len(group_prefixes))
+        window_prefixes = [
+            prefix.decode() for prefix in group_prefixes[window_start:window_end]
+        ]
+        batch_size = -(-len(window_prefixes) // READER_NUMBER)
+        batches = await asyncio.gather(
+            *[
+                storage.get_ranges(window_prefixes[index : index + batch_size])
+                for index in range(0, len(window_prefixes), batch_size)
+            ]
+        )
+        ranges = [records for batch in batches for records in batch]
+        start, end = group_starts[window_start], group_starts[window_end]
+        sorted_counts[start:end] = match_records(
+            join_ranges(window_prefixes, ranges), sorted_hashes[start:end]
+        )
+    counts = np.empty_like(sorted_counts)
+    counts[order] = sorted_counts
+    return counts
+
+
+def join_ranges(prefixes: List[str], ranges: List[str]) -> bytes:
+    """
+    Join ranges of ascending prefixes into one sorted list of full hash records.
+
+    :param prefixes: The hash prefixes in ascending order.
+    :param ranges: The ranges of the prefixes as plain text.
+    :return: The records with full hashes, one per line.
+    """
+    return "\n".join(
+        prefix + records.replace("\n", "\n" + prefix)
+        for prefix, records in zip(prefixes, map(str.strip, ranges))
+        if records
+    ).encode("ascii")
+
+
+def match_records(records: bytes, hashes: np.ndarray) -> np.ndarray:
+    """
+    Find leak occasion numbers of sorted hashes in sorted full hash records.
+
+    :param records: The records with full hashes, one per line.
+    :param hashes: The sorted upper-case hex hashes.
+    :return: The leak occasion numbers of the hashes (0 for not leaked ones).
+    """
+    counts = np.zeros(len(hashes), dtype=np.int64)
+    if not records:
+        return counts
+    record_hashes, line_starts, line_ends = parse_records(records)
+    positions = np.searchsorted(record_hashes, hashes)
+    is_found = positions < len(record_hashes)
+    is_found[is_found] = record_hashes[positions[is_found]] == hashes[is_found]
+    for index in np.flatnonzero(is_found):
+        line_index = positions[index]
+        counts[index] = int(
+            records[line_starts[line_index] + HASH_LENGTH + 1 : line_ends[line_index]]
+        )
+    return counts
+
+
+def parse_records(records: bytes) -> Tuple[np.ndarray, np.ndarray, np.ndarray]:
+    """
+    Represent non-empty full hash records as a fixed-width hash array.
+
+    :param records: The records with full hashes, one per line.
+    :return: The hashes, the line start offsets and the line end offsets.
+    """
+    data = np.frombuffer(records, dtype=np.uint8)
+    line_ends = np.append(np.flatnonzero(data == ord("\n")), len(data))
+    line_starts = np.insert(line_ends[:-1] + 1, 0, 0)
+    symbols = data[line_starts[:, None] + np.arange(HASH_LENGTH)]
+    return __to_strings(symbols), line_starts, line_ends
+
+
+def __to_strings(symbols: np.ndarray) -> np.ndarray:
+    return np.ascontiguousarray(symbols).view(f"S{symbols.shape[1]}").ravel()
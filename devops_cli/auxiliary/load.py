@@ -0,0 +1,232 @@
+import asyncio
+import bisect
+import itertools
+import random
+import re
+import time
+from enum import Enum
+from typing import Callable, Dict, List, Optional
+
+import aiohttp
+
+from storage.auxiliary.numeration import number_to_hex_code
+from storage.auxiliary.pwned.model import PWNED_PREFIX_CAPACITY, PWNED_PREFIX_LENGTH
+
+# An odd multiplier makes a permutation of prefix numbers,
+# so the most popular Zipf ranks are spread over the prefix space.
+RANK_PERMUTATION_MULTIPLIER = 0x9E3B5
+LOGGED_PREFIX_PATTERN = re.compile(r"/range/([0-9A-Fa-f]{5})\b")
+PERCENTILES = {"p50": 50, "p90": 90, "p99": 99, "p999": 99.9}
+# Requests sent later than scheduled by more than this are counted as late.
+LATE_SEND_SECONDS = 0.01
+
+
+class PrefixDistribution(Enum):
+    """The distribution of requested prefixes."""
+
+    UNIFORM = "uniform"
+    ZIPF = "zipf"
+    LOG = "log"
+
+
+def create_prefix_sampler(
+    distribution: PrefixDistribution,
+    zipf_exponent: float = 1.0,
+    log_path: Optional[str] = None,
+    seed: int = 0,
+) -> Callable[[], str]:
+    """
+    Create a function sampling the prefixes to be requested.
+
+    :param distribution: The distribution of prefixes.
+    :param zipf_exponent: The exponent of the Zipf distribution.
+    :param log_path: The access log to replay (lines with /range/<prefix> or prefixes).
+    :param seed: The seed of the sampling.
+    :return: The function returning a prefix on every call.
+    """
+    randomizer = random.Random(seed)
+    if distribution == PrefixDistribution.UNIFORM:
+        return lambda: number_to_hex_code(
+            randomizer.randrange(PWNED_PREFIX_CAPACITY), PWNED_PREFIX_CAPACITY
+        )
+    if distribution == PrefixDistribution.ZIPF:
+        weights = itertools.accumulate(
+            1 / rank**zipf_exponent for rank in range(1, PWNED_PREFIX_CAPACITY + 1)
+        )
+        cumulative_weights = list(weights)
+
+        def sample_zipf() -> str:
+            point = randomizer.random() * cumulative_weights[-1]
+            rank = bisect.bisect_left(cumulative_weights, point)
+            prefix_number = rank * RANK_PERMUTATION_MULTIPLIER % PWNED_PREFIX_CAPACITY
+            return number_to_hex_code(prefix_number, PWNED_PREFIX_CAPACITY)
+
+        return sample_zipf
+    if log_path is None:
+        raise ValueError("An access log is required to replay it.")
+    prefixes = read_logged_prefixes(log_path)
+    if not prefixes:
+        raise ValueError("The access log contains no range requests.")
+    cycle = itertools.cycle(prefixes)
+    return lambda: next(cycle)
+
+
+def read_logged_prefixes(log_path: str) -> List[str]:
+    """
+    Read the requested prefixes from an access log.
+
+    :param log_path: The log with /range/<prefix> requests or with one prefix per line.
+    :return: The prefixes in the order of requests.
+    """
+    prefixes = []
+    with open(log_path, "r", encoding="utf-8", errors="replace") as log:
+        for line in log:
+            match = LOGGED_PREFIX_PATTERN.search(line)
+            if match is not None:
+                prefixes.append(match.group(1).upper())
+            elif len(line.strip()) == PWNED_PREFIX_LENGTH:
+                prefixes.append(line.strip().upper())
+    return prefixes
+
+
+class LoadResult:
+    """The measurements of a load run."""
+
+    def __init__(self):
+        """Initialize a new LoadResult instance."""
+        self.latencies: List[float] = []
+        self.status_numbers: Dict[str, int] = {}
+        self.error_number: int = 0
+        self.received_size: int = 0
+        self.elapsed_seconds: float = 0
+        self.dropped_number: int = 0
+        self.late_number: int = 0
+
+    def add(self, latency: float, status: str, size: int) -> None:
+        """
+        Add the measurement of a request.
+
+        :param latency: The latency in seconds.
+        :param status: The HTTP status code or the error name.
+        :param size: The response body size in bytes.
+        """
+        self.latencies.append(latency)
+        self.status_numbers[status] = self.status_numbers.get(status, 0) + 1
+        if not status.isdigit() or int(status) >= 400:
+            self.error_number += 1
+        self.received_size += size
+
+    def to_report(self) -> dict:
+        """
+        Summarize the measurements.
+        :return: The JSON-serializable report.
+        """
+        request_number = len(self.latencies)
+        latencies = sorted(self.latencies)
+        elapsed_seconds = max(self.elapsed_seconds, 1e-9)
+        return {
+            "requests": request_number,
+            "elapsed_seconds": round(self.elapsed_seconds, 3),
+            "throughput": round(request_number / elapsed_seconds, 1),
+            "latency_ms": {
+                name: round(self.__get_percentile(latencies, percentile) * 1000, 3)
+                for name, percentile in PERCENTILES.items()
+            },
+            "error_rate": round(self.error_number / max(request_number, 1), 6),
+            "statuses": dict(sorted(self.status_numbers.items())),
+            "response_size": {
+                "total": self.received_size,
+                "mean": round(self.received_size / max(request_number, 1), 1),
+            },
+            "dropped": self.dropped_number,
+            "late": self.late_number,
+        }
+
+    @staticmethod
+    def __get_percentile(sorted_values: List[float], percentile: float) -> float:
+        if not sorted_values:
+            return 0
+        index = min(len(sorted_values) - 1, int(len(sorted_values) * percentile / 100))
+        return sorted_values[index]
+
+
+async def generate_load(
+    range_url: str,
+    sample_prefix: Callable[[], str],
+    duration_seconds: float,
+    rate: Optional[float] = None,
+    concurrency: int = 64,
+    accept: Optional[str] = None,
+) -> LoadResult:
+    """
+    Send range requests to a running instance and measure the responses.
+
+    With a target rate, requests are sent on schedule (an open loop) and latencies
+    are measured from the scheduled time, so a slow server cannot hide its queueing.
+    Requests due while the maximum number of requests are outstanding are dropped,
+    and requests the generator itself sends behind schedule are counted as late,
+    so neither the server nor the generator can silently lower the rate.
+    Otherwise the given number of workers send requests one after another.
+
+    :param range_url: The range URL the prefix is appended to.
+    :param sample_prefix: The function returning the prefix to be requested.
+    :param duration_seconds: The duration of the run.
+    :param rate: The target number of requests per second.
+    :param concurrency: The number of workers or, with a target rate,
+        the maximum number of outstanding requests.
+    :param accept: The Accept header of the requests.
+    :return: The measurements.
+    """
+    result = LoadResult()
+    headers = {"Accept": accept} if accept is not None else {}
+    connector = aiohttp.TCPConnector(limit=concurrency)
+    timeout = aiohttp.ClientTimeout(total=60)
+
+    async def send(session: aiohttp.ClientSession, start_ts: float) -> None:
+        try:
+            async with session.get(range_url + sample_prefix()) as resp:
+                size = len(await resp.read())
+                status = str(resp.status)
+        except (aiohttp.ClientError, asyncio.TimeoutError) as error:
+            size, status = 0, type(error).__name__
+        result.add(time.monotonic() - start_ts, status, size)
+
+    async with aiohttp.ClientSession(
+        connector=connector, timeout=timeout, headers=headers
+    ) as session:
+        start_ts = time.monotonic()
+        end_ts = start_ts + duration_seconds
+        if rate is None:
+
+            async def work() -> None:
+                while time.monotonic() < end_ts:
+                    await send(session, time.monotonic())
+
+            await asyncio.gather(*[work() for _ in range(concurrency)])
+        else:
+            tasks = set()
+            slots = asyncio.Semaphore(concurrency)
+
+            async def send_in_slot(scheduled_ts: float) -> None:
+                try:
+                    await send(session, scheduled_ts)
+                finally:
+                    slots.release()
+
+            for request_index in itertools.count():
+                scheduled_ts = start_ts + request_index / rate
+                if scheduled_ts >= end_ts:
+                    break
+                await asyncio.sleep(scheduled_ts - time.monotonic())
+                if slots.locked():
+                    result.dropped_number += 1
+                    continue
+                if time.monotonic() - scheduled_ts > LATE_SEND_SECONDS:
+                    result.late_number += 1
+                await slots.acquire()
+                task = asyncio.ensure_future(send_in_slot(scheduled_ts))
+                tasks.add(task)
+                task.add_done_callback(tasks.discard)
+            await asyncio.gather(*tasks)
+        result.elapsed_seconds = time.monotonic() - start_ts
+    return result
@@ -1,8 +1,27 @@
 import asyncio
+import cProfile
+import json
+import math
+import os
+import ssl
 import time
+import urllib.request
+from typing import BinaryIO, Optional
 
+from aiohttp import web
+
+from devops_cli.auxiliary import load
+from devops_cli.auxiliary.load import PrefixDistribution, create_prefix_sampler
+from devops_cli.auxiliary.range_server import RangeServerSettings, create_range_server
 from devops_cli.auxiliary.utils import TextStyle, convert_seconds, stylize_text, write
+from service.auxiliary.profiling import StackSampler
+from storage.auxiliary.pwned.model import PWNED_PREFIX_CAPACITY
+from storage.auxiliary.range_download import DEFAULT_WRITER_NUMBER
+from storage.core.models.pipeline_statistics import PipelineStatistics
+from storage.core.models.prefix_shard import PrefixShard
+from storage.core.models.request_statistics import RequestStatistics
 from storage.core.models.revision import Revision
+from storage.implementations.binary_range import MEDIA_TYPE as BINARY_RANGE_MEDIA_TYPE
 from storage.implementations.file_range_provider import FileRangeImporter
 from storage.implementations.mocked_requester import MockedPwnedRequester
 from storage.implementations.pwned_storage import PwnedStorage
@@ -33,6 +52,7 @@ def __print_revision_progress(revision: Revision, last_status: Revision.Status)
         if last_status != Revision.Status.NEW:
             write("\r")
         is_completed = new_status in [
+            Revision.Status.WARM_UP,
             Revision.Status.TRANSITION,
             Revision.Status.PURGE,
             Revision.Status.COMPLETED,
@@ -45,11 +65,30 @@ def __print_revision_progress(revision: Revision, last_status: Revision.Status)
         )
         write(stylize_text(" Prepare new data: ", style))
         write(stylize_text(f"{progress}%", [TextStyle.BOLD, style]))
+        if is_completed:
+            write("\n")
+            console_status = Revision.Status.WARM_UP
+    if console_status == Revision.Status.WARM_UP:
+        if last_status not in [Revision.Status.NEW, Revision.Status.PREPARATION]:
+            write("\r")
+        is_completed = new_status in [
+            Revision.Status.TRANSITION,
+            Revision.Status.PURGE,
+            Revision.Status.COMPLETED,
+        ]
+        style = __get_completion_style(is_completed)
+        progress = 100 if is_completed else revision.progress or 0
+        write(stylize_text("Warm up new data: ", style))
+        write(stylize_text(f"{progress}%", [TextStyle.BOLD, style]))
         if is_completed:
             write("\n")
             console_status = Revision.Status.TRANSITION
     if console_status == Revision.Status.TRANSITION:
-        if last_status not in [Revision.Status.NEW, Revision.Status.PREPARATION]:
+        if last_status not in [
+            Revision.Status.NEW,
+            Revision.Status.PREPARATION,
+            Revision.Status.WARM_UP,
+        ]:
             write("\r")
         is_completed = new_status in [Revision.Status.PURGE, Revision.Status.COMPLETED]
         style = __get_completion_style(is_completed)
@@ -61,6 +100,7 @@ def __print_revision_progress(revision: Revision, last_status: Revision.Status)
         if last_status not in [
             Revision.Status.NEW,
             Revision.Status.PREPARATION,
+            Revision.Status.WARM_UP,
             Revision.Status.TRANSITION,
         ]:
             write("\r")
@@ -82,21 +122,333 @@ async def __watch_update_status(storage: PwnedStorage) -> None:
         await asyncio.sleep(CONSOLE_UPDATE_INTERVAL_IN_SECONDS)
 
 
-async def __update_storage(storage: PwnedStorage) -> None:
-    await asyncio.gather(storage.update(), __watch_update_status(storage))
+async def __update_storage(
+    storage: PwnedStorage,
+    profile_path: Optional[str] = None,
+    cprofile_path: Optional[str] = None,
+) -> None:
+    sampler = StackSampler() if profile_path is not None else None
+    profiler = cProfile.Profile() if cprofile_path is not None else None
+    if sampler is not None:
+        sampler.start()
+    if profiler is not None:
+        profiler.enable()
+    try:
+        await asyncio.gather(storage.update(), __watch_update_status(storage))
+    finally:
+        if profiler is not None:
+            profiler.disable()
+            profiler.dump_stats(cprofile_path)
+        if sampler is not None:
+            sampler.stop()
+            with open(profile_path, "w", encoding="utf-8") as profile:
+                profile.write(sampler.to_folded())
 
 
 async def update_storage(
-    resource_dir: str, coroutines: int, is_requester_mocked: bool
+    resource_dir: str,
+    coroutines: int,
+    is_requester_mocked: bool,
+    deadline_seconds: float = PwnedRequester.DEFAULT_PREFIX_DEADLINE_SECONDS,
+    hedging_percentile: Optional[float] = None,
+    range_url: str = PwnedRequester.PWNED_RANGE_URL,
+    ca_file: Optional[str] = None,
+    processes: int = 1,
+    shard: Optional[PrefixShard] = None,
+    writers: int = DEFAULT_WRITER_NUMBER,
+    warm_up_megabytes: int = PwnedStorage.DEFAULT_WARM_UP_BYTES >> 20,
+    warm_up_rate_megabytes: int = PwnedStorage.DEFAULT_WARM_UP_RATE >> 20,
+    profile_path: Optional[str] = None,
+    cprofile_path: Optional[str] = None,
 ) -> None:
     """Updates the Pwned storage."""
-    requester = MockedPwnedRequester() if is_requester_mocked else PwnedRequester()
-    storage = PwnedStorage(resource_dir, coroutines, requester)
-    await __update_storage(storage)
+    if is_requester_mocked:
+        requester = MockedPwnedRequester()
+    else:
+        requester = PwnedRequester(
+            range_url,
+            prefix_deadline_seconds=deadline_seconds,
+            hedging_percentile=hedging_percentile,
+            ca_file=ca_file,
+        )
+    storage = PwnedStorage(
+        resource_dir,
+        coroutines,
+        requester,
+        process_number=processes,
+        shard=shard,
+        writer_number=writers,
+        warm_up_bytes=warm_up_megabytes << 20,
+        warm_up_rate=warm_up_rate_megabytes << 20,
+    )
+    await __update_storage(storage, profile_path, cprofile_path)
+    if storage.pipeline_statistics is not None:
+        __print_pipeline_statistics(storage.pipeline_statistics)
+    if not is_requester_mocked:
+        __print_request_statistics(requester.statistics)
 
 
-async def update_storage_from_file(resource_dir: str, data_file_path: str) -> None:
+def __print_pipeline_statistics(statistics: PipelineStatistics) -> None:
+    write(stylize_text("Fetching: ", TextStyle.BLUE))
+    write(stylize_text(f"{statistics.fetch_seconds:.1f}s", TextStyle.BOLD))
+    write(stylize_text(", waiting for writers: ", TextStyle.BLUE))
+    write(stylize_text(f"{statistics.backpressure_seconds:.1f}s", TextStyle.BOLD))
+    write(stylize_text(", writing: ", TextStyle.BLUE))
+    write(stylize_text(f"{statistics.write_seconds:.1f}s", TextStyle.BOLD))
+    write(stylize_text(" in ", TextStyle.BLUE))
+    write(stylize_text(f"{statistics.write_batch_number}", TextStyle.BOLD))
+    write(stylize_text(" batches, queue depth mean/max: ", TextStyle.BLUE))
+    write(
+        stylize_text(
+            f"{statistics.mean_queue_depth:.1f}/{statistics.max_queue_depth}\n",
+            TextStyle.BOLD,
+        )
+    )
+
+
+def __print_request_statistics(statistics: RequestStatistics) -> None:
+    write(stylize_text("Requests: ", TextStyle.BLUE))
+    write(stylize_text(f"{statistics.request_number}", TextStyle.BOLD))
+    write(stylize_text(", failed: ", TextStyle.BLUE))
+    write(stylize_text(f"{statistics.failed_request_number}", TextStyle.BOLD))
+    write(stylize_text(", hedged: ", TextStyle.BLUE))
+    write(stylize_text(f"{statistics.hedged_request_number}", TextStyle.BOLD))
+    write(stylize_text(", hedges won: ", TextStyle.BLUE))
+    write(stylize_text(f"{statistics.hedge_win_number}\n", TextStyle.BOLD))
+
+
+async def update_storage_from_file(
+    resource_dir: str,
+    data_file_path: str,
+    shard: Optional[PrefixShard] = None,
+    profile_path: Optional[str] = None,
+    cprofile_path: Optional[str] = None,
+) -> None:
     """Updates the Pwned storage from a file."""
     provider = FileRangeImporter(data_file_path)
-    storage = PwnedStorage(resource_dir, 1, provider)
-    await __update_storage(storage)
+    storage = PwnedStorage(resource_dir, 1, provider, shard=shard)
+    await __update_storage(storage, profile_path, cprofile_path)
+
+
+async def trickle_refresh(
+    resource_dir: str,
+    prefixes_per_minute: Optional[int],
+    cycle_days: float,
+    coroutines: int,
+    is_requester_mocked: bool,
+    deadline_seconds: float = PwnedRequester.DEFAULT_PREFIX_DEADLINE_SECONDS,
+    range_url: str = PwnedRequester.PWNED_RANGE_URL,
+    ca_file: Optional[str] = None,
+) -> None:
+    """Refreshes the active dataset of the Pwned storage in place until interrupted."""
+    if is_requester_mocked:
+        requester = MockedPwnedRequester()
+    else:
+        requester = PwnedRequester(
+            range_url, prefix_deadline_seconds=deadline_seconds, ca_file=ca_file
+        )
+    storage = PwnedStorage(resource_dir, coroutines, requester)
+    if prefixes_per_minute is None:
+        prefixes_per_minute = math.ceil(storage.shard.size / (cycle_days * 24 * 60))
+    write(stylize_text("Refresh ", TextStyle.BLUE))
+    write(stylize_text(f"{prefixes_per_minute}", TextStyle.BOLD))
+    write(stylize_text(" prefixes per minute\n", TextStyle.BLUE))
+    start_ts = int(time.time())
+
+    def on_refreshed(last_prefix: str, changed_amount: int) -> None:
+        elapsed_seconds = int(time.time()) - start_ts
+        write(
+            stylize_text(f"[{convert_seconds(elapsed_seconds)}]", TextStyle.PALE_GRAY)
+        )
+        write(stylize_text(" Refreshed up to ", TextStyle.BLUE))
+        write(stylize_text(last_prefix, TextStyle.BOLD))
+        write(stylize_text(", changed: ", TextStyle.BLUE))
+        write(stylize_text(f"{changed_amount}", TextStyle.BOLD))
+        write(stylize_text(", generation: ", TextStyle.BLUE))
+        write(stylize_text(f"{storage.generation}\n", TextStyle.BOLD))
+
+    await storage.trickle_refresh(prefixes_per_minute, on_refreshed=on_refreshed)
+
+
+async def index_dump(data_file_path: str, index_path: Optional[str]) -> None:
+    """Builds the offset index of a Pwned dump file unless it's up to date."""
+    from storage.implementations.dump_range_provider import DumpRangeProvider
+
+    indexed_amount = 0
+    start_ts = int(time.time())
+
+    def on_indexed(amount: int) -> None:
+        nonlocal indexed_amount
+        indexed_amount += amount
+        elapsed_seconds = int(time.time()) - start_ts
+        write("\r")
+        write(
+            stylize_text(f"[{convert_seconds(elapsed_seconds)}]", TextStyle.PALE_GRAY)
+        )
+        write(stylize_text(" Index dump: ", TextStyle.BLUE))
+        progress = 100 * indexed_amount // PWNED_PREFIX_CAPACITY
+        write(stylize_text(f"{progress}%", [TextStyle.BOLD, TextStyle.BLUE]))
+
+    await asyncio.to_thread(
+        lambda: DumpRangeProvider(data_file_path, index_path, on_indexed)
+    )
+    if indexed_amount > 0:
+        write("\n")
+    write(stylize_text("The index is up to date\n", [TextStyle.BOLD, TextStyle.GREEN]))
+
+
+async def serve_ranges(
+    settings: RangeServerSettings,
+    host: str,
+    port: int,
+    cert_file: Optional[str],
+    key_file: Optional[str],
+) -> None:
+    """Serves a local stand-in of the Pwned range API until interrupted."""
+    ssl_context = None
+    if cert_file is not None:
+        ssl_context = ssl.create_default_context(ssl.Purpose.CLIENT_AUTH)
+        ssl_context.load_cert_chain(cert_file, key_file)
+    runner = web.AppRunner(create_range_server(settings))
+    await runner.setup()
+    await web.TCPSite(runner, host, port, ssl_context=ssl_context).start()
+    scheme = "https" if ssl_context is not None else "http"
+    write(stylize_text("Serve ranges at ", TextStyle.BLUE))
+    write(stylize_text(f"{scheme}://{host}:{port}/range/\n", TextStyle.BOLD))
+    try:
+        await asyncio.Event().wait()
+    finally:
+        await runner.cleanup()
+
+
+async def generate_load(
+    range_url: str,
+    report_path: str,
+    distribution: PrefixDistribution,
+    zipf_exponent: float,
+    log_path: Optional[str],
+    duration_seconds: float,
+    rate: Optional[float],
+    concurrency: int,
+    is_binary: bool,
+    seed: int,
+) -> None:
+    """Generates load on the range endpoint and writes the results as JSON."""
+    sample_prefix = await asyncio.to_thread(
+        lambda: create_prefix_sampler(distribution, zipf_exponent, log_path, seed)
+    )
+    write(stylize_text(f"Generate load for {duration_seconds}s\n", TextStyle.BLUE))
+    result = await load.generate_load(
+        range_url,
+        sample_prefix,
+        duration_seconds,
+        rate,
+        concurrency,
+        BINARY_RANGE_MEDIA_TYPE if is_binary else None,
+    )
+    report = {
+        "settings": {
+            "url": range_url,
+            "distribution": distribution.value,
+            "zipf_exponent": zipf_exponent,
+            "log": log_path,
+            "duration_seconds": duration_seconds,
+            "rate": rate,
+            "concurrency": concurrency,
+            "binary": is_binary,
+            "seed": seed,
+        },
+        "results": result.to_report(),
+    }
+    with open(report_path, "w", encoding="utf-8") as report_file:
+        json.dump(report, report_file, indent=2)
+        report_file.write("\n")
+    results = report["results"]
+    latencies = results["latency_ms"]
+    write(stylize_text(f"{results['throughput']} requests per second", TextStyle.BOLD))
+    write(
+        stylize_text(
+            f", latency p50/p99/p999: {latencies['p50']}/{latencies['p99']}"
+            f"/{latencies['p999']} ms, errors: {results['error_rate'] * 100:.3f}%\n",
+            TextStyle.BLUE,
+        )
+    )
+    if results["dropped"] or results["late"]:
+        write(
+            stylize_text(
+                f"Dropped: {results['dropped']}, sent late: {results['late']}"
+                " (the target rate has not been reached)\n",
+                TextStyle.RED,
+            )
+        )
+
+
+async def export_snapshot(resource_dir: str, archive_path: str) -> None:
+    """Exports the active dataset of the Pwned storage as a snapshot archive."""
+
+    def export() -> None:
+        with open(archive_path, "wb") as archive:
+            for chunk in storage.export_snapshot():
+                archive.write(chunk)
+
+    storage = PwnedStorage(resource_dir)
+    write(stylize_text("Export snapshot: ", TextStyle.BLUE))
+    await asyncio.to_thread(export)
+    write(stylize_text("done\n", [TextStyle.BOLD, TextStyle.GREEN]))
+
+
+async def restore_snapshot(
+    resource_dir: str, source: str, threads: int, shard: Optional[PrefixShard] = None
+) -> None:
+    """Restores the Pwned storage from a snapshot archive file or URL."""
+    storage = PwnedStorage(resource_dir, shard=shard)
+    archive = await asyncio.to_thread(lambda: __open_archive(source))
+    try:
+        await asyncio.gather(
+            storage.restore(archive, threads), __watch_update_status(storage)
+        )
+    finally:
+        archive.close()
+
+
+def __open_archive(source: str) -> BinaryIO:
+    if source.startswith("http://") or source.startswith("https://"):
+        # The snapshot endpoint of a running instance is available to admins only.
+        headers = {}
+        if os.getenv("ADMIN_TOKEN"):
+            headers["Authorization"] = f"Bearer {os.environ['ADMIN_TOKEN']}"
+        return urllib.request.urlopen(urllib.request.Request(source, headers=headers))
+    return open(source, "rb")
+
+
+async def audit_passwords(
+    resource_dir: str,
+    input_path: str,
+    report_path: str,
+    are_hashes: bool,
+    processes: int,
+) -> None:
+    """Audits passwords or their hashes against the Pwned storage."""
+    from devops_cli.auxiliary.audit import audit_hashes, load_hashes
+
+    start_ts = time.time()
+    hashes = await asyncio.to_thread(
+        lambda: load_hashes(input_path, are_hashes, processes)
+    )
+    counts = await audit_hashes(PwnedStorage(resource_dir), hashes)
+    with open(report_path, "w", encoding="ascii") as report:
+        report.write("line,hash,count\n")
+        for index in counts.nonzero()[0]:
+            report.write(f"{index + 1},{hashes[index].decode()},{counts[index]}\n")
+    elapsed_seconds = max(time.time() - start_ts, 1e-6)
+    write(
+        stylize_text(f"[{convert_seconds(int(elapsed_seconds))}]", TextStyle.PALE_GRAY)
+    )
+    write(stylize_text(f" Checked {len(hashes)}, pwned: ", TextStyle.BLUE))
+    write(stylize_text(f"{counts.astype(bool).sum()}", [TextStyle.BOLD, TextStyle.RED]))
+    write(
+        stylize_text(
+            f" ({int(len(hashes) / elapsed_seconds)} checks per second)\n",
+            TextStyle.BLUE,
+        )
+    )
@@ -0,0 +1,147 @@
+import asyncio
+import hashlib
+import random
+import time
+from enum import Enum
+from typing import Optional
+
+from aiohttp import web
+
+from storage.auxiliary.pwned.model import PWNED_PREFIX_LENGTH
+from storage.implementations.mocked_requester import MockedPwnedRequester
+
+HEX_SYMBOLS = "0123456789ABCDEF"
+CHUNK_SIZE = 1 << 12
+
+
+class LatencyDistribution(Enum):
+    """The distribution of response latencies."""
+
+    NONE = "none"
+    CONSTANT = "constant"
+    UNIFORM = "uniform"
+    EXPONENTIAL = "exponential"
+    LOGNORMAL = "lognormal"
+
+
+class BandwidthLimiter:
+    """Paces the data sent by all responses to a total bandwidth."""
+
+    def __init__(self, bytes_per_second: int):
+        """
+        Initialize a new BandwidthLimiter instance.
+        :param bytes_per_second: The total bandwidth.
+        """
+        self.__bytes_per_second: int = bytes_per_second
+        self.__available_ts: float = 0
+
+    async def consume(self, size: int) -> None:
+        """
+        Wait until the data of the given size can be sent.
+        :param size: The size of the data in bytes.
+        """
+        now = time.monotonic()
+        self.__available_ts = max(self.__available_ts, now) + (
+            size / self.__bytes_per_second
+        )
+        await asyncio.sleep(self.__available_ts - now)
+
+
+class RangeServerSettings:
+    """The behaviour of the stand-in range server."""
+
+    def __init__(
+        self,
+        range_size: Optional[int] = None,
+        latency_distribution: LatencyDistribution = LatencyDistribution.NONE,
+        latency_ms: float = 0,
+        error_rate: float = 0,
+        throttle_rate: float = 0,
+        bandwidth: Optional[int] = None,
+        seed: int = 0,
+    ):
+        """
+        Initialize a new RangeServerSettings instance.
+
+        :param range_size: The average number of records in a range
+            (the mocked requester ranges are used by default).
+        :param latency_distribution: The distribution of response latencies.
+        :param latency_ms: The mean response latency in milliseconds.
+        :param error_rate: The share of requests failed with 500 Internal Server Error.
+        :param throttle_rate: The share of requests rejected with 429 Too Many Requests.
+        :param bandwidth: If specified, the total bandwidth in bytes per second.
+        :param seed: The seed of latencies and injected errors.
+        """
+        self.range_size: Optional[int] = range_size
+        self.latency_distribution: LatencyDistribution = latency_distribution
+        self.latency_ms: float = latency_ms
+        self.error_rate: float = error_rate
+        self.throttle_rate: float = throttle_rate
+        self.bandwidth: Optional[int] = bandwidth
+        self.seed: int = seed
+
+
+def create_range_server(settings: RangeServerSettings) -> web.Application:
+    """
+    Create a local stand-in of the Pwned range API with generated data.
+
+    The server implements GET /range/<prefix> with ETag support
+    and injects latencies, errors and bandwidth limits according to the settings.
+
+    :param settings: The server settings.
+    :return: The server application.
+    """
+    generator = MockedPwnedRequester(settings.range_size)
+    randomizer = random.Random(settings.seed)
+    limiter = (
+        BandwidthLimiter(settings.bandwidth) if settings.bandwidth is not None else None
+    )
+
+    def get_latency() -> float:
+        mean = settings.latency_ms / 1000
+        distribution = settings.latency_distribution
+        if distribution == LatencyDistribution.CONSTANT:
+            return mean
+        if distribution == LatencyDistribution.UNIFORM:
+            return randomizer.uniform(0, 2 * mean)
+        if distribution == LatencyDistribution.EXPONENTIAL:
+            return randomizer.expovariate(1 / mean) if mean > 0 else 0
+        if distribution == LatencyDistribution.LOGNORMAL:
+            # A heavy tail with the median at a half of the mean.
+            return randomizer.lognormvariate(0, 1.18) * mean / 2
+        return 0
+
+    async def get_range(request: web.Request) -> web.StreamResponse:
+        prefix = request.match_info["prefix"].upper()
+        if len(prefix) != PWNED_PREFIX_LENGTH or any(
+            symbol not in HEX_SYMBOLS for symbol in prefix
+        ):
+            return web.Response(status=400, text="The hash format was not valid")
+        await asyncio.sleep(get_latency())
+        failure_chance = randomizer.random()
+        if failure_chance < settings.throttle_rate:
+            return web.Response(
+                status=429, text="Rate limit exceeded", headers={"Retry-After": "1"}
+            )
+        if failure_chance < settings.throttle_rate + settings.error_rate:
+            return web.Response(status=500, text="Internal server error")
+        body = generator.generate_range(prefix).replace("\n", "\r\n").encode("ascii")
+        etag = f'"{hashlib.sha1(body).hexdigest()}"'
+        headers = {"ETag": etag, "Content-Type": "text/plain"}
+        if etag in request.headers.get("If-None-Match", ""):
+            return web.Response(status=304, headers=headers)
+        if limiter is None:
+            return web.Response(body=body, headers=headers)
+        response = web.StreamResponse(headers=headers)
+        response.content_length = len(body)
+        await response.prepare(request)
+        for offset in range(0, len(body), CHUNK_SIZE):
+            chunk = body[offset : offset + CHUNK_SIZE]
+            await limiter.consume(len(chunk))
+            await response.write(chunk)
+        await response.write_eof()
+        return response
+
+    app = web.Application()
+    app.router.add_get("/range/{prefix}", get_range)
+    return app
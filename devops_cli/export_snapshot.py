@@ -0,0 +1,22 @@
+import argparse
+import asyncio
+
+from devops_cli.auxiliary import programs
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(
+        description="Export the active Pwned storage dataset as a snapshot archive."
+    )
+    parser.add_argument(
+        "resource_dir",
+        type=str,
+        help="The directory where the storage data is stored.",
+    )
+    parser.add_argument(
+        "archive",
+        type=str,
+        help="The path of the snapshot archive to be created.",
+    )
+
+    args = parser.parse_args()
+    asyncio.run(programs.export_snapshot(args.resource_dir, args.archive))
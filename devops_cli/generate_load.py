@@ -0,0 +1,94 @@
+import argparse
+import asyncio
+
+from devops_cli.auxiliary import programs
+from devops_cli.auxiliary.load import PrefixDistribution
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(
+        description="Generate load on the range endpoint of a running instance."
+    )
+    parser.add_argument(
+        "url",
+        type=str,
+        help="The range URL the prefix is appended to (e.g. http://127.0.0.1:5000/range/).",
+    )
+    parser.add_argument(
+        "report",
+        type=str,
+        help="The JSON file to write the results to.",
+    )
+    parser.add_argument(
+        "-d",
+        "--distribution",
+        type=str,
+        choices=[distribution.value for distribution in PrefixDistribution],
+        default=PrefixDistribution.ZIPF.value,
+        help="The distribution of requested prefixes. Default: zipf.",
+    )
+    parser.add_argument(
+        "-s",
+        "--zipf-exponent",
+        type=float,
+        default=1.0,
+        help="The exponent of the Zipf distribution. Default: 1.0.",
+    )
+    parser.add_argument(
+        "-l",
+        "--log",
+        type=str,
+        default=None,
+        help="The access log to replay (lines with /range/<prefix> or prefixes)"
+        " for the log distribution.",
+    )
+    parser.add_argument(
+        "-t",
+        "--duration",
+        type=float,
+        default=30,
+        help="The duration of the run in seconds. Default: 30.",
+    )
+    parser.add_argument(
+        "-r",
+        "--rate",
+        type=float,
+        default=None,
+        help="The target number of requests per second."
+        " By default requests are sent back-to-back by every worker.",
+    )
+    parser.add_argument(
+        "-c",
+        "--concurrency",
+        type=int,
+        default=64,
+        help="The number of workers or, with a target rate,"
+        " the maximum number of outstanding requests. Default: 64.",
+    )
+    parser.add_argument(
+        "-b",
+        "--binary",
+        action="store_true",
+        help="Whether to request ranges in the binary format.",
+    )
+    parser.add_argument(
+        "--seed",
+        type=int,
+        default=0,
+        help="The seed of prefix sampling. Default: 0.",
+    )
+
+    args = parser.parse_args()
+    asyncio.run(
+        programs.generate_load(
+            args.url,
+            args.report,
+            PrefixDistribution(args.distribution),
+            args.zipf_exponent,
+            args.log,
+            args.duration,
+            args.rate,
+            args.concurrency,
+            args.binary,
+            args.seed,
+        )
+    )
@@ -0,0 +1,24 @@
+import argparse
+import asyncio
+
+from devops_cli.auxiliary import programs
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(
+        description="Index a Pwned dump file to serve ranges directly from it."
+    )
+    parser.add_argument(
+        "data_file",
+        type=str,
+        help="The file with sorted hashes (in the format of the official pwned passwords downloader).",
+    )
+    parser.add_argument(
+        "-o",
+        "--output",
+        type=str,
+        default=None,
+        help="The index file path. Default: the dump file path with the .idx suffix.",
+    )
+
+    args = parser.parse_args()
+    asyncio.run(programs.index_dump(args.data_file, args.output))
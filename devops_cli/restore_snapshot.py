@@ -0,0 +1,46 @@
+import argparse
+import asyncio
+
+from devops_cli.auxiliary import programs
+from storage.core.models.prefix_shard import PrefixShard
+from storage.implementations.pwned_storage import PwnedStorage
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(
+        description="Restore Pwned leak record storage from a snapshot archive."
+    )
+    parser.add_argument(
+        "resource_dir",
+        type=str,
+        help="The directory to store data (recommended to be empty).",
+    )
+    parser.add_argument(
+        "source",
+        type=str,
+        help="The snapshot archive file or the snapshot URL of a running instance"
+        " (e.g. http://peer:5000/snapshot).",
+    )
+    parser.add_argument(
+        "-t",
+        "--threads",
+        type=int,
+        choices=range(1, 256 + 1),
+        default=PwnedStorage.DEFAULT_THREAD_NUMBER,
+        help="The number of threads to be used for restoring range files."
+        f" Default: {PwnedStorage.DEFAULT_THREAD_NUMBER}.",
+    )
+    parser.add_argument(
+        "-s",
+        "--shard",
+        type=PrefixShard.parse,
+        default=None,
+        help="The range of hash prefixes owned by the storage, e.g. 00000-7FFFF."
+        " By default the shard of the stored dataset (or all prefixes) is used.",
+    )
+
+    args = parser.parse_args()
+    asyncio.run(
+        programs.restore_snapshot(
+            args.resource_dir, args.source, args.threads, args.shard
+        )
+    )
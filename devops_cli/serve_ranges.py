@@ -0,0 +1,96 @@
+import argparse
+import asyncio
+
+from devops_cli.auxiliary import programs
+from devops_cli.auxiliary.range_server import LatencyDistribution, RangeServerSettings
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(
+        description="Serve a local stand-in of the Pwned range API with generated data."
+    )
+    parser.add_argument(
+        "-p",
+        "--port",
+        type=int,
+        default=8080,
+        help="The port to listen on. Default: 8080.",
+    )
+    parser.add_argument(
+        "--host",
+        type=str,
+        default="127.0.0.1",
+        help="The host to listen on. Default: 127.0.0.1.",
+    )
+    parser.add_argument(
+        "-r",
+        "--range-size",
+        type=int,
+        default=None,
+        help="The average number of records in a range (real ranges contain about 1000)."
+        " By default the ranges of the mocked requester are served.",
+    )
+    parser.add_argument(
+        "-l",
+        "--latency",
+        type=str,
+        choices=[distribution.value for distribution in LatencyDistribution],
+        default=LatencyDistribution.NONE.value,
+        help="The distribution of response latencies. Default: none.",
+    )
+    parser.add_argument(
+        "--latency-ms",
+        type=float,
+        default=50,
+        help="The mean response latency in milliseconds. Default: 50.",
+    )
+    parser.add_argument(
+        "--error-rate",
+        type=float,
+        default=0,
+        help="The share of requests failed with 500. Default: 0.",
+    )
+    parser.add_argument(
+        "--throttle-rate",
+        type=float,
+        default=0,
+        help="The share of requests rejected with 429. Default: 0.",
+    )
+    parser.add_argument(
+        "-b",
+        "--bandwidth",
+        type=int,
+        default=None,
+        help="The total bandwidth in bytes per second. Not limited by default.",
+    )
+    parser.add_argument(
+        "--seed",
+        type=int,
+        default=0,
+        help="The seed of latencies and injected errors. Default: 0.",
+    )
+    parser.add_argument(
+        "--cert",
+        type=str,
+        default=None,
+        help="The TLS certificate file. The server uses plain HTTP by default.",
+    )
+    parser.add_argument(
+        "--key",
+        type=str,
+        default=None,
+        help="The TLS private key file.",
+    )
+
+    args = parser.parse_args()
+    settings = RangeServerSettings(
+        args.range_size,
+        LatencyDistribution(args.latency),
+        args.latency_ms,
+        args.error_rate,
+        args.throttle_rate,
+        args.bandwidth,
+        args.seed,
+    )
+    asyncio.run(
+        programs.serve_ranges(settings, args.host, args.port, args.cert, args.key)
+    )
@@ -0,0 +1,85 @@
+import argparse
+import asyncio
+
+from devops_cli.auxiliary import programs
+from storage.implementations.pwned_storage import PwnedStorage
+from storage.implementations.requester import PwnedRequester
+
+DEFAULT_CYCLE_DAYS = 7
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(
+        description="Continuously refresh Pwned leak record storage in place."
+    )
+    parser.add_argument(
+        "resource_dir",
+        type=str,
+        help="The directory of the storage with an active dataset.",
+    )
+    rate_group = parser.add_mutually_exclusive_group()
+    rate_group.add_argument(
+        "-r",
+        "--rate",
+        type=int,
+        default=None,
+        help="The number of prefixes refreshed every minute.",
+    )
+    rate_group.add_argument(
+        "-w",
+        "--cycle-days",
+        type=float,
+        default=DEFAULT_CYCLE_DAYS,
+        help="The period in days within which all prefixes are refreshed"
+        f" (used if no rate is specified). Default: {DEFAULT_CYCLE_DAYS}.",
+    )
+    parser.add_argument(
+        "-c",
+        "--coroutines",
+        type=int,
+        choices=range(1, 256 + 1),
+        default=PwnedStorage.DEFAULT_FILL_COROUTINE_NUMBER,
+        help="The number of coroutines to be used for requesting hashes."
+        f" Default: {PwnedStorage.DEFAULT_FILL_COROUTINE_NUMBER}.",
+    )
+    parser.add_argument(
+        "-m",
+        "--mocked",
+        action="store_true",
+        help="Whether to use a mocked Pwned requester.",
+    )
+    parser.add_argument(
+        "-u",
+        "--url",
+        type=str,
+        default=PwnedRequester.PWNED_RANGE_URL,
+        help="The range API URL the hash prefix is appended to."
+        f" Default: {PwnedRequester.PWNED_RANGE_URL}.",
+    )
+    parser.add_argument(
+        "--ca-file",
+        type=str,
+        default=None,
+        help="The file of trusted CA certificates (e.g. of a local stand-in server).",
+    )
+    parser.add_argument(
+        "-d",
+        "--deadline",
+        type=float,
+        default=PwnedRequester.DEFAULT_PREFIX_DEADLINE_SECONDS,
+        help="The time in seconds within which failed requests for a prefix are retried."
+        f" Default: {PwnedRequester.DEFAULT_PREFIX_DEADLINE_SECONDS}.",
+    )
+
+    args = parser.parse_args()
+    asyncio.run(
+        programs.trickle_refresh(
+            args.resource_dir,
+            args.rate,
+            args.cycle_days,
+            args.coroutines,
+            args.mocked,
+            args.deadline,
+            args.url,
+            args.ca_file,
+        )
+    )
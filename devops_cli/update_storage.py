@@ -2,7 +2,10 @@ import argparse
 import asyncio
 
 from devops_cli.auxiliary import programs
+from storage.auxiliary.range_download import DEFAULT_WRITER_NUMBER
+from storage.core.models.prefix_shard import PrefixShard
 from storage.implementations.pwned_storage import PwnedStorage
+from storage.implementations.requester import PwnedRequester
 
 if __name__ == "__main__":
     parser = argparse.ArgumentParser(description="Update Pwned leak record storage.")
@@ -20,6 +23,46 @@ if __name__ == "__main__":
         help="The number of coroutines to be used for requesting hashed during revision."
         f" Default: {PwnedStorage.DEFAULT_COROUTINE_NUMBER}.",
     )
+    parser.add_argument(
+        "-p",
+        "--processes",
+        type=int,
+        default=1,
+        help="The number of processes to be used for requesting hashes,"
+        " each one with its own coroutines. Default: 1.",
+    )
+    parser.add_argument(
+        "-w",
+        "--writers",
+        type=int,
+        choices=range(1, 64 + 1),
+        default=DEFAULT_WRITER_NUMBER,
+        help="The number of threads writing downloaded ranges (in every process)."
+        f" Default: {DEFAULT_WRITER_NUMBER}.",
+    )
+    parser.add_argument(
+        "--warm-up",
+        type=int,
+        default=PwnedStorage.DEFAULT_WARM_UP_BYTES >> 20,
+        help="The megabytes of new data loaded into the page cache before switching"
+        " to it, the most requested ranges first (0 disables the warm-up)."
+        f" Default: {PwnedStorage.DEFAULT_WARM_UP_BYTES >> 20}.",
+    )
+    parser.add_argument(
+        "--warm-up-rate",
+        type=int,
+        default=PwnedStorage.DEFAULT_WARM_UP_RATE >> 20,
+        help="The maximum megabytes per second loaded into the page cache"
+        f" (0 for no limit). Default: {PwnedStorage.DEFAULT_WARM_UP_RATE >> 20}.",
+    )
+    parser.add_argument(
+        "-s",
+        "--shard",
+        type=PrefixShard.parse,
+        default=None,
+        help="The range of hash prefixes owned by the storage, e.g. 00000-7FFFF."
+        " By default the shard of the stored dataset (or all prefixes) is used.",
+    )
     parser.add_argument(
         "-f",
         "--data-file",
@@ -34,11 +77,72 @@ if __name__ == "__main__":
         action="store_true",
         help="Whether to use a mocked Pwned requester.",
     )
+    parser.add_argument(
+        "-u",
+        "--url",
+        type=str,
+        default=PwnedRequester.PWNED_RANGE_URL,
+        help="The range API URL the hash prefix is appended to."
+        f" Default: {PwnedRequester.PWNED_RANGE_URL}.",
+    )
+    parser.add_argument(
+        "--ca-file",
+        type=str,
+        default=None,
+        help="The file of trusted CA certificates (e.g. of a local stand-in server).",
+    )
+    parser.add_argument(
+        "-d",
+        "--deadline",
+        type=float,
+        default=PwnedRequester.DEFAULT_PREFIX_DEADLINE_SECONDS,
+        help="The time in seconds within which failed requests for a prefix are retried."
+        f" Default: {PwnedRequester.DEFAULT_PREFIX_DEADLINE_SECONDS}.",
+    )
+    parser.add_argument(
+        "--hedge",
+        type=float,
+        default=None,
+        help="The latency percentile (from 0 to 100) after which a slow request is hedged"
+        " with a second one. By default requests are not hedged.",
+    )
+
+    parser.add_argument(
+        "--profile",
+        type=str,
+        default=None,
+        help="The file to write a sampled profile of the update to as folded stacks"
+        " (the input format of flame graph tools).",
+    )
+    parser.add_argument(
+        "--cprofile",
+        type=str,
+        default=None,
+        help="The file to write a cProfile profile of the event loop thread to"
+        " (in the pstats format).",
+    )
 
     args = parser.parse_args()
     program = (
-        programs.update_storage_from_file(args.resource_dir, args.data_file)
+        programs.update_storage_from_file(
+            args.resource_dir, args.data_file, args.shard, args.profile, args.cprofile
+        )
         if args.data_file is not None
-        else programs.update_storage(args.resource_dir, args.coroutines, args.mocked)
+        else programs.update_storage(
+            args.resource_dir,
+            args.coroutines,
+            args.mocked,
+            args.deadline,
+            args.hedge,
+            args.url,
+            args.ca_file,
+            args.processes,
+            args.shard,
+            args.writers,
+            args.warm_up,
+            args.warm_up_rate,
+            args.profile,
+            args.cprofile,
+        )
     )
     asyncio.run(program)
@@ -0,0 +1,30 @@
+import os
+
+from aiohttp import web
+
+from service.router import ShardRouter, create_router, parse_routes
+
+
+def create_router_app() -> web.Application:
+    """
+    Create the routing front-end of sharded instances based on the environment.
+
+    SHARD_ROUTES sets the shards with their backends, e.g.
+    00000-7FFFF=http://a:5000,http://b:5000;80000-FFFFF=http://c:5000,
+    ROUTER_TIMEOUT_SECONDS sets the timeout of a backend request.
+
+    :return: The front-end application.
+    """
+    router = ShardRouter(
+        parse_routes(os.environ["SHARD_ROUTES"]),
+        float(
+            os.getenv(
+                "ROUTER_TIMEOUT_SECONDS", str(ShardRouter.DEFAULT_TIMEOUT_SECONDS)
+            )
+        ),
+    )
+    return create_router(router)
+
+
+if __name__ == "__main__":
+    web.run_app(create_router_app(), port=int(os.getenv("ROUTER_PORT", "8000")))
@@ -0,0 +1,165 @@
+import math
+import threading
+import time
+from collections import OrderedDict
+from typing import Optional
+
+
+class Rejection(Exception):
+    """A request is rejected by admission control."""
+
+    def __init__(self, status_code: int, retry_after_seconds: float, reason: str):
+        """
+        Initialize a new Rejection instance.
+
+        :param status_code: The HTTP status code to respond with.
+        :param retry_after_seconds: The time after which the client may retry.
+        :param reason: The reason of the rejection.
+        """
+        super().__init__(reason)
+        self.status_code: int = status_code
+        self.retry_after_seconds: int = max(1, math.ceil(retry_after_seconds))
+
+
+class TokenBucket:
+    """Token bucket rate limiter."""
+
+    def __init__(self, rate: float, burst: int):
+        """
+        Initialize a new TokenBucket instance.
+
+        :param rate: The number of tokens added per second.
+        :param burst: The maximum number of tokens.
+        """
+        self.__rate: float = rate
+        self.__burst: int = burst
+        self.__tokens: float = burst
+        self.__update_ts: float = time.monotonic()
+
+    def take(self) -> Optional[float]:
+        """
+        Take a token if there is one.
+        :return: None if the token is taken, otherwise the seconds until one is added.
+        """
+        now = time.monotonic()
+        self.__tokens = min(
+            self.__burst, self.__tokens + (now - self.__update_ts) * self.__rate
+        )
+        self.__update_ts = now
+        if self.__tokens >= 1:
+            self.__tokens -= 1
+            return None
+        return (1 - self.__tokens) / self.__rate
+
+
+class AdmissionController:
+    """
+    Limits the load of the range endpoint.
+
+    Requests are rejected at once if their client exceeds its rate limit or if the
+    wait queue is full, and after a deadline if they could not start in time.
+    Thread-safe: every request waits in its own thread.
+    """
+
+    MAX_CLIENT_NUMBER = 65536
+
+    def __init__(
+        self,
+        max_in_flight: int = 0,
+        max_queue: int = 0,
+        queue_timeout_seconds: float = 1,
+        client_rate: float = 0,
+        client_burst: int = 1,
+    ):
+        """
+        Initialize a new AdmissionController instance.
+
+        :param max_in_flight: The maximum number of requests processed at once
+            (0 for no limit).
+        :param max_queue: The maximum number of requests waiting to be processed.
+        :param queue_timeout_seconds: The maximum time a request waits in the queue.
+        :param client_rate: The number of requests per second allowed for a client
+            (0 for no limit).
+        :param client_burst: The number of requests a client may make at once.
+        """
+        self.__max_in_flight: int = max_in_flight
+        self.__max_queue: int = max_queue
+        self.__queue_timeout_seconds: float = queue_timeout_seconds
+        self.__client_rate: float = client_rate
+        self.__client_burst: int = client_burst
+        self.__condition: threading.Condition = threading.Condition()
+        self.__in_flight: int = 0
+        self.__waiting: int = 0
+        self.__buckets: OrderedDict = OrderedDict()
+        self.__admitted_number: int = 0
+        self.__rejected_number: int = 0
+
+    @property
+    def statistics(self) -> dict:
+        """
+        Get the admission statistics.
+        :return: The numbers of admitted, rejected, in-flight and waiting requests.
+        """
+        with self.__condition:
+            return {
+                "admitted": self.__admitted_number,
+                "rejected": self.__rejected_number,
+                "in_flight": self.__in_flight,
+                "waiting": self.__waiting,
+            }
+
+    def acquire(self, client: str) -> None:
+        """
+        Wait until a request may be processed.
+
+        :param client: The client identifier used for rate limiting.
+        :raises Rejection: If the request must be rejected.
+        """
+        with self.__condition:
+            try:
+                self.__limit_rate(client)
+                self.__wait_for_slot()
+            except Rejection:
+                self.__rejected_number += 1
+                raise
+            self.__admitted_number += 1
+
+    def release(self) -> None:
+        """Indicate that an admitted request is processed."""
+        with self.__condition:
+            self.__in_flight -= 1
+            self.__condition.notify()
+
+    def __limit_rate(self, client: str) -> None:
+        if self.__client_rate <= 0:
+            return
+        bucket = self.__buckets.get(client)
+        if bucket is None:
+            bucket = TokenBucket(self.__client_rate, self.__client_burst)
+            self.__buckets[client] = bucket
+            if len(self.__buckets) > AdmissionController.MAX_CLIENT_NUMBER:
+                self.__buckets.popitem(last=False)
+        self.__buckets.move_to_end(client)
+        retry_after_seconds = bucket.take()
+        if retry_after_seconds is not None:
+            raise Rejection(429, retry_after_seconds, "The rate limit is exceeded.")
+
+    def __wait_for_slot(self) -> None:
+        if self.__max_in_flight <= 0 or self.__in_flight < self.__max_in_flight:
+            self.__in_flight += 1
+            return
+        if self.__waiting >= self.__max_queue:
+            raise Rejection(503, self.__queue_timeout_seconds, "The queue is full.")
+        deadline = time.monotonic() + self.__queue_timeout_seconds
+        self.__waiting += 1
+        try:
+            while self.__in_flight >= self.__max_in_flight:
+                remaining_seconds = deadline - time.monotonic()
+                if remaining_seconds <= 0:
+                    raise Rejection(
+                        503, self.__queue_timeout_seconds, "The queue wait timed out."
+                    )
+                self.__condition.wait(remaining_seconds)
+        finally:
+            self.__waiting -= 1
+        self.__in_flight += 1
@@ -0,0 +1,91 @@
+import os
+import sys
+import threading
+from collections import Counter
+from types import FrameType
+from typing import Dict, List, Optional
+
+
+class StackSampler:
+    """
+    Profiles a running process by sampling the stacks of all its threads.
+
+    Unlike deterministic profilers, sampling needs no instrumentation of the profiled
+    code, so it can be attached to a serving process for a while at a low cost.
+    The samples are exported as folded stacks, the input format of flame graph tools
+    (e.g. flamegraph.pl or speedscope).
+    """
+
+    DEFAULT_INTERVAL_SECONDS = 0.005
+
+    def __init__(self, interval_seconds: float = DEFAULT_INTERVAL_SECONDS):
+        """
+        Initialize a new StackSampler instance.
+        :param interval_seconds: The interval between samples.
+        """
+        self.__interval_seconds: float = interval_seconds
+        self.__stacks: Counter = Counter()
+        self.__stop_event: threading.Event = threading.Event()
+        self.__thread: Optional[threading.Thread] = None
+
+    def start(self) -> None:
+        """Start sampling in a background thread."""
+        self.__stop_event.clear()
+        self.__thread = threading.Thread(
+            target=self.__sample, name="stack-sampler", daemon=True
+        )
+        self.__thread.start()
+
+    def stop(self) -> None:
+        """Stop sampling."""
+        self.__stop_event.set()
+        if self.__thread is not None:
+            self.__thread.join()
+            self.__thread = None
+
+    def sample_for(self, duration_seconds: float) -> None:
+        """
+        Sample for a while, blocking the calling thread.
+        :param duration_seconds: The sampling duration.
+        """
+        self.start()
+        try:
+            self.__stop_event.wait(duration_seconds)
+        finally:
+            self.stop()
+
+    def to_folded(self) -> str:
+        """
+        Export the samples as folded stacks.
+        :return: The lines with the frames from the root separated by semicolons
+            and the number of samples of the stack.
+        """
+        return "".join(
+            f"{stack} {count}\n" for stack, count in sorted(self.__stacks.items())
+        )
+
+    def __sample(self) -> None:
+        thread_names = {}
+        own_thread_id = threading.get_ident()
+        while not self.__stop_event.wait(self.__interval_seconds):
+            frames: Dict[int, FrameType] = sys._current_frames()
+            if len(thread_names) != len(frames):
+                thread_names = {
+                    thread.ident: thread.name for thread in threading.enumerate()
+                }
+            for thread_id, frame in frames.items():
+                if thread_id == own_thread_id:
+                    continue
+                stack = [thread_names.get(thread_id, str(thread_id))]
+                stack.extend(reversed(StackSampler.__describe_frames(frame)))
+                self.__stacks[";".join(stack)] += 1
+
+    @staticmethod
+    def __describe_frames(frame: Optional[FrameType]) -> List[str]:
+        frames = []
+        while frame is not None:
+            code = frame.f_code
+            file_name = os.path.basename(code.co_filename)
+            frames.append(f"{code.co_name} ({file_name}:{code.co_firstlineno})")
+            frame = frame.f_back
+        return frames
@@ -0,0 +1,211 @@
+import asyncio
+import bisect
+import time
+from typing import Dict, List, Optional, Tuple
+
+import aiohttp
+from aiohttp import web
+
+from storage.core.models.prefix_shard import PrefixShard
+
+FORWARDED_HEADERS = ["Accept"]
+RETURNED_HEADERS = ["Content-Type", "Vary", "Retry-After"]
+
+Route = Tuple[PrefixShard, List[str]]
+
+
+def parse_routes(text: str) -> List[Route]:
+    """
+    Parse the shard routes from their text form.
+
+    :param text: The routes separated by semicolons, every route is a shard and its
+        backend base URLs, e.g. 00000-7FFFF=http://a:5000,http://b:5000;80000-FFFFF=...
+    :return: The shards with their backend base URLs.
+    """
+    routes = []
+    for route in text.split(";"):
+        if not route.strip():
+            continue
+        shard, separator, backends = route.partition("=")
+        urls = [url.strip().rstrip("/") for url in backends.split(",") if url.strip()]
+        if not separator or not urls:
+            raise ValueError(f"The route '{route}' has no backends.")
+        routes.append((PrefixShard.parse(shard), urls))
+    return routes
+
+
+class ShardRouter:
+    """Routes range requests to the backends owning the prefixes."""
+
+    DEFAULT_TIMEOUT_SECONDS = 5
+    DEFAULT_COOL_DOWN_SECONDS = 5
+
+    def __init__(
+        self,
+        routes: List[Route],
+        timeout_seconds: float = DEFAULT_TIMEOUT_SECONDS,
+        cool_down_seconds: float = DEFAULT_COOL_DOWN_SECONDS,
+    ):
+        """
+        Initialize a new ShardRouter instance.
+
+        :param routes: The shards with their backend base URLs. The shards must not
+            overlap and together must cover all hash prefixes.
+        :param timeout_seconds: The timeout of a backend request.
+        :param cool_down_seconds: The time a failed backend is tried only
+            if the other backends of its shard have failed too.
+        """
+        self.__routes: List[Route] = sorted(
+            routes, key=lambda route: route[0].prefix_numbers.start
+        )
+        self.__starts: List[int] = [
+            shard.prefix_numbers.start for shard, _ in self.__routes
+        ]
+        self.__validate_coverage()
+        self.__timeout: aiohttp.ClientTimeout = aiohttp.ClientTimeout(
+            total=timeout_seconds
+        )
+        self.__cool_down_seconds: float = cool_down_seconds
+        self.__failure_ts: Dict[str, float] = {}
+        self.__request_numbers: List[int] = [0] * len(self.__routes)
+        self.__failover_number: int = 0
+        self.__session: Optional[aiohttp.ClientSession] = None
+
+    @property
+    def statistics(self) -> dict:
+        """
+        Get the statistics of routed requests.
+        :return: The statistics.
+        """
+        return {
+            "shards": {
+                str(shard): request_number
+                for (shard, _), request_number in zip(
+                    self.__routes, self.__request_numbers
+                )
+            },
+            "failovers": self.__failover_number,
+            "cooling_down": sorted(
+                url
+                for url, failure_ts in self.__failure_ts.items()
+                if time.monotonic() < failure_ts + self.__cool_down_seconds
+            ),
+        }
+
+    async def open(self) -> None:
+        """Open the connection pool shared by all backend requests."""
+        self.__session = aiohttp.ClientSession(
+            connector=aiohttp.TCPConnector(limit=0), timeout=self.__timeout
+        )
+
+    async def close(self) -> None:
+        """Close the connection pool."""
+        if self.__session is not None:
+            await self.__session.close()
+            self.__session = None
+
+    async def forward(self, request: web.Request) -> web.Response:
+        """
+        Forward a range request to a backend of the shard owning its prefix.
+
+        Backends of a shard are tried in turn, starting from the next one for every
+        request. A failed backend (a connection error or a 5xx response) is tried
+        again only after the cool-down unless the others have failed too.
+
+        :param request: The range request.
+        :return: The backend response.
+        """
+        prefix = request.match_info["prefix"].upper()
+        try:
+            route_index = self.__find_route(prefix)
+        except ValueError:
+            return web.Response(status=400, text="Bad prefix")
+        self.__request_numbers[route_index] += 1
+        headers = {
+            name: request.headers[name]
+            for name in FORWARDED_HEADERS
+            if name in request.headers
+        }
+        response = None
+        for attempt, url in enumerate(self.__get_backend_order(route_index)):
+            if attempt > 0:
+                self.__failover_number += 1
+            try:
+                async with self.__session.get(
+                    f"{url}/range/{prefix}", params=request.query, headers=headers
+                ) as backend_response:
+                    body = await backend_response.read()
+                    response = web.Response(
+                        status=backend_response.status,
+                        body=body,
+                        headers={
+                            name: backend_response.headers[name]
+                            for name in RETURNED_HEADERS
+                            if name in backend_response.headers
+                        },
+                    )
+            except (aiohttp.ClientError, asyncio.TimeoutError):
+                self.__failure_ts[url] = time.monotonic()
+                continue
+            if response.status < 500:
+                self.__failure_ts.pop(url, None)
+                return response
+            self.__failure_ts[url] = time.monotonic()
+        return response or web.Response(status=502, text="No backend is available")
+
+    def __find_route(self, prefix: str) -> int:
+        shard = PrefixShard(prefix, prefix)
+        return bisect.bisect_right(self.__starts, shard.prefix_numbers.start) - 1
+
+    def __get_backend_order(self, route_index: int) -> List[str]:
+        urls = self.__routes[route_index][1]
+        offset = self.__request_numbers[route_index] % len(urls)
+        urls = urls[offset:] + urls[:offset]
+        now = time.monotonic()
+
+        def is_cooling_down(url: str) -> bool:
+            failure_ts = self.__failure_ts.get(url)
+            return (
+                failure_ts is not None and now < failure_ts + self.__cool_down_seconds
+            )
+
+        # Backends cooling down after a failure are moved to the end.
+        return sorted(urls, key=is_cooling_down)
+
+    def __validate_coverage(self) -> None:
+        expected_start = 0
+        for shard, _ in self.__routes:
+            if shard.prefix_numbers.start != expected_start:
+                raise ValueError("The shards must cover all prefixes without overlaps.")
+            expected_start = shard.prefix_numbers.stop
+        if expected_start != PrefixShard.full().prefix_numbers.stop:
+            raise ValueError("The shards must cover all prefixes without overlaps.")
+
+
+def create_router(router: ShardRouter) -> web.Application:
+    """
+    Create the routing front-end of sharded instances.
+
+    :param router: The shard router.
+    :return: The front-end application.
+    """
+
+    async def open_router(app: web.Application) -> None:
+        await router.open()
+
+    async def close_router(app: web.Application) -> None:
+        await router.close()
+
+    async def healthz(request: web.Request) -> web.Response:
+        return web.Response(text="OK")
+
+    async def stats(request: web.Request) -> web.Response:
+        return web.json_response(router.statistics)
+
+    app = web.Application()
+    app.on_startup.append(open_router)
+    app.on_cleanup.append(close_router)
+    app.router.add_get("/range/{prefix}", router.forward)
+    app.router.add_get("/healthz", healthz)
+    app.router.add_get("/stats", stats)
+    return app
@@ -0,0 +1,104 @@
+import heapq
+import operator
+import sys
+import threading
+import time
+from array import array
+from typing import List
+
+from storage.auxiliary.filetools import is_file, lock_file, read, replace
+from storage.auxiliary.pwned.model import PWNED_PREFIX_CAPACITY
+
+# Counters are halved when any of them exceeds the limit,
+# so they never overflow and older traffic gradually loses its weight.
+COUNTER_LIMIT = 1 << 30
+
+
+def read_access_counts(path: str) -> array:
+    """
+    Read persisted access counts of hash prefixes.
+
+    The file contains a little-endian 32-bit counter for every prefix number.
+
+    :param path: The file path.
+    :return: The counts indexed by prefix numbers (zeros if there is no valid file).
+    """
+    if is_file(path):
+        counts = array("I")
+        counts.frombytes(read(path, binary=True))
+        if sys.byteorder != "little":
+            counts.byteswap()
+        if len(counts) == PWNED_PREFIX_CAPACITY:
+            return counts
+    return array("I", bytes(PWNED_PREFIX_CAPACITY * 4))
+
+
+def get_hottest_prefix_numbers(counts: array, amount: int) -> List[int]:
+    """
+    Get the most frequently accessed prefix numbers.
+
+    :param counts: The access counts indexed by prefix numbers.
+    :param amount: The maximum number of prefix numbers.
+    :return: The accessed prefix numbers in descending order of their counts.
+    """
+    hottest = heapq.nlargest(amount, range(len(counts)), key=counts.__getitem__)
+    return [prefix_number for prefix_number in hottest if counts[prefix_number] > 0]
+
+
+class AccessCounter:
+    """Counts accesses of hash prefixes in a fixed-size array and persists them."""
+
+    def __init__(self, path: str, persist_interval_seconds: float):
+        """
+        Initialize a new AccessCounter instance.
+
+        :param path: The file the counts are merged into.
+        :param persist_interval_seconds: The interval of merging new counts into the file.
+        """
+        self.__path: str = path
+        self.__lock_path: str = f"{path}.lock"
+        self.__persist_interval_seconds: float = persist_interval_seconds
+        self.__new_counts: array = AccessCounter.__create_counts()
+        self.__next_persist_ts: float = time.monotonic() + persist_interval_seconds
+        self.__persist_lock: threading.Lock = threading.Lock()
+        # Guards the new counts, which are counted and swapped by different threads.
+        self.__count_lock: threading.Lock = threading.Lock()
+
+    def count(self, prefix_number: int) -> None:
+        """
+        Count an access of a hash prefix.
+
+        New counts are merged into the file in the background once in an interval.
+
+        :param prefix_number: The prefix number.
+        """
+        with self.__count_lock:
+            self.__new_counts[prefix_number] += 1
+        if time.monotonic() >= self.__next_persist_ts:
+            self.__next_persist_ts = time.monotonic() + self.__persist_interval_seconds
+            threading.Thread(target=self.persist, daemon=True).start()
+
+    def persist(self) -> None:
+        """
+        Merge new counts into the file.
+
+        Several processes can share the file: each one adds only its own new counts
+        while holding a lock of all processes, so concurrent merges are not lost.
+        """
+        with self.__persist_lock, lock_file(self.__lock_path):
+            fresh_counts = AccessCounter.__create_counts()
+            with self.__count_lock:
+                new_counts = self.__new_counts
+                self.__new_counts = fresh_counts
+            counts = array(
+                "I", map(operator.add, read_access_counts(self.__path), new_counts)
+            )
+            if max(counts) > COUNTER_LIMIT:
+                counts = array("I", (count >> 1 for count in counts))
+            if sys.byteorder != "little":
+                counts.byteswap()
+            replace(self.__path, counts.tobytes(), sync=False, binary=True)
+
+    @staticmethod
+    def __create_counts() -> array:
+        return array("I", bytes(PWNED_PREFIX_CAPACITY * 4))
@@ -0,0 +1,183 @@
+import hashlib
+import os
+import struct
+import sys
+import zlib
+from array import array
+from typing import Dict, Iterable, List, Optional, Tuple
+
+from storage.auxiliary.filetools import is_file, join_paths, read, replace
+from storage.auxiliary.pwned.model import PWNED_PREFIX_CAPACITY
+
+# The digest file layout (all numbers are little-endian):
+#   header:  magic, generation
+#   digests: the 64-bit digest of the range of every prefix (0 for unknown ranges)
+DIGEST_MAGIC = b"PWNDGST1"
+DIGEST_HEADER = struct.Struct("<8sQ")
+DIGEST_SIZE = 8
+
+# A change record of a generation contains the generation it was made from
+# and the compressed bitmap of the prefixes whose ranges changed since then.
+CHANGE_MAGIC = b"PWNCHNG1"
+CHANGE_HEADER = struct.Struct("<8sQ")
+CHANGE_FILE_SUFFIX = ".bin"
+
+
+def compute_digest(data: bytes) -> int:
+    """
+    Compute the digest of a range.
+
+    :param data: The range content.
+    :return: The nonzero 64-bit digest.
+    """
+    digest = int.from_bytes(
+        hashlib.blake2b(data, digest_size=DIGEST_SIZE).digest(), "little"
+    )
+    return digest or 1
+
+
+def read_digests(path: str) -> Tuple[int, array]:
+    """
+    Read the range digests of a dataset generation.
+
+    :param path: The digest file path.
+    :return: The generation and the digests indexed by prefix numbers
+        (generation 0 and zeros if there is no valid file).
+    """
+    if is_file(path):
+        content = read(path, binary=True)
+        if len(content) == DIGEST_HEADER.size + DIGEST_SIZE * PWNED_PREFIX_CAPACITY:
+            magic, generation = DIGEST_HEADER.unpack_from(content)
+            if magic == DIGEST_MAGIC:
+                digests = array("Q")
+                digests.frombytes(content[DIGEST_HEADER.size :])
+                if sys.byteorder != "little":
+                    digests.byteswap()
+                return generation, digests
+    return 0, array("Q", bytes(DIGEST_SIZE * PWNED_PREFIX_CAPACITY))
+
+
+def write_digests(path: str, generation: int, digests: array) -> None:
+    """
+    Save the range digests of a dataset generation.
+
+    :param path: The digest file path.
+    :param generation: The generation.
+    :param digests: The digests indexed by prefix numbers.
+    """
+    digests = array("Q", digests)
+    if sys.byteorder != "little":
+        digests.byteswap()
+    content = DIGEST_HEADER.pack(DIGEST_MAGIC, generation) + digests.tobytes()
+    replace(path, content, sync=False, binary=True)
+
+
+def record_changes(
+    changes_dir: str,
+    generation: int,
+    base_generation: int,
+    prefix_numbers: Iterable[int],
+    history_length: int,
+) -> None:
+    """
+    Record the prefixes whose ranges changed in a generation.
+
+    Records of the generations older than the history are removed.
+
+    :param changes_dir: The directory of change records.
+    :param generation: The new generation.
+    :param base_generation: The generation the changes were made from.
+    :param prefix_numbers: The numbers of the changed prefixes.
+    :param history_length: The number of the latest generations to keep records of.
+    """
+    bitmap = bytearray(PWNED_PREFIX_CAPACITY // 8)
+    for prefix_number in prefix_numbers:
+        bitmap[prefix_number >> 3] |= 1 << (prefix_number & 7)
+    content = CHANGE_HEADER.pack(CHANGE_MAGIC, base_generation) + zlib.compress(
+        bytes(bitmap)
+    )
+    replace(__get_change_path(changes_dir, generation), content, binary=True)
+    for file_name in os.listdir(changes_dir):
+        stem = file_name[: -len(CHANGE_FILE_SUFFIX)]
+        if stem.isdigit() and int(stem) <= generation - history_length:
+            os.remove(join_paths(changes_dir, file_name))
+
+
+def read_changes_since(
+    changes_dir: str, since_generation: int, generation: int, max_lookback: int
+) -> Optional[List[int]]:
+    """
+    Collect the prefixes whose ranges changed after a generation.
+
+    :param changes_dir: The directory of change records.
+    :param since_generation: The generation known to the consumer.
+    :param generation: The current generation.
+    :param max_lookback: The maximum number of generations to collect the changes of,
+        so a request for old changes does not merge a large number of records.
+    :return: The numbers of the changed prefixes in ascending order or None
+        if the records do not reach back to the given generation or it is older
+        than the lookback allows (so a full resync is required).
+    """
+    if generation - since_generation > max_lookback:
+        return None
+    changed = 0
+    while generation > since_generation:
+        change = __read_change(changes_dir, generation)
+        if change is None:
+            return None
+        generation, bitmap = change
+        # Bitmaps are merged as big integers, which is much faster than byte by byte.
+        changed |= int.from_bytes(bitmap, "little")
+    bitmap = changed.to_bytes(PWNED_PREFIX_CAPACITY // 8, "little")
+    return [
+        (byte_index << 3) + bit
+        for byte_index, byte in enumerate(bitmap)
+        if byte
+        for bit in range(8)
+        if byte >> bit & 1
+    ]
+
+
+def update_digests(
+    path: str, base_generation: int, generation: int, digests: Dict[int, int]
+) -> bool:
+    """
+    Update some range digests of a generation and save them as a new generation.
+
+    The file is replaced atomically, so a crash never leaves it partially updated.
+
+    :param path: The digest file path.
+    :param base_generation: The generation the digests were updated from.
+    :param generation: The new generation.
+    :param digests: The new digests by prefix numbers.
+    :return: True if the digests have been updated, False if the file does not
+        contain the digests of the base generation.
+    """
+    digest_generation, all_digests = read_digests(path)
+    if digest_generation != base_generation:
+        return False
+    for prefix_number, digest in digests.items():
+        all_digests[prefix_number] = digest
+    write_digests(path, generation, all_digests)
+    return True
+
+
+def __get_change_path(changes_dir: str, generation: int) -> str:
+    return join_paths(changes_dir, f"{generation}{CHANGE_FILE_SUFFIX}")
+
+
+def __read_change(changes_dir: str, generation: int) -> Optional[Tuple[int, bytes]]:
+    path = __get_change_path(changes_dir, generation)
+    if not is_file(path):
+        return None
+    content = read(path, binary=True)
+    if len(content) < CHANGE_HEADER.size:
+        return None
+    magic, base_generation = CHANGE_HEADER.unpack_from(content)
+    if magic != CHANGE_MAGIC or base_generation >= generation:
+        return None
+    try:
+        bitmap = zlib.decompress(content[CHANGE_HEADER.size :])
+    except zlib.error:
+        return None
+    return base_generation, bitmap
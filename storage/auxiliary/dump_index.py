@@ -0,0 +1,107 @@
+import mmap
+import os
+import struct
+import sys
+from array import array
+from typing import Callable, Optional
+
+from storage.auxiliary.filetools import is_file, read, replace
+from storage.auxiliary.numeration import number_to_hex_code
+from storage.auxiliary.pwned.model import PWNED_PREFIX_CAPACITY, PWNED_PREFIX_LENGTH
+
+# The index layout (all numbers are little-endian):
+#   header:  magic, dump file size, dump file modification time in nanoseconds
+#   offsets: the offset of the first line of every prefix and the dump file size
+# An index is valid only for the dump file it was built for.
+MAGIC = b"PWNDIDX1"
+HEADER = struct.Struct("<8sQQ")
+INDEX_SUFFIX = ".idx"
+
+# The start of the next prefix is searched within a window after the current one,
+# longer ranges (or gaps between prefixes) are walked line by line.
+SEARCH_WINDOW_SIZE = 1 << 22
+PROGRESS_REPORT_INTERVAL = 1 << 12
+
+
+def build_dump_index(
+    data: mmap.mmap, on_indexed: Optional[Callable[[int], None]] = None
+) -> array:
+    """
+    Build the offset index of a dump file in one sequential scan.
+
+    The dump contains upper-case hashes with their leak occasion numbers,
+    one record per line, sorted by hashes.
+
+    :param data: The mapped dump file.
+    :param on_indexed: A function called with the number of newly indexed prefixes.
+    :return: The offsets of the first lines of all prefixes followed by the file size,
+        so the range of a prefix number N lies between offsets N and N + 1.
+    """
+    offsets = array("Q", bytes(8 * (PWNED_PREFIX_CAPACITY + 1)))
+    size = len(data)
+    position = 0
+    for prefix_number in range(PWNED_PREFIX_CAPACITY):
+        offsets[prefix_number] = position
+        prefix = number_to_hex_code(prefix_number, PWNED_PREFIX_CAPACITY).encode()
+        if (
+            on_indexed is not None
+            and (prefix_number + 1) % PROGRESS_REPORT_INTERVAL == 0
+        ):
+            on_indexed(PROGRESS_REPORT_INTERVAL)
+        if data[position : position + PWNED_PREFIX_LENGTH] != prefix:
+            # The prefix has no records.
+            continue
+        if prefix_number + 1 < PWNED_PREFIX_CAPACITY:
+            next_prefix = number_to_hex_code(prefix_number + 1, PWNED_PREFIX_CAPACITY)
+            next_position = data.find(
+                b"\n" + next_prefix.encode(),
+                position,
+                position + SEARCH_WINDOW_SIZE,
+            )
+            if next_position >= 0:
+                position = next_position + 1
+                continue
+        while data[position : position + PWNED_PREFIX_LENGTH] == prefix:
+            line_end = data.find(b"\n", position)
+            position = size if line_end < 0 else line_end + 1
+    offsets[PWNED_PREFIX_CAPACITY] = size
+    return offsets
+
+
+def read_dump_index(index_path: str, data_file_path: str) -> Optional[array]:
+    """
+    Read the offset index of a dump file.
+
+    :param index_path: The index file path.
+    :param data_file_path: The dump file path.
+    :return: The offsets or None if there is no valid index for the current dump file.
+    """
+    if not is_file(index_path):
+        return None
+    content = read(index_path, binary=True)
+    if len(content) != HEADER.size + 8 * (PWNED_PREFIX_CAPACITY + 1):
+        return None
+    stat = os.stat(data_file_path)
+    if HEADER.unpack_from(content) != (MAGIC, stat.st_size, stat.st_mtime_ns):
+        return None
+    offsets = array("Q")
+    offsets.frombytes(content[HEADER.size :])
+    if sys.byteorder != "little":
+        offsets.byteswap()
+    return offsets
+
+
+def write_dump_index(index_path: str, data_file_path: str, offsets: array) -> None:
+    """
+    Save the offset index of a dump file.
+
+    :param index_path: The index file path.
+    :param data_file_path: The dump file path.
+    :param offsets: The offsets built by `build_dump_index`.
+    """
+    stat = os.stat(data_file_path)
+    offsets = array("Q", offsets)
+    if sys.byteorder != "little":
+        offsets.byteswap()
+    content = HEADER.pack(MAGIC, stat.st_size, stat.st_mtime_ns) + offsets.tobytes()
+    replace(index_path, content, sync=False, binary=True)
@@ -1,7 +1,17 @@
+import ctypes
+import ctypes.util
 import os
 import shutil
+import threading
+from contextlib import contextmanager
 from enum import Enum
-from typing import List, Optional, Union
+from typing import Iterator, List, Optional, Union
+
+try:
+    import fcntl
+except ImportError:
+    # Not available on Windows, where files are locked only within a process.
+    fcntl = None
 
 
 class Encoding(Enum):
@@ -41,6 +51,19 @@ def is_dir(path: str) -> bool:
     return os.path.exists(path) and os.path.isdir(path)
 
 
+def get_modification_time(path: str) -> Optional[int]:
+    """
+    Get the modification time of a file.
+
+    :param path: The path to the file.
+    :return: The modification time in nanoseconds or None if the file does not exist.
+    """
+    try:
+        return os.stat(path).st_mtime_ns
+    except FileNotFoundError:
+        return None
+
+
 def clear_dir(path: str) -> None:
     """
     Clear all files and subdirectories in a directory.
@@ -55,6 +78,20 @@ def clear_dir(path: str) -> None:
             os.remove(join_paths(path, file_path))
 
 
+def remove_temp_files(path: str) -> None:
+    """
+    Remove temporary files left in a directory by interrupted replacements.
+
+    Must not be called while other processes replace files in the directory.
+
+    :param path: Directory path.
+    """
+    if os.path.isdir(path):
+        for entry in os.scandir(path):
+            if entry.is_file() and entry.name.endswith(".tmp"):
+                os.remove(entry.path)
+
+
 def make_dir_if_not_exists(path: str) -> None:
     """
     Create a directory if it does not exist.
@@ -100,23 +137,156 @@ def read(path: str, binary=False, encoding: Optional[Encoding] = None) -> str:
         return file.read()
 
 
+def prefetch(path: str) -> int:
+    """
+    Ask the OS to load a file into the page cache.
+
+    The file is read where advisory calls are not supported.
+
+    :param path: File path.
+    :return: The file size in bytes.
+    """
+    if not hasattr(os, "posix_fadvise"):
+        return len(read(path, binary=True))
+    file_descriptor = os.open(path, os.O_RDONLY)
+    try:
+        os.posix_fadvise(file_descriptor, 0, 0, os.POSIX_FADV_WILLNEED)
+        return os.fstat(file_descriptor).st_size
+    finally:
+        os.close(file_descriptor)
+
+
 def write(
     path: str,
-    lines: Union[str, List[str]],
+    lines: Union[str, bytes, List[str]],
     overwrite=False,
     encoding: Encoding = Encoding.ASCII,
+    binary=False,
 ) -> None:
     """
     Write lines to a file.
 
     :param path: File path.
-    :param lines: Lines to write (either a string or a list of strings).
+    :param lines: Lines to write (either a string, bytes or a list of strings).
     :param overwrite: Whether to overwrite the file (default is False).
     :param encoding: File encoding.
+    :param binary: Whether to open the file in binary mode.
     """
-    mode = "w" if overwrite else "a"
-    with open(path, mode, encoding=encoding.value) as file:
-        if isinstance(lines, str):
+    mode = ("w" if overwrite else "a") + ("b" if binary else "")
+    encoding = None if binary else encoding.value
+    with open(path, mode, encoding=encoding) as file:
+        if isinstance(lines, (str, bytes)):
             file.write(lines)
         else:
             file.writelines(lines)
+
+
+def replace(
+    path: str,
+    lines: Union[str, bytes, List[str]],
+    encoding: Encoding = Encoding.ASCII,
+    sync=True,
+    binary=False,
+) -> None:
+    """
+    Atomically replace the content of a file.
+
+    The content is written to a temporary file which is then renamed over the target,
+    so readers observe either the old or the new content, never a torn one.
+
+    :param path: File path.
+    :param lines: Lines to write (either a string, bytes or a list of strings).
+    :param encoding: File encoding.
+    :param sync: Whether to make the replacement durable before returning.
+    :param binary: Whether to open the file in binary mode.
+    """
+    temp_path = f"{path}.{os.getpid()}-{threading.get_ident()}.tmp"
+    mode = "wb" if binary else "w"
+    encoding = None if binary else encoding.value
+    with open(temp_path, mode, encoding=encoding) as file:
+        if isinstance(lines, (str, bytes)):
+            file.write(lines)
+        else:
+            file.writelines(lines)
+        if sync:
+            file.flush()
+            os.fsync(file.fileno())
+    os.replace(temp_path, path)
+    if sync:
+        sync_dir_entries(os.path.dirname(os.path.abspath(path)))
+
+
+@contextmanager
+def lock_file(path: str, shared=False) -> Iterator[None]:
+    """
+    Hold a lock shared by all processes (an advisory lock of a file).
+
+    The lock file is created if it does not exist and is never removed.
+
+    :param path: Lock file path.
+    :param shared: Whether to hold a shared lock, which can be held by several
+        holders at once but not together with an exclusive one.
+    """
+    with open(path, "a") as file:
+        if fcntl is not None:
+            fcntl.flock(file.fileno(), fcntl.LOCK_SH if shared else fcntl.LOCK_EX)
+        try:
+            yield
+        finally:
+            if fcntl is not None:
+                fcntl.flock(file.fileno(), fcntl.LOCK_UN)
+
+
+def sync_dir_entries(path: str) -> None:
+    """
+    Flush the entries (created, renamed and removed files) of a directory to the disk.
+
+    Does nothing on platforms where directories cannot be opened (e.g. Windows).
+
+    :param path: Directory path.
+    """
+    try:
+        dir_fd = os.open(path, os.O_RDONLY)
+    except OSError:
+        return
+    try:
+        os.fsync(dir_fd)
+    except OSError:
+        pass
+    finally:
+        os.close(dir_fd)
+
+
+def sync_file_system(path: str) -> None:
+    """
+    Flush all buffered data of the directory to the disk in a single batched pass.
+
+    Uses one ``syncfs`` call for the file system containing the directory where it is
+    available, a global ``sync`` otherwise, and syncs the files one by one only as the
+    last resort.
+
+    :param path: Directory path.
+    """
+    if __syncfs(path):
+        return
+    if hasattr(os, "sync"):
+        os.sync()
+        return
+    for dir_path, _, file_names in os.walk(path):
+        for file_name in file_names:
+            with open(join_paths(dir_path, file_name), "rb+") as file:
+                os.fsync(file.fileno())
+
+
+def __syncfs(path: str) -> bool:
+    library_name = ctypes.util.find_library("c")
+    if library_name is None:
+        return False
+    syncfs = getattr(ctypes.CDLL(library_name, use_errno=True), "syncfs", None)
+    if syncfs is None:
+        return False
+    dir_fd = os.open(path, os.O_RDONLY)
+    try:
+        return syncfs(dir_fd) == 0
+    finally:
+        os.close(dir_fd)
@@ -0,0 +1,46 @@
+from collections import deque
+from typing import Deque, Optional
+
+
+class LatencyTracker:
+    """Tracks a percentile of recent latencies."""
+
+    SAMPLE_NUMBER = 1000
+    MIN_SAMPLE_NUMBER = 100
+    RECALCULATION_INTERVAL = 100
+
+    def __init__(self, percentile: float):
+        """
+        Initialize a new LatencyTracker instance.
+        :param percentile: The percentile to be tracked (from 0 to 100).
+        """
+        self.__percentile: float = percentile
+        self.__samples: Deque[float] = deque(maxlen=LatencyTracker.SAMPLE_NUMBER)
+        self.__new_sample_number: int = 0
+        self.__value: Optional[float] = None
+
+    @property
+    def value(self) -> Optional[float]:
+        """
+        Get the percentile of recent latencies.
+        :return: The latency in seconds or None if there are not enough samples yet.
+        """
+        return self.__value
+
+    def add(self, latency: float) -> None:
+        """
+        Add a latency sample.
+        :param latency: The latency in seconds.
+        """
+        self.__samples.append(latency)
+        self.__new_sample_number += 1
+        if len(self.__samples) < LatencyTracker.MIN_SAMPLE_NUMBER:
+            return
+        if self.__value is not None and (
+            self.__new_sample_number < LatencyTracker.RECALCULATION_INTERVAL
+        ):
+            return
+        self.__new_sample_number = 0
+        samples = sorted(self.__samples)
+        index = min(len(samples) - 1, int(len(samples) * self.__percentile / 100))
+        self.__value = samples[index]
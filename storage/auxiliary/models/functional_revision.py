@@ -60,6 +60,11 @@ class FunctionalRevision(Revision):
         self._progress = 0
         self._status = Revision.Status.PREPARATION
 
+    def indicate_warming_up(self) -> None:
+        """Indicate that the prepared data is being loaded into the page cache."""
+        self._progress = 0
+        self._status = Revision.Status.WARM_UP
+
     def indicate_prepared(self) -> None:
         """Indicate that the preparation has completed."""
         self._progress = None
@@ -34,7 +34,8 @@ class PwnedStorageState:
         :param active_dataset: The currently active dataset.
         """
         self.__active_dataset: Optional[DatasetID] = active_dataset
-        self.__is_to_be_ignored: bool = False
+        self.__generation: int = 0
+        self.__is_partial: bool = False
         self.__active_requests: int = 0
 
     @property
@@ -55,12 +56,38 @@ class PwnedStorageState:
         self.__active_dataset = value
 
     @property
-    def is_to_be_ignored(self) -> bool:
+    def generation(self) -> int:
         """
-        Check if the state should be ignored.
-        :return: True if the state should be ignored, False otherwise.
+        Get the generation of the active dataset.
+        :return: The generation number (0 if there is no active dataset).
         """
-        return self.__is_to_be_ignored
+        return self.__generation
+
+    @generation.setter
+    def generation(self, value: int) -> None:
+        """
+        Set the generation of the active dataset.
+
+        :param value: The generation number.
+        """
+        self.__generation = value
+
+    @property
+    def is_partial(self) -> bool:
+        """
+        Check if the active dataset is being populated lazily.
+        :return: True if some ranges of the active dataset may be missing.
+        """
+        return self.__is_partial
+
+    @is_partial.setter
+    def is_partial(self, value: bool) -> None:
+        """
+        Set whether the active dataset is being populated lazily.
+
+        :param value: Whether some ranges of the active dataset may be missing.
+        """
+        self.__is_partial = value
 
     @property
     def has_active_requests(self) -> bool:
@@ -78,17 +105,13 @@ class PwnedStorageState:
         """Decrement the count of active requests."""
         self.__active_requests -= 1
 
-    def mark_to_be_ignored(self) -> None:
-        """Mark the state to be ignored."""
-        self.__is_to_be_ignored = True
-
-    def mark_not_to_be_ignored(self) -> None:
-        """Mark the state not to be ignored."""
-        self.__is_to_be_ignored = False
-
 
 class StoredStateKeys:
     """Keys used for storing state information."""
 
     ACTIVE_DATASET = "dataset"
+    GENERATION = "generation"
+    PARTIAL = "partial"
+    SHARD = "shard"
+    # Written by versions that did not replace the state file atomically.
     IGNORE_STATE_IN_FILE = "ignore"
@@ -0,0 +1,57 @@
+import threading
+from collections import OrderedDict
+from typing import Hashable, Optional, Union
+
+
+class RangeCache:
+    """Thread-safe in-memory LRU cache of ranges."""
+
+    def __init__(self, capacity: int):
+        """
+        Initialize a new RangeCache instance.
+        :param capacity: The maximum number of cached ranges (0 disables the cache).
+        """
+        self.__capacity: int = capacity
+        self.__lock: threading.Lock = threading.Lock()
+        self.__ranges: OrderedDict = OrderedDict()
+
+    def get(self, key: Hashable) -> Optional[Union[str, bytes]]:
+        """
+        Get a cached range.
+
+        :param key: The key of the range.
+        :return: The range or None if it is not cached.
+        """
+        if self.__capacity == 0:
+            return None
+        with self.__lock:
+            records = self.__ranges.get(key)
+            if records is not None:
+                self.__ranges.move_to_end(key)
+            return records
+
+    def put(self, key: Hashable, records: Union[str, bytes]) -> None:
+        """
+        Cache a range, evicting the least recently used one if the cache is full.
+
+        :param key: The key of the range.
+        :param records: The range.
+        """
+        if self.__capacity == 0:
+            return
+        with self.__lock:
+            self.__ranges[key] = records
+            self.__ranges.move_to_end(key)
+            while len(self.__ranges) > self.__capacity:
+                self.__ranges.popitem(last=False)
+
+    def remove(self, key: Hashable) -> None:
+        """
+        Remove a range from the cache if it is cached.
+
+        :param key: The key of the range.
+        """
+        if self.__capacity == 0:
+            return
+        with self.__lock:
+            self.__ranges.pop(key, None)
@@ -0,0 +1,313 @@
+import asyncio
+import multiprocessing
+import pickle
+import queue
+import time
+from array import array
+from concurrent.futures import ThreadPoolExecutor
+from multiprocessing.synchronize import Event
+from typing import Callable, Iterable, List, MutableSequence, Optional, Sequence, Tuple
+
+from storage.auxiliary.change_log import compute_digest
+from storage.auxiliary.filetools import join_paths, write
+from storage.auxiliary.numeration import number_to_hex_code
+from storage.auxiliary.pwned.model import PWNED_PREFIX_CAPACITY
+from storage.core.models.pipeline_statistics import PipelineStatistics
+from storage.core.models.range_provider import PwnedRangeProvider
+
+DEFAULT_WRITER_NUMBER = 4
+DEFAULT_QUEUE_SIZE = 1024
+WRITE_BATCH_SIZE = 64
+PROGRESS_REPORT_INTERVAL = 256
+WORKER_POLL_INTERVAL_SECONDS = 0.5
+WORKER_STOP_TIMEOUT_SECONDS = 10
+
+# Messages sent by worker processes.
+PROGRESS = "progress"
+DONE = "done"
+FAILED = "failed"
+
+
+async def download_ranges(
+    provider: PwnedRangeProvider,
+    dataset_dir: str,
+    prefix_numbers: Iterable[int],
+    coroutine_number: int,
+    on_downloaded: Callable[[int], None],
+    writer_number: int = DEFAULT_WRITER_NUMBER,
+    queue_size: int = DEFAULT_QUEUE_SIZE,
+    digests: Optional[MutableSequence[int]] = None,
+) -> PipelineStatistics:
+    """
+    Download ranges into a dataset directory.
+
+    Fetching and writing are separate stages connected by a bounded queue. Fetching
+    coroutines take the next prefix as soon as they are free, so a slow response
+    delays only one coroutine. Writers drain the queue in batches and write them in
+    a thread pool, so disk latency does not stall the event loop. If the writers
+    fall behind, the fetchers wait for free slots in the queue.
+
+    :param provider: The provider of ranges.
+    :param dataset_dir: The directory to write range files to.
+    :param prefix_numbers: The numbers of the prefixes to download.
+    :param coroutine_number: The number of fetching coroutines.
+    :param on_downloaded: A function called with the number of newly written ranges.
+    :param writer_number: The number of writer threads.
+    :param queue_size: The maximum number of fetched ranges waiting to be written.
+    :param digests: The sequence indexed by prefix numbers to store the digests
+        of the written ranges in (computed by the writers, see `change_log`).
+    :return: The statistics of the stages.
+    """
+    prefix_iterator = iter(prefix_numbers)
+    fetched_ranges: asyncio.Queue = asyncio.Queue(queue_size)
+    executor = ThreadPoolExecutor(writer_number)
+    fetch_seconds, backpressure_seconds, write_seconds = 0.0, 0.0, 0.0
+    range_number, write_batch_number = 0, 0
+    queue_depth_sum, queue_sample_number, max_queue_depth = 0, 0, 0
+
+    async def fetch() -> None:
+        nonlocal fetch_seconds, backpressure_seconds
+        nonlocal queue_depth_sum, queue_sample_number, max_queue_depth
+        for prefix_number in prefix_iterator:
+            hash_prefix = number_to_hex_code(prefix_number, PWNED_PREFIX_CAPACITY)
+            fetch_start_ts = time.monotonic()
+            records = await provider.get_range(hash_prefix)
+            put_start_ts = time.monotonic()
+            await fetched_ranges.put((prefix_number, hash_prefix, records))
+            fetch_seconds += put_start_ts - fetch_start_ts
+            backpressure_seconds += time.monotonic() - put_start_ts
+            queue_depth_sum += fetched_ranges.qsize()
+            queue_sample_number += 1
+            max_queue_depth = max(max_queue_depth, fetched_ranges.qsize())
+
+    def write_batch(batch: List[Tuple[int, str, str]]) -> float:
+        start_ts = time.monotonic()
+        for prefix_number, hash_prefix, records in batch:
+            write(
+                join_paths(dataset_dir, f"{hash_prefix}.txt"), records, overwrite=True
+            )
+            if digests is not None:
+                digests[prefix_number] = compute_digest(records.encode())
+        return time.monotonic() - start_ts
+
+    async def write_ranges() -> None:
+        nonlocal write_seconds, range_number, write_batch_number
+        loop = asyncio.get_running_loop()
+        is_finished = False
+        while not is_finished:
+            batch = []
+            item = await fetched_ranges.get()
+            # Ranges queued meanwhile are coalesced into one hop to the thread pool.
+            while item is not None:
+                batch.append(item)
+                if len(batch) == WRITE_BATCH_SIZE or fetched_ranges.empty():
+                    break
+                item = fetched_ranges.get_nowait()
+            is_finished = item is None
+            if batch:
+                write_seconds += await loop.run_in_executor(
+                    executor, write_batch, batch
+                )
+                range_number += len(batch)
+                write_batch_number += 1
+                on_downloaded(len(batch))
+
+    async def fetch_all() -> None:
+        await asyncio.gather(*fetchers)
+        # Every writer stops after taking one end mark.
+        for _ in writers:
+            await fetched_ranges.put(None)
+
+    await provider.open()
+    fetchers = [asyncio.ensure_future(fetch()) for _ in range(coroutine_number)]
+    writers = [asyncio.ensure_future(write_ranges()) for _ in range(writer_number)]
+    tasks = fetchers + writers
+    try:
+        await asyncio.gather(fetch_all(), *writers)
+    finally:
+        for task in tasks:
+            task.cancel()
+        await asyncio.gather(*tasks, return_exceptions=True)
+        await asyncio.to_thread(executor.shutdown)
+        await provider.close()
+    return PipelineStatistics(
+        range_number,
+        fetch_seconds,
+        write_seconds,
+        backpressure_seconds,
+        write_batch_number,
+        queue_depth_sum,
+        queue_sample_number,
+        max_queue_depth,
+    )
+
+
+async def download_ranges_in_processes(
+    provider: PwnedRangeProvider,
+    dataset_dir: str,
+    prefix_numbers: Sequence[int],
+    process_number: int,
+    coroutine_number: int,
+    on_downloaded: Callable[[int], None],
+    writer_number: int = DEFAULT_WRITER_NUMBER,
+    digests: Optional[array] = None,
+) -> PipelineStatistics:
+    """
+    Download ranges into a dataset directory from several worker processes.
+
+    The prefixes are dealt out to the processes in turn, keeping their order. Every
+    process runs its own event loop with its own copy of the provider and reports its
+    progress back. If any process fails or the download is cancelled, all processes
+    are stopped.
+
+    :param provider: The provider of ranges (copied to the processes by pickling).
+    :param dataset_dir: The directory to write range files to.
+    :param prefix_numbers: The numbers of the prefixes to download.
+    :param process_number: The number of worker processes.
+    :param coroutine_number: The number of coroutines in every process.
+    :param on_downloaded: A function called with the number of newly downloaded ranges.
+    :param writer_number: The number of writer threads in every process.
+    :param digests: The array indexed by prefix numbers to store the digests
+        of the written ranges in (computed by the writers of all processes).
+    :return: The combined statistics of the stages of all processes.
+    """
+    # Spawned processes do not inherit the threads and the event loop of the parent.
+    context = multiprocessing.get_context("spawn")
+    messages = context.Queue()
+    cancellation = context.Event()
+    # The processes store the digests of their ranges in shared memory.
+    shared_digests = None if digests is None else context.RawArray("Q", len(digests))
+    processes = [
+        context.Process(
+            target=download_shard,
+            args=(
+                provider,
+                dataset_dir,
+                prefix_numbers[process_index::process_number],
+                coroutine_number,
+                writer_number,
+                messages,
+                cancellation,
+                shared_digests,
+            ),
+            daemon=True,
+        )
+        for process_index in range(process_number)
+    ]
+    for process in processes:
+        process.start()
+    finished_process_number = 0
+    pipeline_statistics = []
+    try:
+        while finished_process_number < process_number:
+            try:
+                kind, value = await asyncio.to_thread(
+                    messages.get, True, WORKER_POLL_INTERVAL_SECONDS
+                )
+            except queue.Empty:
+                if any(process.exitcode not in [None, 0] for process in processes):
+                    raise RuntimeError("A download process has exited unexpectedly.")
+                continue
+            if kind == PROGRESS:
+                on_downloaded(value)
+            elif kind == DONE:
+                finished_process_number += 1
+                request_statistics, statistics = value
+                pipeline_statistics.append(statistics)
+                # Request statistics (if the provider has them) are gathered back.
+                if request_statistics is not None and hasattr(
+                    provider, "include_statistics"
+                ):
+                    provider.include_statistics(request_statistics)
+            else:
+                raise value
+    finally:
+        cancellation.set()
+        await asyncio.to_thread(lambda: __stop_processes(processes, messages))
+    if digests is not None:
+        digests[:] = array("Q", bytes(shared_digests))
+    return PipelineStatistics.combine(pipeline_statistics)
+
+
+def download_shard(
+    provider: PwnedRangeProvider,
+    dataset_dir: str,
+    prefix_numbers: Sequence[int],
+    coroutine_number: int,
+    writer_number: int,
+    messages: multiprocessing.Queue,
+    cancellation: Event,
+    digests: Optional[MutableSequence[int]] = None,
+) -> None:
+    """
+    Download the ranges of a part of prefixes in a worker process.
+
+    :param provider: The provider of ranges.
+    :param dataset_dir: The directory to write range files to.
+    :param prefix_numbers: The numbers of the prefixes of the part.
+    :param coroutine_number: The number of fetching coroutines.
+    :param writer_number: The number of writer threads.
+    :param messages: The queue of messages to the parent process: (PROGRESS, range
+        amount), (DONE, (request statistics, pipeline statistics)) or (FAILED, error).
+    :param cancellation: The event set when the download has to be stopped.
+    :param digests: The shared sequence indexed by prefix numbers to store the digests
+        of the written ranges in.
+    """
+    unreported_amount = 0
+
+    def on_downloaded(amount: int) -> None:
+        nonlocal unreported_amount
+        unreported_amount += amount
+        if unreported_amount >= PROGRESS_REPORT_INTERVAL:
+            messages.put((PROGRESS, unreported_amount))
+            unreported_amount = 0
+            if cancellation.is_set():
+                raise RuntimeError("The download has been cancelled.")
+
+    try:
+        pipeline_statistics = asyncio.run(
+            download_ranges(
+                provider,
+                dataset_dir,
+                prefix_numbers,
+                coroutine_number,
+                on_downloaded,
+                writer_number,
+                digests=digests,
+            )
+        )
+        messages.put((PROGRESS, unreported_amount))
+        request_statistics = getattr(provider, "statistics", None)
+        messages.put((DONE, (request_statistics, pipeline_statistics)))
+    except Exception as error:
+        messages.put((FAILED, __to_transferable_error(error)))
+
+
+def __to_transferable_error(error: Exception) -> Exception:
+    # Queued objects are pickled in a background thread that drops failures silently.
+    try:
+        return pickle.loads(pickle.dumps(error))
+    except Exception:
+        return RuntimeError(repr(error))
+
+
+def __stop_processes(
+    processes: List[multiprocessing.Process], messages: multiprocessing.Queue
+) -> None:
+    deadline = time.monotonic() + WORKER_STOP_TIMEOUT_SECONDS
+    for process in processes:
+        while process.is_alive() and time.monotonic() < deadline:
+            # A process does not exit until its queued messages are consumed.
+            __drain(messages)
+            process.join(WORKER_POLL_INTERVAL_SECONDS)
+        if process.is_alive():
+            process.terminate()
+            process.join()
+
+
+def __drain(messages: multiprocessing.Queue) -> None:
+    try:
+        while True:
+            messages.get_nowait()
+    except queue.Empty:
+        pass
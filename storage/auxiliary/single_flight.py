@@ -0,0 +1,73 @@
+import asyncio
+import threading
+from concurrent.futures import Future, ThreadPoolExecutor
+from typing import Callable, Dict, Hashable, TypeVar
+
+from storage.core.models.coalescing_statistics import CoalescingStatistics
+
+T = TypeVar("T")
+
+
+class SingleFlight:
+    """
+    Coalesces concurrent identical calls into one shared execution.
+
+    Calls are identified by keys; the first call for a key starts the execution in a
+    thread pool, and the calls made for the same key before it is finished share its
+    result (or its error). Works across threads and event loops.
+    """
+
+    def __init__(self, thread_number: int):
+        """
+        Initialize a new SingleFlight instance.
+        :param thread_number: The maximum number of executions running at once.
+        """
+        self.__executor: ThreadPoolExecutor = ThreadPoolExecutor(
+            thread_number, thread_name_prefix="single-flight"
+        )
+        self.__lock: threading.Lock = threading.Lock()
+        self.__flights: Dict[Hashable, Future] = dict()
+        self.__call_number: int = 0
+        self.__execution_number: int = 0
+        self.__failure_number: int = 0
+
+    @property
+    def statistics(self) -> CoalescingStatistics:
+        """
+        Get the coalescing statistics.
+        :return: The coalescing statistics.
+        """
+        with self.__lock:
+            return CoalescingStatistics(
+                self.__call_number,
+                self.__execution_number,
+                self.__failure_number,
+                len(self.__flights),
+            )
+
+    async def run(self, key: Hashable, function: Callable[[], T]) -> T:
+        """
+        Get the result of the function, sharing an in-flight execution for the key.
+
+        :param key: The key identifying the call.
+        :param function: The function to be executed in a thread.
+        :return: The result of the function.
+        """
+        with self.__lock:
+            self.__call_number += 1
+            flight = self.__flights.get(key)
+            is_new = flight is None
+            if is_new:
+                self.__execution_number += 1
+                flight = self.__executor.submit(function)
+                self.__flights[key] = flight
+        if is_new:
+            flight.add_done_callback(lambda _: self.__land(key, flight))
+        return await asyncio.wrap_future(flight)
+
+    def __land(self, key: Hashable, flight: Future) -> None:
+        with self.__lock:
+            if self.__flights.get(key) is flight:
+                del self.__flights[key]
+            if flight.exception() is not None:
+                self.__failure_number += 1
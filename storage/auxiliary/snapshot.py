@@ -0,0 +1,266 @@
+import os
+import struct
+import threading
+import zlib
+from concurrent.futures import Future, ThreadPoolExecutor
+from typing import (
+    BinaryIO,
+    Callable,
+    Iterable,
+    Iterator,
+    List,
+    MutableSequence,
+    Optional,
+    Tuple,
+)
+
+from storage.auxiliary.change_log import compute_digest
+from storage.auxiliary.filetools import read, write
+from storage.auxiliary.numeration import number_to_hex_code
+from storage.auxiliary.pwned.model import PWNED_PREFIX_CAPACITY
+
+# The archive layout (all numbers are little-endian):
+#   header:  magic, generation, record amount
+#   records: prefix number, data length, data CRC32, data
+#   index:   index mark, entry amount, entries (prefix number, offset, length, CRC32)
+#   footer:  index CRC32, index offset, end magic
+# Records can be consumed as a stream, the index allows random access to them.
+MAGIC = b"PWNSNAP1"
+END_MAGIC = b"PWNSEND1"
+HEADER = struct.Struct("<8sQI")
+RECORD = struct.Struct("<III")
+INDEX_MARK = 0xFFFFFFFF
+INDEX_HEADER = struct.Struct("<II")
+INDEX_ENTRY = struct.Struct("<IQII")
+FOOTER = struct.Struct("<IQ8s")
+
+CHUNK_SIZE = 1 << 20
+
+IndexEntry = Tuple[int, int, int, int]
+
+
+def export_snapshot(
+    prefix_numbers: Iterable[int],
+    record_amount: int,
+    generation: int,
+    get_range_path: Callable[[str], str],
+) -> Iterator[bytes]:
+    """
+    Export range files as a single snapshot archive.
+
+    :param prefix_numbers: The numbers of the prefixes to export in ascending order.
+    :param record_amount: The number of the prefixes to export.
+    :param generation: The generation of the exported dataset.
+    :param get_range_path: A function returning the range file path for a prefix.
+    :return: The archive content split into chunks.
+    """
+    buffer = bytearray(HEADER.pack(MAGIC, generation, record_amount))
+    emitted_size = 0
+    index: List[IndexEntry] = []
+    for prefix_number in prefix_numbers:
+        prefix = number_to_hex_code(prefix_number, PWNED_PREFIX_CAPACITY)
+        data = read(get_range_path(prefix), binary=True)
+        checksum = zlib.crc32(data)
+        offset = emitted_size + len(buffer) + RECORD.size
+        index.append((prefix_number, offset, len(data), checksum))
+        buffer += RECORD.pack(prefix_number, len(data), checksum)
+        buffer += data
+        if len(buffer) >= CHUNK_SIZE:
+            yield bytes(buffer)
+            emitted_size += len(buffer)
+            buffer = bytearray()
+    if len(index) != record_amount:
+        raise RuntimeError(
+            "The number of exported ranges differs from the expected one."
+        )
+    index_offset = emitted_size + len(buffer)
+    index_data = INDEX_HEADER.pack(INDEX_MARK, len(index)) + b"".join(
+        INDEX_ENTRY.pack(*entry) for entry in index
+    )
+    buffer += index_data
+    buffer += FOOTER.pack(zlib.crc32(index_data), index_offset, END_MAGIC)
+    yield bytes(buffer)
+
+
+def read_snapshot_header(archive: BinaryIO) -> Tuple[int, int]:
+    """
+    Read the header of a snapshot archive.
+
+    :param archive: The archive stream positioned at its beginning.
+    :return: The generation of the exported dataset and the number of its ranges.
+    """
+    magic, generation, record_amount = HEADER.unpack(
+        __read_exactly(archive, HEADER.size)
+    )
+    if magic != MAGIC:
+        raise ValueError("The file is not a storage snapshot.")
+    return generation, record_amount
+
+
+def restore_snapshot(
+    archive: BinaryIO,
+    record_amount: int,
+    get_range_path: Callable[[str], str],
+    thread_number: int,
+    on_restored: Callable[[], None],
+    is_wanted: Optional[Callable[[int], bool]] = None,
+    digests: Optional[MutableSequence[int]] = None,
+) -> None:
+    """
+    Restore range files from a snapshot archive in parallel.
+
+    Seekable archives are restored by their index with every thread reading its own
+    records, other streams are read sequentially while the files are written in parallel.
+
+    :param archive: The archive stream positioned right after its header.
+    :param record_amount: The number of ranges declared in the header.
+    :param get_range_path: A function returning the range file path for a prefix.
+    :param thread_number: The number of threads to be used.
+    :param on_restored: A function called after each restored range.
+    :param is_wanted: A function checking if the range of a prefix number has to be
+        restored (all ranges are restored by default).
+    :param digests: The sequence indexed by prefix numbers to store the digests
+        of the restored ranges in (see `change_log`).
+    """
+    callback_lock = threading.Lock()
+
+    def restore_range(prefix_number: int, data: bytes, checksum: int) -> None:
+        if is_wanted is not None and not is_wanted(prefix_number):
+            return
+        if zlib.crc32(data) != checksum:
+            raise ValueError("The snapshot is corrupted: a range checksum mismatch.")
+        prefix = number_to_hex_code(prefix_number, PWNED_PREFIX_CAPACITY)
+        write(get_range_path(prefix), data, overwrite=True, binary=True)
+        if digests is not None:
+            digests[prefix_number] = compute_digest(data)
+        with callback_lock:
+            on_restored()
+
+    if __is_seekable(archive):
+        __restore_by_index(
+            archive, record_amount, restore_range, thread_number, is_wanted
+        )
+    else:
+        __restore_sequentially(archive, record_amount, restore_range, thread_number)
+
+
+def __restore_by_index(
+    archive: BinaryIO,
+    record_amount: int,
+    restore_range: Callable[[int, bytes, int], None],
+    thread_number: int,
+    is_wanted: Optional[Callable[[int], bool]],
+) -> None:
+    archive_size = archive.seek(0, os.SEEK_END)
+    archive.seek(archive_size - FOOTER.size)
+    index_checksum, index_offset, end_magic = FOOTER.unpack(
+        __read_exactly(archive, FOOTER.size)
+    )
+    if end_magic != END_MAGIC:
+        raise ValueError("The snapshot is truncated.")
+    archive.seek(index_offset)
+    index_data = __read_exactly(archive, archive_size - FOOTER.size - index_offset)
+    if zlib.crc32(index_data) != index_checksum:
+        raise ValueError("The snapshot is corrupted: an index checksum mismatch.")
+    index = __parse_index(index_data)
+    if len(index) != record_amount:
+        raise ValueError("The snapshot is corrupted: an unexpected number of ranges.")
+    if is_wanted is not None:
+        index = [entry for entry in index if is_wanted(entry[0])]
+    read_lock = threading.Lock()
+    file_descriptor = __get_file_descriptor(archive)
+
+    def read_at(offset: int, length: int) -> bytes:
+        if file_descriptor is not None and hasattr(os, "pread"):
+            return os.pread(file_descriptor, length, offset)
+        with read_lock:
+            archive.seek(offset)
+            return __read_exactly(archive, length)
+
+    def restore_part(entries: List[IndexEntry]) -> None:
+        for prefix_number, offset, length, checksum in entries:
+            restore_range(prefix_number, read_at(offset, length), checksum)
+
+    with ThreadPoolExecutor(thread_number) as executor:
+        futures = [
+            executor.submit(restore_part, index[part_index::thread_number])
+            for part_index in range(thread_number)
+        ]
+        for future in futures:
+            future.result()
+
+
+def __restore_sequentially(
+    archive: BinaryIO,
+    record_amount: int,
+    restore_range: Callable[[int, bytes, int], None],
+    thread_number: int,
+) -> None:
+    restored: List[Tuple[int, int, int]] = []
+    errors: List[BaseException] = []
+    # Bounds the amount of read but not yet written data.
+    slots = threading.BoundedSemaphore(thread_number * 16)
+
+    def on_done(future: Future) -> None:
+        if future.exception() is not None:
+            errors.append(future.exception())
+        slots.release()
+
+    with ThreadPoolExecutor(thread_number) as executor:
+        while not errors:
+            (prefix_number,) = struct.unpack("<I", __read_exactly(archive, 4))
+            if prefix_number == INDEX_MARK:
+                break
+            length, checksum = struct.unpack("<II", __read_exactly(archive, 8))
+            data = __read_exactly(archive, length)
+            restored.append((prefix_number, length, checksum))
+            slots.acquire()
+            executor.submit(
+                restore_range, prefix_number, data, checksum
+            ).add_done_callback(on_done)
+    if errors:
+        raise errors[0]
+    (entry_amount,) = struct.unpack("<I", __read_exactly(archive, 4))
+    index_data = INDEX_HEADER.pack(INDEX_MARK, entry_amount) + __read_exactly(
+        archive, entry_amount * INDEX_ENTRY.size
+    )
+    index_checksum, _, end_magic = FOOTER.unpack(__read_exactly(archive, FOOTER.size))
+    if end_magic != END_MAGIC or zlib.crc32(index_data) != index_checksum:
+        raise ValueError("The snapshot is corrupted: an index checksum mismatch.")
+    index = [
+        (prefix_number, length, checksum)
+        for prefix_number, _, length, checksum in __parse_index(index_data)
+    ]
+    if len(restored) != record_amount or index != restored:
+        raise ValueError("The snapshot is corrupted: the index does not match ranges.")
+
+
+def __parse_index(index_data: bytes) -> List[IndexEntry]:
+    _, entry_amount = INDEX_HEADER.unpack_from(index_data)
+    if INDEX_HEADER.size + entry_amount * INDEX_ENTRY.size != len(index_data):
+        raise ValueError("The snapshot is corrupted: an unexpected index size.")
+    return list(INDEX_ENTRY.iter_unpack(index_data[INDEX_HEADER.size :]))
+
+
+def __is_seekable(archive: BinaryIO) -> bool:
+    try:
+        return archive.seekable()
+    except (AttributeError, ValueError):
+        return False
+
+
+def __get_file_descriptor(archive: BinaryIO) -> Optional[int]:
+    try:
+        return archive.fileno()
+    except (AttributeError, OSError, ValueError):
+        return None
+
+
+def __read_exactly(archive: BinaryIO, size: int) -> bytes:
+    data = archive.read(size)
+    while len(data) < size:
+        chunk = archive.read(size - len(data))
+        if not chunk:
+            raise ValueError("The snapshot is truncated.")
+        data += chunk
+    return data
@@ -0,0 +1,77 @@
+import threading
+import time
+from contextvars import ContextVar
+from typing import List, Optional, Tuple
+
+__current_timer: ContextVar[Optional["PhaseTimer"]] = ContextVar(
+    "phase_timer", default=None
+)
+
+
+class PhaseTimer:
+    """Collects the durations of the phases of a request."""
+
+    def __init__(self):
+        """Initialize a new PhaseTimer instance."""
+        self.__phases: List[Tuple[str, float]] = []
+        self.__lock: threading.Lock = threading.Lock()
+
+    @property
+    def phases(self) -> List[Tuple[str, float]]:
+        """
+        Get the measured phases.
+        :return: The phase names with their durations in seconds in the order of adding.
+        """
+        with self.__lock:
+            return list(self.__phases)
+
+    def add(self, name: str, seconds: float) -> None:
+        """
+        Add the duration of a phase.
+
+        Phases can be added from other threads (e.g. the one reading a range).
+
+        :param name: The phase name.
+        :param seconds: The duration in seconds.
+        """
+        with self.__lock:
+            self.__phases.append((name, seconds))
+
+    def measure(self, name: str, start_ts: float) -> float:
+        """
+        Add the duration of a phase that has just ended.
+
+        :param name: The phase name.
+        :param start_ts: The `time.perf_counter` value at the start of the phase.
+        :return: The current `time.perf_counter` value (the start of the next phase).
+        """
+        now = time.perf_counter()
+        self.add(name, now - start_ts)
+        return now
+
+    def to_server_timing(self) -> str:
+        """
+        Format the phases as the value of the Server-Timing HTTP header.
+        :return: The header value with the durations in milliseconds.
+        """
+        return ", ".join(
+            f"{name};dur={seconds * 1000:.3f}" for name, seconds in self.phases
+        )
+
+
+def start_timing() -> PhaseTimer:
+    """
+    Start collecting the phases of the current request (its task or thread).
+    :return: The timer the phases are added to.
+    """
+    timer = PhaseTimer()
+    __current_timer.set(timer)
+    return timer
+
+
+def get_timer() -> Optional[PhaseTimer]:
+    """
+    Get the timer of the current request.
+    :return: The timer or None if the phases are not collected.
+    """
+    return __current_timer.get()
@@ -0,0 +1,33 @@
+from typing import List, Optional, Tuple
+
+
+class ChangeSet:
+    """The ranges changed since a dataset generation."""
+
+    def __init__(self, generation: int, changes: List[Tuple[str, Optional[str]]]):
+        """
+        Initialize a new ChangeSet instance.
+
+        :param generation: The current generation.
+        :param changes: The prefixes of the changed ranges with the hex digests
+            of their current content (None if the digests are not known).
+        """
+        self._generation: int = generation
+        self._changes: List[Tuple[str, Optional[str]]] = changes
+
+    @property
+    def generation(self) -> int:
+        """
+        Get the generation the changes lead to.
+        :return: The generation number.
+        """
+        return self._generation
+
+    @property
+    def changes(self) -> List[Tuple[str, Optional[str]]]:
+        """
+        Get the changed ranges.
+        :return: The prefixes with the digests of their current content in ascending
+            order of prefixes.
+        """
+        return self._changes
@@ -0,0 +1,62 @@
+class CoalescingStatistics:
+    """Statistics of coalescing concurrent identical range reads."""
+
+    def __init__(
+        self,
+        request_number: int = 0,
+        read_number: int = 0,
+        failed_read_number: int = 0,
+        in_flight_read_number: int = 0,
+    ):
+        """
+        Initialize a new CoalescingStatistics instance.
+
+        :param request_number: The number of requested reads.
+        :param read_number: The number of actually performed reads.
+        :param failed_read_number: The number of failed performed reads.
+        :param in_flight_read_number: The number of reads being performed at the moment.
+        """
+        self._request_number: int = request_number
+        self._read_number: int = read_number
+        self._failed_read_number: int = failed_read_number
+        self._in_flight_read_number: int = in_flight_read_number
+
+    @property
+    def request_number(self) -> int:
+        """
+        Get the number of requested reads.
+        :return: The number of requested reads.
+        """
+        return self._request_number
+
+    @property
+    def read_number(self) -> int:
+        """
+        Get the number of actually performed reads.
+        :return: The number of performed reads.
+        """
+        return self._read_number
+
+    @property
+    def coalesced_request_number(self) -> int:
+        """
+        Get the number of requests served by a read performed for another request.
+        :return: The number of coalesced requests.
+        """
+        return self._request_number - self._read_number
+
+    @property
+    def failed_read_number(self) -> int:
+        """
+        Get the number of failed performed reads.
+        :return: The number of failed reads.
+        """
+        return self._failed_read_number
+
+    @property
+    def in_flight_read_number(self) -> int:
+        """
+        Get the number of reads being performed at the moment.
+        :return: The number of in-flight reads.
+        """
+        return self._in_flight_read_number
@@ -0,0 +1,112 @@
+from typing import List
+
+
+class PipelineStatistics:
+    """Statistics of the fetching and writing stages of a dataset build."""
+
+    def __init__(
+        self,
+        range_number: int = 0,
+        fetch_seconds: float = 0,
+        write_seconds: float = 0,
+        backpressure_seconds: float = 0,
+        write_batch_number: int = 0,
+        queue_depth_sum: int = 0,
+        queue_sample_number: int = 0,
+        max_queue_depth: int = 0,
+    ):
+        """
+        Initialize a new PipelineStatistics instance.
+
+        :param range_number: The number of written ranges.
+        :param fetch_seconds: The total time the fetchers waited for ranges.
+        :param write_seconds: The total time the writers spent writing ranges.
+        :param backpressure_seconds: The total time the fetchers waited
+            for free slots in the queue of fetched ranges.
+        :param write_batch_number: The number of batches the ranges were written in.
+        :param queue_depth_sum: The sum of queue depths sampled on every fetched range.
+        :param queue_sample_number: The number of queue depth samples.
+        :param max_queue_depth: The maximum sampled queue depth.
+        """
+        self._range_number: int = range_number
+        self._fetch_seconds: float = fetch_seconds
+        self._write_seconds: float = write_seconds
+        self._backpressure_seconds: float = backpressure_seconds
+        self._write_batch_number: int = write_batch_number
+        self._queue_depth_sum: int = queue_depth_sum
+        self._queue_sample_number: int = queue_sample_number
+        self._max_queue_depth: int = max_queue_depth
+
+    @staticmethod
+    def combine(statistics: List["PipelineStatistics"]) -> "PipelineStatistics":
+        """
+        Combine the statistics of several pipelines (e.g. in different processes).
+        :param statistics: The statistics to be combined.
+        :return: The combined statistics.
+        """
+        return PipelineStatistics(
+            sum(item._range_number for item in statistics),
+            sum(item._fetch_seconds for item in statistics),
+            sum(item._write_seconds for item in statistics),
+            sum(item._backpressure_seconds for item in statistics),
+            sum(item._write_batch_number for item in statistics),
+            sum(item._queue_depth_sum for item in statistics),
+            sum(item._queue_sample_number for item in statistics),
+            max([item._max_queue_depth for item in statistics], default=0),
+        )
+
+    @property
+    def range_number(self) -> int:
+        """
+        Get the number of written ranges.
+        :return: The number of ranges.
+        """
+        return self._range_number
+
+    @property
+    def fetch_seconds(self) -> float:
+        """
+        Get the total time the fetchers waited for ranges.
+        :return: The time in seconds.
+        """
+        return self._fetch_seconds
+
+    @property
+    def write_seconds(self) -> float:
+        """
+        Get the total time the writers spent writing ranges.
+        :return: The time in seconds.
+        """
+        return self._write_seconds
+
+    @property
+    def backpressure_seconds(self) -> float:
+        """
+        Get the total time the fetchers waited for free slots in the queue.
+        :return: The time in seconds.
+        """
+        return self._backpressure_seconds
+
+    @property
+    def write_batch_number(self) -> int:
+        """
+        Get the number of batches the ranges were written in.
+        :return: The number of batches.
+        """
+        return self._write_batch_number
+
+    @property
+    def mean_queue_depth(self) -> float:
+        """
+        Get the mean depth of the queue of fetched ranges.
+        :return: The mean number of queued ranges.
+        """
+        return self._queue_depth_sum / max(self._queue_sample_number, 1)
+
+    @property
+    def max_queue_depth(self) -> int:
+        """
+        Get the maximum depth of the queue of fetched ranges.
+        :return: The maximum number of queued ranges.
+        """
+        return self._max_queue_depth
@@ -0,0 +1,99 @@
+from storage.auxiliary.numeration import number_to_hex_code
+from storage.auxiliary.pwned.model import PWNED_PREFIX_CAPACITY, PWNED_PREFIX_LENGTH
+
+
+class OutOfShardError(ValueError):
+    """Raised when a hash prefix does not belong to the shard of a storage."""
+
+
+class PrefixShard:
+    """A contiguous range of hash prefixes owned by a storage."""
+
+    def __init__(self, first_prefix: str, last_prefix: str):
+        """
+        Initialize a new PrefixShard instance.
+
+        :param first_prefix: The first hash prefix of the shard.
+        :param last_prefix: The last hash prefix of the shard (inclusive).
+        """
+        self.__start: int = PrefixShard.__to_number(first_prefix)
+        self.__end: int = PrefixShard.__to_number(last_prefix) + 1
+        if self.__start >= self.__end:
+            raise ValueError(
+                "The first prefix of a shard must not exceed the last one."
+            )
+
+    @staticmethod
+    def parse(text: str) -> "PrefixShard":
+        """
+        Parse a shard from its text form.
+        :param text: The shard text form, e.g. 00000-7FFFF.
+        :return: The shard.
+        """
+        first_prefix, separator, last_prefix = text.strip().partition("-")
+        if not separator:
+            raise ValueError("A shard must be specified as <first>-<last> prefixes.")
+        return PrefixShard(first_prefix, last_prefix)
+
+    @staticmethod
+    def full() -> "PrefixShard":
+        """
+        Get the shard of all hash prefixes.
+        :return: The shard.
+        """
+        last_prefix = number_to_hex_code(
+            PWNED_PREFIX_CAPACITY - 1, PWNED_PREFIX_CAPACITY
+        )
+        return PrefixShard("0" * PWNED_PREFIX_LENGTH, last_prefix)
+
+    @property
+    def prefix_numbers(self) -> range:
+        """
+        Get the numbers of the hash prefixes of the shard.
+        :return: The prefix numbers in ascending order.
+        """
+        return range(self.__start, self.__end)
+
+    @property
+    def size(self) -> int:
+        """
+        Get the number of hash prefixes of the shard.
+        :return: The number of prefixes.
+        """
+        return self.__end - self.__start
+
+    @property
+    def is_full(self) -> bool:
+        """
+        Check if the shard contains all hash prefixes.
+        :return: True if the shard is full, False otherwise.
+        """
+        return self.size == PWNED_PREFIX_CAPACITY
+
+    def contains(self, prefix: str) -> bool:
+        """
+        Check if a hash prefix belongs to the shard.
+        :param prefix: The upper-case hash prefix.
+        :return: True if the prefix belongs to the shard, False otherwise.
+        """
+        return self.__start <= int(prefix, 16) < self.__end
+
+    def __str__(self) -> str:
+        first_prefix = number_to_hex_code(self.__start, PWNED_PREFIX_CAPACITY)
+        last_prefix = number_to_hex_code(self.__end - 1, PWNED_PREFIX_CAPACITY)
+        return f"{first_prefix}-{last_prefix}"
+
+    def __eq__(self, other: object) -> bool:
+        return isinstance(other, PrefixShard) and str(self) == str(other)
+
+    def __hash__(self) -> int:
+        return hash(str(self))
+
+    @staticmethod
+    def __to_number(prefix: str) -> int:
+        prefix = prefix.strip().upper()
+        if len(prefix) != PWNED_PREFIX_LENGTH or not all(
+            symbol in "0123456789ABCDEF" for symbol in prefix
+        ):
+            raise ValueError(f"'{prefix}' is not a hash prefix.")
+        return int(prefix, 16)
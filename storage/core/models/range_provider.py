@@ -13,3 +13,14 @@ class PwnedRangeProvider(ABC):
         :return: The range as plain text.
         """
         pass
+
+    async def open(self) -> None:
+        """
+        Prepare the provider for a series of requests from the running event loop
+        (e.g. open a connection pool). Does nothing by default.
+        """
+        pass
+
+    async def close(self) -> None:
+        """Release the resources acquired by `open`. Does nothing by default."""
+        pass
@@ -0,0 +1,66 @@
+class RequestStatistics:
+    """Statistics of requests made by a range API client."""
+
+    def __init__(
+        self,
+        prefix_number: int = 0,
+        request_number: int = 0,
+        failed_request_number: int = 0,
+        hedged_request_number: int = 0,
+        hedge_win_number: int = 0,
+    ):
+        """
+        Initialize a new RequestStatistics instance.
+
+        :param prefix_number: The number of successfully requested prefixes.
+        :param request_number: The number of sent requests, including retries and hedges.
+        :param failed_request_number: The number of failed or timed out requests.
+        :param hedged_request_number: The number of hedged requests sent
+            because the first request for a prefix was too slow.
+        :param hedge_win_number: The number of hedged requests finished first.
+        """
+        self._prefix_number: int = prefix_number
+        self._request_number: int = request_number
+        self._failed_request_number: int = failed_request_number
+        self._hedged_request_number: int = hedged_request_number
+        self._hedge_win_number: int = hedge_win_number
+
+    @property
+    def prefix_number(self) -> int:
+        """
+        Get the number of successfully requested prefixes.
+        :return: The number of prefixes.
+        """
+        return self._prefix_number
+
+    @property
+    def request_number(self) -> int:
+        """
+        Get the number of sent requests, including retries and hedges.
+        :return: The number of requests.
+        """
+        return self._request_number
+
+    @property
+    def failed_request_number(self) -> int:
+        """
+        Get the number of failed or timed out requests.
+        :return: The number of failed requests.
+        """
+        return self._failed_request_number
+
+    @property
+    def hedged_request_number(self) -> int:
+        """
+        Get the number of hedged requests.
+        :return: The number of hedged requests.
+        """
+        return self._hedged_request_number
+
+    @property
+    def hedge_win_number(self) -> int:
+        """
+        Get the number of hedged requests finished before the original ones.
+        :return: The number of hedge wins.
+        """
+        return self._hedge_win_number
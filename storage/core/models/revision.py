@@ -11,6 +11,7 @@ class Revision:
         NEW = "new"
 
         PREPARATION = "preparation"
+        WARM_UP = "warm-up"
         TRANSITION = "transition"
         PURGE = "purge"
 
@@ -29,7 +30,8 @@ class Revision:
         Initialize a new Revision instance.
 
         :param status: The status of the update.
-        :param progress: The progress percentage of the update.
+        :param progress: The progress percentage of the update
+            (of the page cache warm-up during the warm-up).
         :param start_ts: The start timestamp of the update.
         :param end_ts: The end timestamp of the update.
         :param error: The error associated with the update.
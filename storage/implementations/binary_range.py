@@ -0,0 +1,64 @@
+import struct
+import sys
+from array import array
+from typing import List, Tuple
+
+from storage.auxiliary.pwned.model import PWNED_PREFIX_LENGTH
+
+# Media type of the binary range representation.
+MEDIA_TYPE = "application/x-pwned-range"
+# Hash suffix length in hex symbols and in bytes (left-padded with a zero nibble).
+SUFFIX_LENGTH = 40 - PWNED_PREFIX_LENGTH
+SUFFIX_SIZE = (SUFFIX_LENGTH + 1) // 2
+HEADER = struct.Struct("<I")
+
+# The layout (all numbers are little-endian):
+#   record amount (u32), suffixes (18 bytes each), leak occasion numbers (u32 each)
+
+
+def encode_range(records: str) -> bytes:
+    """
+    Encode a range from plain text to the binary representation.
+
+    :param records: The range as plain text.
+    :return: The range in the binary representation.
+    """
+    lines = records.split()
+    padding = "0" * (SUFFIX_SIZE * 2 - SUFFIX_LENGTH)
+    suffixes = bytes.fromhex("".join(padding + line[:SUFFIX_LENGTH] for line in lines))
+    counts = array("I", [int(line[SUFFIX_LENGTH + 1 :]) for line in lines])
+    if sys.byteorder != "little":
+        counts.byteswap()
+    return HEADER.pack(len(lines)) + suffixes + counts.tobytes()
+
+
+def decode_range(data: bytes) -> List[Tuple[str, int]]:
+    """
+    Decode a range from the binary representation.
+
+    :param data: The range in the binary representation.
+    :return: The pairs of upper-case hash suffixes and leak occasion numbers.
+    """
+    (record_amount,) = HEADER.unpack_from(data)
+    counts_offset = HEADER.size + record_amount * SUFFIX_SIZE
+    if len(data) != counts_offset + record_amount * 4:
+        raise ValueError("The binary range has an unexpected size.")
+    suffixes = data[HEADER.size : counts_offset].hex().upper()
+    counts = array("I", data[counts_offset:])
+    if sys.byteorder != "little":
+        counts.byteswap()
+    width = SUFFIX_SIZE * 2
+    return [
+        (suffixes[index * width + width - SUFFIX_LENGTH : (index + 1) * width], count)
+        for index, count in enumerate(counts)
+    ]
+
+
+def decode_range_to_text(data: bytes) -> str:
+    """
+    Decode a range from the binary representation to plain text.
+
+    :param data: The range in the binary representation.
+    :return: The range as plain text.
+    """
+    return "\n".join(f"{suffix}:{count}" for suffix, count in decode_range(data))
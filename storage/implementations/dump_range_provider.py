@@ -0,0 +1,85 @@
+import asyncio
+import mmap
+from array import array
+from typing import BinaryIO, Callable, Optional
+
+from storage.auxiliary.dump_index import (
+    INDEX_SUFFIX,
+    build_dump_index,
+    read_dump_index,
+    write_dump_index,
+)
+from storage.auxiliary.pwned.model import PWNED_PREFIX_LENGTH
+from storage.core.models.range_provider import PwnedRangeProvider
+
+
+class DumpRangeProvider(PwnedRangeProvider):
+    """Serves ranges directly from a sorted dump file without importing it."""
+
+    def __init__(
+        self,
+        data_file_path: str,
+        index_path: Optional[str] = None,
+        on_indexed: Optional[Callable[[int], None]] = None,
+        build_index: bool = True,
+    ):
+        """
+        Initialize a new DumpRangeProvider instance.
+
+        The dump file is mapped into memory, and ranges are located by an index
+        of the offsets of all prefixes. The index is saved next to the dump file,
+        it's built in one sequential scan if it's missing or outdated.
+
+        :param data_file_path: The file with sorted hashes (in the format of the
+            official pwned passwords downloader).
+        :param index_path: The index file path (the dump file path with
+            the .idx suffix by default).
+        :param on_indexed: A function called with the number of newly indexed
+            prefixes if the index is being built.
+        :param build_index: Whether to build a missing or outdated index. Serving
+            processes only open the index built in advance (see `index_dump`).
+        :raises RuntimeError: If the index is missing or outdated and must not be built.
+        """
+        index_path = index_path or data_file_path + INDEX_SUFFIX
+        offsets = read_dump_index(index_path, data_file_path)
+        if offsets is None and not build_index:
+            raise RuntimeError(
+                f"The index {index_path} is missing or outdated, "
+                f"build it with the index_dump script."
+            )
+        self.__file: BinaryIO = open(data_file_path, "rb")
+        self.__data: mmap.mmap = mmap.mmap(
+            self.__file.fileno(), 0, access=mmap.ACCESS_READ
+        )
+        if offsets is None:
+            offsets = build_dump_index(self.__data, on_indexed)
+            write_dump_index(index_path, data_file_path, offsets)
+        self.__offsets: array = offsets
+
+    def read_range(self, prefix: str) -> str:
+        """
+        Read the Pwned password leak record range from the dump file.
+
+        :param prefix: The upper-case hash prefix.
+        :return: The range as plain text.
+        """
+        if len(prefix) != PWNED_PREFIX_LENGTH or not all(
+            symbol in "0123456789ABCDEF" for symbol in prefix
+        ):
+            raise ValueError(f"'{prefix}' is not a hash prefix.")
+        prefix_number = int(prefix, 16)
+        start = self.__offsets[prefix_number]
+        end = self.__offsets[prefix_number + 1]
+        lines = self.__data[start:end].decode("ascii").splitlines()
+        return "\n".join(line[PWNED_PREFIX_LENGTH:] for line in lines)
+
+    async def get_range(self, prefix: str) -> str:
+        """
+        Get the Pwned password leak record range from the dump file.
+
+        The range is read off the event loop, since it may not be in the page cache.
+
+        :param prefix: The upper-case hash prefix.
+        :return: The range as plain text.
+        """
+        return await asyncio.to_thread(self.read_range, prefix)
@@ -1,5 +1,5 @@
 import asyncio
-from typing import List
+from typing import List, Optional
 
 from storage.auxiliary import hasher
 from storage.auxiliary.pwned.model import PWNED_PREFIX_LENGTH
@@ -17,7 +17,14 @@ class MockedPwnedRequester(PwnedRequester):
         ("123_56789", 3),
     ]
 
-    def __init__(self):
+    def __init__(self, range_size: Optional[int] = None):
+        """
+        Initialize a new MockedPwnedRequester instance.
+        :param range_size: If specified, the average number of records in a generated
+            range (real ranges contain about a thousand records).
+        """
+        super().__init__()
+        self.__range_size: Optional[int] = range_size
         self.__records: List[str] = [
             hasher.sha1(str(index * 397 + 124))[PWNED_PREFIX_LENGTH:]
             + f":{int(hasher.sha1(str(index * 82 + 59))[0], 16) + 1}"
@@ -36,7 +43,19 @@ class MockedPwnedRequester(PwnedRequester):
         if hash_prefix == "00000":
             return await super().get_range(hash_prefix)
         await asyncio.sleep(0)
+        return self.generate_range(hash_prefix)
+
+    def generate_range(self, hash_prefix: str) -> str:
+        """
+        Generate a deterministic range for a hash prefix without any requests.
+
+        :param hash_prefix: The hash prefix.
+        :return: The range as plain text.
+        """
+        hash_prefix = hash_prefix.upper()
         num = int(hash_prefix, base=16)
+        if self.__range_size is not None:
+            return self.__generate_sized_range(hash_prefix, num)
         offset = (num + 3234) % 54347 % (self.RECORD_QUANTITY * 9 // 11 + 1) + 1
         amount = (num + 2832) % 71203 % 8235 % 4 + 1
         records = self.__records[offset : offset + amount]
@@ -44,3 +63,18 @@ class MockedPwnedRequester(PwnedRequester):
             records.extend(self.__extra_records[hash_prefix])
             records.sort()
         return "\n".join(records)
+
+    def __generate_sized_range(self, hash_prefix: str, num: int) -> str:
+        amount = (
+            self.__range_size + num % 101 - 50
+            if self.__range_size > 100
+            else self.__range_size
+        )
+        records = [
+            hasher.sha1(f"{hash_prefix}{index}")[PWNED_PREFIX_LENGTH:]
+            + f":{int(hasher.sha1(f'{index}{hash_prefix}')[:3], 16) % 97 + 1}"
+            for index in range(max(amount, 0))
+        ]
+        records.extend(self.__extra_records.get(hash_prefix, []))
+        records.sort()
+        return "\n".join(records)
@@ -1,25 +1,79 @@
 import asyncio
 import json
+import logging
+import time
+from array import array
+from concurrent.futures import ThreadPoolExecutor
 from enum import Enum
 from json import JSONDecodeError
+from typing import (
+    Awaitable,
+    BinaryIO,
+    Callable,
+    Dict,
+    Iterable,
+    Iterator,
+    List,
+    Optional,
+    Tuple,
+    Union,
+)
 
+from storage.auxiliary.access_counter import (
+    AccessCounter,
+    get_hottest_prefix_numbers,
+    read_access_counts,
+)
 from storage.auxiliary.action_context_managers import RevisionStepContextManager
+from storage.auxiliary.change_log import (
+    DIGEST_SIZE,
+    compute_digest,
+    read_changes_since,
+    read_digests,
+    record_changes,
+    update_digests,
+    write_digests,
+)
 from storage.auxiliary.filetools import (
+    get_modification_time,
     is_file,
     join_paths,
+    lock_file,
     make_dir_if_not_exists,
     make_empty_dir,
+    prefetch,
     read,
     remove_dir,
-    write,
+    remove_temp_files,
+    replace,
+    sync_file_system,
 )
 from storage.auxiliary.models.functional_revision import FunctionalRevision
 from storage.auxiliary.models.state import DatasetID, PwnedStorageState, StoredStateKeys
 from storage.auxiliary.numeration import number_to_hex_code
 from storage.auxiliary.pwned.model import PWNED_PREFIX_CAPACITY
+from storage.auxiliary.range_cache import RangeCache
+from storage.auxiliary.range_download import (
+    DEFAULT_WRITER_NUMBER,
+    download_ranges,
+    download_ranges_in_processes,
+)
+from storage.auxiliary.single_flight import SingleFlight
+from storage.auxiliary.snapshot import (
+    export_snapshot,
+    read_snapshot_header,
+    restore_snapshot,
+)
+from storage.auxiliary.timing import get_timer
+from storage.core.models.change_set import ChangeSet
+from storage.core.models.coalescing_statistics import CoalescingStatistics
+from storage.core.models.pipeline_statistics import PipelineStatistics
+from storage.core.models.prefix_shard import OutOfShardError, PrefixShard
 from storage.core.models.range_provider import PwnedRangeProvider
 from storage.core.models.revision import Revision
-from storage.implementations.requester import PwnedRequester
+from storage.implementations.binary_range import encode_range
+
+logger = logging.getLogger(__name__)
 
 
 class UpdateResult(Enum):
@@ -34,36 +88,180 @@ class PwnedStorage:
     """Stores Pwned password leak records."""
 
     DEFAULT_COROUTINE_NUMBER = 64
+    DEFAULT_THREAD_NUMBER = 16
+    DEFAULT_FILL_COROUTINE_NUMBER = 2
+    READ_THROUGH_THREAD_NUMBER = 4
+    READ_THROUGH_DEADLINE_SECONDS = 10
+    FILL_PAUSE_SECONDS = 0.05
     STATE_WAIT_TIME_SECONDS = 0.5
+    STATE_CHECK_INTERVAL_SECONDS = 1
     STATE_FILE = "state.json"
+    STATE_LOCK_FILE = "state.lock"
+    EXPORT_LOCK_FILE = "export.lock"
+    FILL_LOCK_FILE = "fill.lock"
+    ACCESS_FILE = "access.bin"
+    ACCESS_PERSIST_INTERVAL_SECONDS = 60
+    DEFAULT_WARM_UP_BYTES = 1 << 30
+    DEFAULT_WARM_UP_RATE = 256 << 20
+    WARM_UP_CHUNK_SIZE = 64
+    TRICKLE_FILE = "trickle.json"
+    DIGEST_FILE = "digests.bin"
+    CHANGES_DIR = "changes"
+    CHANGE_HISTORY_LENGTH = 100
+    TRICKLE_BATCH_INTERVAL_SECONDS = 60
 
     def __init__(
         self,
         resource_dir: str,
         coroutine_number: int = DEFAULT_COROUTINE_NUMBER,
-        range_provider: PwnedRangeProvider = PwnedRequester(),
+        range_provider: Optional[PwnedRangeProvider] = None,
+        read_through_provider: Optional[PwnedRangeProvider] = None,
+        cache_size: int = 0,
+        process_number: int = 1,
+        shard: Optional[PrefixShard] = None,
+        track_access: bool = False,
+        warm_up_bytes: int = DEFAULT_WARM_UP_BYTES,
+        warm_up_rate: int = DEFAULT_WARM_UP_RATE,
+        writer_number: int = DEFAULT_WRITER_NUMBER,
     ):
         """
         Initialize a new PwnedStorage instance.
 
         :param resource_dir: The directory where data is stored.
+        :param coroutine_number: The number of coroutines used for updates.
+        :param range_provider: The provider of ranges used for updates
+            (the Pwned API client by default).
+        :param read_through_provider: The provider of ranges missing in the storage.
+            If specified, a storage without an active dataset starts serving at once
+            from a lazily populated dataset, see `fill`.
+        :param cache_size: The maximum number of ranges cached in memory.
+        :param process_number: The number of processes used for updates. With several
+            processes, the prefix space is split between them and every process runs
+            `coroutine_number` coroutines with its own copy of the range provider.
+        :param shard: The range of hash prefixes owned by the storage. Only these ranges
+            are stored, other prefixes are rejected. By default the shard of the stored
+            dataset is used (all prefixes for a new storage).
+        :param track_access: Whether to count range requests of every prefix.
+            The counts are periodically merged into a file shared by all processes.
+            Updates and fills fetch ranges in the order of their popularity.
+        :param warm_up_bytes: The amount of range data of a new dataset loaded into
+            the page cache before switching to it, the most requested ranges first.
+        :param warm_up_rate: The maximum number of bytes per second loaded into
+            the page cache during a warm-up (unthrottled if 0 or less).
+        :param writer_number: The number of threads writing downloaded ranges during
+            updates (in every process), independent of the number of coroutines.
         """
         self.__resource_dir: str = resource_dir
         self.__coroutine_number: int = coroutine_number
+        self.__process_number: int = process_number
+        self.__shard: PrefixShard = shard or PrefixShard.full()
+        self.__is_shard_configured: bool = shard is not None
+        # The shard the active dataset was built for, it differs from the configured
+        # one until the storage is updated after a change of the configured shard.
+        self.__dataset_shard: PrefixShard = self.__shard
         self.__revision: FunctionalRevision = FunctionalRevision()
-        self.__range_provider: PwnedRangeProvider = range_provider
+        self.__range_provider: Optional[PwnedRangeProvider] = range_provider
+        self.__read_through_provider: Optional[PwnedRangeProvider] = (
+            read_through_provider
+        )
         self.__prepared_prefix_amount: int = 0
         self.__revision_step_manager: RevisionStepContextManager = (
             RevisionStepContextManager(self.__revision)
         )
         self.__state: PwnedStorageState = PwnedStorageState()
+        self.__state_file_mtime: Optional[int] = None
+        self.__next_state_check_ts: float = 0
+        self.__cache: RangeCache = RangeCache(cache_size)
+        # Cached ranges are keyed by the generation the cache was started at, refreshed
+        # ranges are evicted one by one, see `__invalidate_cache`.
+        self.__cache_generation: int = 0
+        self.__eviction_number: int = 0
+        self.__single_flight: SingleFlight = SingleFlight(
+            PwnedStorage.DEFAULT_THREAD_NUMBER
+        )
+        # Missing ranges are fetched by separate threads, so a slow read-through
+        # provider does not hold up the threads reading stored ranges.
+        self.__read_through_flight: SingleFlight = SingleFlight(
+            PwnedStorage.READ_THROUGH_THREAD_NUMBER
+        )
         self.__state_file_path = join_paths(resource_dir, PwnedStorage.STATE_FILE)
+        self.__state_lock_path = join_paths(resource_dir, PwnedStorage.STATE_LOCK_FILE)
+        self.__export_lock_path = join_paths(
+            resource_dir, PwnedStorage.EXPORT_LOCK_FILE
+        )
+        self.__fill_lock_path = join_paths(resource_dir, PwnedStorage.FILL_LOCK_FILE)
+        self.__access_file_path = join_paths(resource_dir, PwnedStorage.ACCESS_FILE)
+        self.__trickle_file_path = join_paths(resource_dir, PwnedStorage.TRICKLE_FILE)
+        self.__digest_file_path = join_paths(resource_dir, PwnedStorage.DIGEST_FILE)
+        self.__changes_dir = join_paths(resource_dir, PwnedStorage.CHANGES_DIR)
+        self.__access_counter: Optional[AccessCounter] = (
+            AccessCounter(
+                self.__access_file_path, PwnedStorage.ACCESS_PERSIST_INTERVAL_SECONDS
+            )
+            if track_access
+            else None
+        )
+        self.__warm_up_bytes: int = warm_up_bytes
+        self.__warm_up_rate: int = warm_up_rate
+        self.__writer_number: int = writer_number
+        self.__pipeline_statistics: Optional[PipelineStatistics] = None
         self.__initialize()
 
     @property
     def prepared_prefix_amount(self) -> int:
         return self.__prepared_prefix_amount
 
+    @property
+    def active_dataset(self) -> Optional[str]:
+        """
+        Get the name of the active dataset.
+        :return: The dataset name or None if there is no active dataset.
+        """
+        self.__refresh_state()
+        dataset = self.__state.active_dataset
+        return None if dataset is None else dataset.value
+
+    @property
+    def generation(self) -> int:
+        """
+        Get the generation of the active dataset.
+        :return: The generation number (0 if there is no active dataset).
+        """
+        self.__refresh_state()
+        return self.__state.generation
+
+    @property
+    def is_partial(self) -> bool:
+        """
+        Check if the active dataset is being populated lazily.
+        :return: True if some ranges are fetched on demand, False otherwise.
+        """
+        return self.__state.is_partial
+
+    @property
+    def shard(self) -> PrefixShard:
+        """
+        Get the range of hash prefixes owned by the storage.
+        :return: The shard.
+        """
+        return self.__shard
+
+    @property
+    def coalescing_statistics(self) -> CoalescingStatistics:
+        """
+        Get the statistics of coalescing concurrent identical range reads.
+        :return: The coalescing statistics.
+        """
+        return self.__single_flight.statistics
+
+    @property
+    def pipeline_statistics(self) -> Optional[PipelineStatistics]:
+        """
+        Get the statistics of downloading and writing ranges during the latest update.
+        :return: The pipeline statistics or None if no ranges have been downloaded.
+        """
+        return self.__pipeline_statistics
+
     @property
     def revision(self) -> Revision:
         """
@@ -76,27 +274,370 @@ class PwnedStorage:
         """
         Get the Pwned password leak record range for a hash prefix.
 
+        Concurrent requests for the same prefix of the same dataset generation share
+        one read and get the same result. Ranges missing in a lazily populated dataset
+        are fetched from the read-through provider and persisted.
+
         :param prefix: The hash prefix to query.
         :return: The range as plain text.
+        :raises OutOfShardError: If the prefix does not belong to the storage shard.
         """
-        prefix = self.__validate_prefix(prefix)
+        return await self.__get_range(prefix, is_binary=False)
+
+    async def get_binary_range(self, prefix: str) -> bytes:
+        """
+        Get the Pwned password leak record range for a hash prefix in binary form.
+
+        The range is encoded off the event loop, coalesced and cached like plain text.
+
+        :param prefix: The hash prefix to query.
+        :return: The range in the binary representation (see `binary_range`).
+        """
+        return await self.__get_range(prefix, is_binary=True)
+
+    async def get_ranges(self, prefixes: List[str]) -> List[str]:
+        """
+        Get the Pwned password leak record ranges for several hash prefixes at once.
+
+        The ranges are read in one go without coalescing and caching,
+        which suits bulk processing.
+
+        :param prefixes: The hash prefixes to query.
+        :return: The ranges as plain text in the order of the prefixes.
+        """
+        prefixes = [self.__validate_owned_prefix(prefix) for prefix in prefixes]
+        self.__refresh_state()
         while self.__revision.is_transiting:
             await self.__wait_a_little()
         self.__state.count_started_request()
         try:
-            data_file_path = join_paths(self.__active_dataset_dir, f"{prefix}.txt")
-            return read(data_file_path)
+            dataset_dir = self.__active_dataset_dir
+            await asyncio.gather(
+                *[self.__read_through_if_missing(dataset_dir, p) for p in prefixes]
+            )
+            return await asyncio.to_thread(
+                lambda: [self.__read_range(dataset_dir, prefix) for prefix in prefixes]
+            )
         finally:
             self.__state.count_finished_request()
 
     async def update(self) -> UpdateResult:
         """Perform storage update."""
+        return await self.__revise(self.__prepare_new_dataset)
+
+    def get_access_counts(self, amount: Optional[int] = None) -> List[Tuple[str, int]]:
+        """
+        Get the numbers of range requests of hash prefixes counted by all processes.
+
+        :param amount: The maximum number of prefixes (all requested ones by default).
+        :return: The requested prefixes with their counts in descending order of counts.
+        """
+        if self.__access_counter is not None:
+            self.__access_counter.persist()
+        counts = read_access_counts(self.__access_file_path)
+        return [
+            (
+                number_to_hex_code(prefix_number, PWNED_PREFIX_CAPACITY),
+                counts[prefix_number],
+            )
+            for prefix_number in get_hottest_prefix_numbers(
+                counts, len(counts) if amount is None else amount
+            )
+        ]
+
+    def get_changes(self, since_generation: int) -> Optional[ChangeSet]:
+        """
+        Get the ranges changed after a generation, e.g. for targeted invalidation
+        of downstream caches or incremental sync of replicas.
+
+        :param since_generation: The generation known to the consumer.
+        :return: The changed ranges or None if the changes since the generation are
+            not recorded (they are older than `CHANGE_HISTORY_LENGTH` generations),
+            so everything has to be refetched.
+        """
+        self.__refresh_state()
+        generation = self.__state.generation
+        prefix_numbers = read_changes_since(
+            self.__changes_dir,
+            since_generation,
+            generation,
+            PwnedStorage.CHANGE_HISTORY_LENGTH,
+        )
+        if prefix_numbers is None:
+            return None
+        digest_generation, digests = read_digests(self.__digest_file_path)
+        return ChangeSet(
+            generation,
+            [
+                (
+                    number_to_hex_code(prefix_number, PWNED_PREFIX_CAPACITY),
+                    (
+                        f"{digests[prefix_number]:016x}"
+                        if digest_generation == generation
+                        else None
+                    ),
+                )
+                for prefix_number in prefix_numbers
+                if prefix_number in self.__shard.prefix_numbers
+            ],
+        )
+
+    async def warm_up(self, prefixes: Iterable[str], to_cache: bool = False) -> None:
+        """
+        Preload ranges of the active dataset so the first requests for them are fast.
+
+        :param prefixes: The hash prefixes of the ranges to preload.
+        :param to_cache: Whether to load the ranges into the in-memory cache
+            instead of the OS page cache.
+        """
+        prefixes = [self.__validate_prefix(prefix) for prefix in prefixes]
+        prefixes = [prefix for prefix in prefixes if self.__shard.contains(prefix)]
+        if to_cache:
+            await asyncio.gather(
+                *[
+                    self.__get_range(prefix, False, is_counted=False)
+                    for prefix in prefixes
+                ]
+            )
+            return
+        await self.__prefetch(self.__active_dataset_dir, prefixes)
+
+    async def fill(
+        self, coroutine_number: int = DEFAULT_FILL_COROUTINE_NUMBER
+    ) -> UpdateResult:
+        """
+        Fetch all ranges missing in the lazily populated dataset and mark it complete.
+
+        Ranges are fetched from the read-through provider with a pause after each one,
+        so the filling does not compete with serving requests. Processes sharing
+        the storage fill it one at a time: the others wait and find it complete.
+
+        :param coroutine_number: The number of coroutines to be used for fetching.
+        :return: The result of the filling.
+        """
+        if (
+            not self.__state.is_partial
+            or self.__read_through_provider is None
+            or not self.__revision.is_idle
+        ):
+            return UpdateResult.IRRELEVANT
+        fill_lock = lock_file(self.__fill_lock_path)
+        await asyncio.to_thread(fill_lock.__enter__)
+        try:
+            # Another process may have completed the dataset while this one waited.
+            self.__import_state_from_file()
+            if not self.__state.is_partial or not self.__revision.is_idle:
+                return UpdateResult.IRRELEVANT
+            return await self.__fill(coroutine_number)
+        finally:
+            fill_lock.__exit__(None, None, None)
+
+    async def __fill(self, coroutine_number: int) -> UpdateResult:
+        self.__revision.indicate_started()
+        self.__prepared_prefix_amount = 0
+        dataset = self.__state.active_dataset
+        try:
+            prefix_numbers = await asyncio.to_thread(self.__order_by_popularity)
+            await asyncio.gather(
+                *[
+                    self.__fill_batch(
+                        dataset, prefix_numbers[batch_index::coroutine_number]
+                    )
+                    for batch_index in range(coroutine_number)
+                ]
+            )
+            await self.__sync_dataset(dataset)
+            self.__revision.indicate_prepared()
+            with lock_file(self.__state_lock_path):
+                # Another process may have switched the dataset during the filling.
+                self.__import_state_from_file()
+                if self.__state.active_dataset == dataset:
+                    self.__state.is_partial = False
+                    self.__dump_state()
+            self.__revision.indicate_transited()
+            self.__revision.indicate_completed()
+        except Exception as error:
+            self.__revision.indicate_failed(error)
+        if self.__revision.is_failed:
+            return UpdateResult.FAILED
+        return UpdateResult.DONE
+
+    async def trickle_refresh(
+        self,
+        prefixes_per_minute: int,
+        batch_number: Optional[int] = None,
+        on_refreshed: Optional[Callable[[str, int], None]] = None,
+    ) -> None:
+        """
+        Continuously refresh the active dataset in place instead of rebuilding it.
+
+        Every minute the next batch of ranges is fetched and each changed range is
+        atomically replaced, so upstream load, disk usage and I/O stay flat and there
+        is no switch to a cold dataset. The position in the refresh cycle is persisted
+        after every batch, so a restarted refresh continues where it stopped.
+        The generation is incremented after every batch with changed ranges and
+        the changes are recorded (see `get_changes`), so all processes evict only
+        the changed ranges from their caches.
+
+        :param prefixes_per_minute: The number of ranges refreshed every minute
+            (a full cycle takes the shard size divided by this number minutes).
+        :param batch_number: The number of batches after which the refresh stops.
+            By default the refresh never stops.
+        :param on_refreshed: A function called after every batch with the last
+            refreshed prefix and the number of changed ranges.
+        """
+        if prefixes_per_minute < 1:
+            raise ValueError("At least one prefix must be refreshed every minute.")
+        if self.__state.is_partial:
+            raise RuntimeError("The active dataset is not populated completely.")
+        self.__check_dataset_shard()
+        provider = self.__get_range_provider()
+        batch_size = min(prefixes_per_minute, self.__shard.size)
+        batch_index = 0
+        # Replacements of an interrupted refresh may have left temporary files.
+        await asyncio.to_thread(remove_temp_files, self.__active_dataset_dir)
+        await provider.open()
+        try:
+            while batch_number is None or batch_index < batch_number:
+                batch_ts = time.monotonic()
+                self.__refresh_state()
+                dataset = self.__state.active_dataset
+                prefix_numbers = await asyncio.to_thread(
+                    lambda: self.__get_trickle_batch(batch_size)
+                )
+                changed_digests = await self.__refresh_ranges(
+                    provider, self.__active_dataset_dir, prefix_numbers
+                )
+                changed_amount = len(changed_digests)
+                if changed_amount > 0:
+                    await self.__sync_dataset(dataset)
+                    if self.__commit_refreshed_changes(dataset, changed_digests):
+                        self.__evict_ranges(changed_digests)
+                last_prefix = number_to_hex_code(
+                    prefix_numbers[-1], PWNED_PREFIX_CAPACITY
+                )
+                next_prefix_number = prefix_numbers[-1] + 1
+                if next_prefix_number not in self.__shard.prefix_numbers:
+                    next_prefix_number = self.__shard.prefix_numbers.start
+                replace(
+                    self.__trickle_file_path,
+                    json.dumps(
+                        {
+                            "next_prefix": number_to_hex_code(
+                                next_prefix_number, PWNED_PREFIX_CAPACITY
+                            )
+                        }
+                    ),
+                    sync=False,
+                )
+                if on_refreshed is not None:
+                    on_refreshed(last_prefix, changed_amount)
+                batch_index += 1
+                if batch_number is None or batch_index < batch_number:
+                    await asyncio.sleep(
+                        batch_ts
+                        + PwnedStorage.TRICKLE_BATCH_INTERVAL_SECONDS
+                        - time.monotonic()
+                    )
+        finally:
+            await provider.close()
+
+    def export_snapshot(self) -> Iterator[bytes]:
+        """
+        Export the active dataset as a single streamable snapshot archive.
+
+        The exported dataset is not removed by updates of any process until
+        the export is finished (exports hold a shared lock of the export lock file).
+
+        :return: The archive content split into chunks.
+        """
+        self.__check_exportable()
+
+        def generate() -> Iterator[bytes]:
+            with lock_file(self.__export_lock_path, shared=True):
+                # The dataset may have been switched by another process meanwhile,
+                # the one active after taking the lock is kept until it's released.
+                self.__import_state_from_file()
+                self.__check_exportable()
+                dataset_dir = self.__active_dataset_dir
+                generation = self.__state.generation
+                self.__state.count_started_request()
+                try:
+                    yield from export_snapshot(
+                        self.__shard.prefix_numbers,
+                        self.__shard.size,
+                        generation,
+                        lambda prefix: join_paths(dataset_dir, f"{prefix}.txt"),
+                    )
+                finally:
+                    self.__state.count_finished_request()
+
+        return generate()
+
+    def __check_exportable(self) -> None:
+        if self.__state.active_dataset is None:
+            raise RuntimeError("The storage has no active dataset.")
+        if self.__state.is_partial:
+            raise RuntimeError("The active dataset is not populated completely.")
+        self.__check_dataset_shard()
+
+    async def restore(
+        self, archive: BinaryIO, thread_number: int = DEFAULT_THREAD_NUMBER
+    ) -> UpdateResult:
+        """
+        Restore the storage from a snapshot archive as a new dataset generation.
+
+        Only the ranges of the storage shard are restored, so a shard can be restored
+        from a snapshot of the full dataset.
+
+        :param archive: The archive stream (e.g. a file or an HTTP response).
+        :param thread_number: The number of threads to be used for restoring.
+        :return: The result of the restoration.
+        """
+        source_generation, record_amount = await asyncio.to_thread(
+            lambda: read_snapshot_header(archive)
+        )
+        if record_amount < self.__shard.size:
+            raise ValueError("The snapshot does not contain a complete dataset.")
+
+        async def restore_dataset(dataset: DatasetID, digests: array) -> None:
+            def on_restored() -> None:
+                self.__prepared_prefix_amount += 1
+                self.__revision.progress = (
+                    100 * self.__prepared_prefix_amount // self.__shard.size
+                )
+
+            dataset_dir = self.__get_dataset_dir(dataset)
+            await asyncio.to_thread(lambda: make_empty_dir(dataset_dir))
+            await asyncio.to_thread(
+                lambda: restore_snapshot(
+                    archive,
+                    record_amount,
+                    lambda prefix: join_paths(dataset_dir, f"{prefix}.txt"),
+                    thread_number,
+                    on_restored,
+                    self.__shard.prefix_numbers.__contains__,
+                    digests,
+                )
+            )
+            if self.__prepared_prefix_amount != self.__shard.size:
+                raise ValueError("The snapshot does not contain a complete dataset.")
+
+        return await self.__revise(restore_dataset, source_generation)
+
+    async def __revise(
+        self,
+        prepare_dataset: Callable[[DatasetID, array], Awaitable[None]],
+        min_generation: int = 0,
+    ) -> UpdateResult:
         if not self.__revision.is_idle:
             return UpdateResult.IRRELEVANT
         self.__revision.indicate_started()
+        self.__prepared_prefix_amount = 0
         new_dataset = (self.__state.active_dataset or DatasetID.B).other
+        new_generation = max(self.__state.generation + 1, min_generation)
         try:
-            await self.__update(new_dataset)
+            await self.__update(new_dataset, new_generation, prepare_dataset)
         except Exception as error:
             self.__revision.indicate_failed(error)
             await self.__remove_dataset(new_dataset)
@@ -115,6 +656,26 @@ class PwnedStorage:
             raise ValueError("The hash prefix must have a length of 5 symbols.")
         return prefix
 
+    def __validate_owned_prefix(self, prefix: str) -> str:
+        prefix = self.__validate_prefix(prefix)
+        if not self.__shard.contains(prefix):
+            raise OutOfShardError(
+                f"The hash prefix {prefix} does not belong to the shard {self.__shard}."
+            )
+        if not self.__dataset_shard.contains(prefix):
+            raise RuntimeError(
+                f"The active dataset was built for the shard {self.__dataset_shard} "
+                f"and does not contain the hash prefix {prefix}."
+            )
+        return prefix
+
+    def __check_dataset_shard(self) -> None:
+        if self.__dataset_shard != self.__shard:
+            raise RuntimeError(
+                f"The active dataset was built for the shard {self.__dataset_shard}, "
+                f"not for the shard {self.__shard}."
+            )
+
     @staticmethod
     async def __wait_a_little() -> None:
         await asyncio.sleep(PwnedStorage.STATE_WAIT_TIME_SECONDS)
@@ -128,66 +689,386 @@ class PwnedStorage:
     def __get_dataset_dir(self, dataset: DatasetID) -> str:
         return join_paths(self.__resource_dir, dataset.dir_name)
 
-    async def __update(self, new_dataset: DatasetID) -> None:
+    def __get_range_provider(self) -> PwnedRangeProvider:
+        if self.__range_provider is None:
+            # Imported on demand, so serving processes do not load the HTTP client.
+            from storage.implementations.requester import PwnedRequester
+
+            self.__range_provider = PwnedRequester()
+        return self.__range_provider
+
+    async def __get_range(
+        self, prefix: str, is_binary: bool, is_counted: bool = True
+    ) -> Union[str, bytes]:
+        # Phases are measured only if the caller has started timing the request.
+        timer = get_timer()
+        phase_ts = time.perf_counter() if timer else 0
+        prefix = self.__validate_owned_prefix(prefix)
+        if is_counted and self.__access_counter is not None:
+            self.__access_counter.count(int(prefix, 16))
+        if timer:
+            phase_ts = timer.measure("validate", phase_ts)
+        self.__refresh_state()
+        while self.__revision.is_transiting:
+            await self.__wait_a_little()
+        if timer:
+            phase_ts = timer.measure("wait", phase_ts)
+        self.__state.count_started_request()
+        try:
+            dataset_dir = self.__active_dataset_dir
+            key = (self.__cache_generation, prefix, is_binary)
+            eviction_number = self.__eviction_number
+            records = self.__cache.get(key)
+            if timer:
+                phase_ts = timer.measure("cache", phase_ts)
+            if records is None:
+                if await self.__read_through_if_missing(dataset_dir, prefix) and timer:
+                    phase_ts = timer.measure("read-through", phase_ts)
+                is_read = False
+
+                def read_range() -> Union[str, bytes]:
+                    nonlocal is_read
+                    is_read = True
+                    read_ts = time.perf_counter() if timer else 0
+                    text = self.__read_range(dataset_dir, prefix)
+                    if timer:
+                        read_ts = timer.measure("read", read_ts)
+                    if not is_binary:
+                        return text
+                    data = encode_range(text)
+                    if timer:
+                        timer.measure("encode", read_ts)
+                    return data
+
+                records = await self.__single_flight.run(key, read_range)
+                if timer and not is_read:
+                    # The range has been read by a concurrent request.
+                    timer.measure("coalesced", phase_ts)
+                # A range read before an eviction may be outdated.
+                if self.__eviction_number == eviction_number:
+                    self.__cache.put(key, records)
+            return records
+        finally:
+            self.__state.count_finished_request()
+
+    @staticmethod
+    def __read_range(dataset_dir: str, prefix: str) -> str:
+        return read(join_paths(dataset_dir, f"{prefix}.txt"))
+
+    async def __read_through_if_missing(self, dataset_dir: str, prefix: str) -> bool:
+        if not self.__state.is_partial or self.__read_through_provider is None:
+            return False
+        data_file_path = join_paths(dataset_dir, f"{prefix}.txt")
+        if is_file(data_file_path):
+            return False
+        await self.__read_through_flight.run(
+            data_file_path, lambda: self.__read_through(data_file_path, prefix)
+        )
+        return True
+
+    def __read_through(self, data_file_path: str, prefix: str) -> None:
+        # Executed in a worker thread, so the provider gets its own event loop.
+        # The deadline is short, since a client is waiting for the range.
+        records = asyncio.run(
+            asyncio.wait_for(
+                self.__read_through_provider.get_range(prefix),
+                PwnedStorage.READ_THROUGH_DEADLINE_SECONDS,
+            )
+        )
+        # Present range files are served as they are, so the range must be durable
+        # before it's renamed: after a crash an unflushed file would be empty.
+        replace(data_file_path, records)
+
+    async def __fill_batch(self, dataset: DatasetID, prefix_numbers: List[int]) -> None:
+        with self.__revision_step_manager:
+            dataset_dir = self.__get_dataset_dir(dataset)
+            for prefix_index in prefix_numbers:
+                self.__refresh_state()
+                if self.__state.active_dataset != dataset:
+                    # The filled dataset has been replaced by another process.
+                    return
+                hash_prefix = number_to_hex_code(prefix_index, PWNED_PREFIX_CAPACITY)
+                file_path = join_paths(dataset_dir, f"{hash_prefix}.txt")
+                if not is_file(file_path):
+                    records = await self.__read_through_provider.get_range(hash_prefix)
+                    # Synced like ranges fetched on demand (see `__read_through`).
+                    await asyncio.to_thread(replace, file_path, records)
+                    await asyncio.sleep(PwnedStorage.FILL_PAUSE_SECONDS)
+                self.__prepared_prefix_amount += 1
+                self.__revision.progress = (
+                    100 * self.__prepared_prefix_amount // self.__shard.size
+                )
+
+    def __get_trickle_batch(self, batch_size: int) -> List[int]:
+        prefix_numbers = self.__shard.prefix_numbers
+        start = prefix_numbers.start
+        try:
+            state = json.loads(read(self.__trickle_file_path))
+            start = int(state["next_prefix"], 16)
+        except (FileNotFoundError, JSONDecodeError, KeyError, TypeError, ValueError):
+            pass
+        if start not in prefix_numbers:
+            start = prefix_numbers.start
+        position = start - prefix_numbers.start
+        return [
+            prefix_numbers[(position + offset) % len(prefix_numbers)]
+            for offset in range(batch_size)
+        ]
+
+    async def __refresh_ranges(
+        self,
+        provider: PwnedRangeProvider,
+        dataset_dir: str,
+        prefix_numbers: List[int],
+    ) -> Dict[int, int]:
+        prefix_iterator = iter(prefix_numbers)
+        changed_digests = {}
+
+        def replace_if_changed(file_path: str, records: str) -> bool:
+            if is_file(file_path) and read(file_path) == records:
+                return False
+            # Readers observe either the old or the new range, never a torn one.
+            replace(file_path, records, sync=False)
+            return True
+
+        async def refresh() -> None:
+            for prefix_number in prefix_iterator:
+                prefix = number_to_hex_code(prefix_number, PWNED_PREFIX_CAPACITY)
+                records = await provider.get_range(prefix)
+                file_path = join_paths(dataset_dir, f"{prefix}.txt")
+                if await asyncio.to_thread(replace_if_changed, file_path, records):
+                    changed_digests[prefix_number] = compute_digest(records.encode())
+
+        tasks = [
+            asyncio.ensure_future(refresh())
+            for _ in range(min(self.__coroutine_number, len(prefix_numbers)))
+        ]
+        try:
+            await asyncio.gather(*tasks)
+        finally:
+            for task in tasks:
+                task.cancel()
+            await asyncio.gather(*tasks, return_exceptions=True)
+        return changed_digests
+
+    def __commit_refreshed_changes(
+        self, dataset: DatasetID, changed_digests: Dict[int, int]
+    ) -> bool:
+        # The state is checked and dumped under the lock, so a dataset switched
+        # by an update of another process is not overwritten.
+        with lock_file(self.__state_lock_path):
+            # Another process may have switched the dataset during the batch.
+            self.__import_state_from_file()
+            if self.__state.active_dataset != dataset:
+                return False
+            self.__record_refreshed_changes(changed_digests)
+            self.__state.generation += 1
+            self.__dump_state()
+        return True
+
+    def __record_refreshed_changes(self, changed_digests: Dict[int, int]) -> None:
+        generation = self.__state.generation
+        make_dir_if_not_exists(self.__changes_dir)
+        record_changes(
+            self.__changes_dir,
+            generation + 1,
+            generation,
+            changed_digests,
+            PwnedStorage.CHANGE_HISTORY_LENGTH,
+        )
+        update_digests(
+            self.__digest_file_path, generation, generation + 1, changed_digests
+        )
+
+    def __record_dataset_changes(self, generation: int, digests: array) -> None:
+        # Digests of the previous generation tell which ranges have changed,
+        # without them all ranges are considered changed.
+        base_generation = self.__state.generation
+        digest_generation, old_digests = read_digests(self.__digest_file_path)
+        changed_prefix_numbers = [
+            prefix_number
+            for prefix_number in self.__shard.prefix_numbers
+            if digest_generation != base_generation
+            or digests[prefix_number] != old_digests[prefix_number]
+        ]
+        make_dir_if_not_exists(self.__changes_dir)
+        record_changes(
+            self.__changes_dir,
+            generation,
+            base_generation,
+            changed_prefix_numbers,
+            PwnedStorage.CHANGE_HISTORY_LENGTH,
+        )
+        write_digests(self.__digest_file_path, generation, digests)
+
+    async def __update(
+        self,
+        new_dataset: DatasetID,
+        new_generation: int,
+        prepare_dataset: Callable[[DatasetID, array], Awaitable[None]],
+    ) -> None:
         """
-        Request an update of all Pwned password leak records.
-        :return: The update response status.
+        Prepare a new dataset of all Pwned password leak records and switch to it.
+
+        :param new_dataset: The dataset to be prepared.
+        :param new_generation: The generation number of the new dataset.
+        :param prepare_dataset: The function filling the dataset with ranges
+            and the given array with their digests.
         """
-        await self.__prepare_new_dataset(new_dataset)
+        # The digests are computed while the ranges are written, not by rereading them.
+        digests = array("Q", bytes(DIGEST_SIZE * PWNED_PREFIX_CAPACITY))
+        await prepare_dataset(new_dataset, digests)
+        await self.__sync_dataset(new_dataset)
+        await asyncio.to_thread(
+            lambda: self.__record_dataset_changes(new_generation, digests)
+        )
+        await self.__warm_up_dataset(new_dataset)
         self.__revision.indicate_prepared()
         while self.__state.has_active_requests:
             await self.__wait_a_little()
-        self.__state.mark_to_be_ignored()
-        self.__dump_state()
-        self.__state.active_dataset = new_dataset
-        self.__state.mark_not_to_be_ignored()
-        self.__dump_state()
+        # Trickle refreshes of other processes check the dataset under the lock.
+        with lock_file(self.__state_lock_path):
+            self.__state.active_dataset = new_dataset
+            self.__state.generation = new_generation
+            self.__state.is_partial = False
+            self.__dataset_shard = self.__shard
+            self.__cache_generation = new_generation
+            self.__dump_state()
         self.__revision.indicate_transited()
+        await asyncio.to_thread(self.__wait_for_exports)
         await self.__remove_dataset(new_dataset.other)
         self.__revision.indicate_completed()
 
-    async def __prepare_new_dataset(self, dataset: DatasetID) -> None:
+    async def __prepare_new_dataset(self, dataset: DatasetID, digests: array) -> None:
         dataset_dir = self.__get_dataset_dir(dataset)
         await asyncio.to_thread(lambda: make_empty_dir(dataset_dir))
-        await asyncio.gather(
-            *[
-                self.__prepare_batch(dataset, batch_index)
-                for batch_index in range(self.__coroutine_number)
-            ]
-        )
 
-    async def __prepare_batch(self, dataset: DatasetID, batch_index: int) -> None:
+        def on_prepared(amount: int) -> None:
+            self.__prepared_prefix_amount += amount
+            self.__revision.progress = (
+                100 * self.__prepared_prefix_amount // self.__shard.size
+            )
+
+        prefix_numbers = await asyncio.to_thread(self.__order_by_popularity)
         with self.__revision_step_manager:
-            for prefix_index in range(
-                batch_index * PWNED_PREFIX_CAPACITY // self.__coroutine_number,
-                (batch_index + 1) * PWNED_PREFIX_CAPACITY // self.__coroutine_number,
-            ):
-                hash_prefix = number_to_hex_code(prefix_index, PWNED_PREFIX_CAPACITY)
-                file_path = join_paths(
-                    self.__get_dataset_dir(dataset), f"{hash_prefix}.txt"
+            if self.__process_number > 1:
+                self.__pipeline_statistics = await download_ranges_in_processes(
+                    self.__get_range_provider(),
+                    dataset_dir,
+                    prefix_numbers,
+                    self.__process_number,
+                    self.__coroutine_number,
+                    on_prepared,
+                    self.__writer_number,
+                    digests,
                 )
-                write(file_path, await self.__range_provider.get_range(hash_prefix))
-                self.__prepared_prefix_amount += 1
-                self.__revision.progress = (
-                    100 * self.__prepared_prefix_amount // PWNED_PREFIX_CAPACITY
+            else:
+                self.__pipeline_statistics = await download_ranges(
+                    self.__get_range_provider(),
+                    dataset_dir,
+                    prefix_numbers,
+                    self.__coroutine_number,
+                    on_prepared,
+                    self.__writer_number,
+                    digests=digests,
                 )
 
+    def __order_by_popularity(self) -> List[int]:
+        counts = read_access_counts(self.__access_file_path)
+        # The sort is stable, so prefixes with equal counts keep the numeric order.
+        return sorted(
+            self.__shard.prefix_numbers,
+            key=lambda prefix_number: -counts[prefix_number],
+        )
+
+    async def __warm_up_dataset(self, dataset: DatasetID) -> None:
+        if self.__warm_up_bytes <= 0:
+            return
+        self.__revision.indicate_warming_up()
+        dataset_dir = self.__get_dataset_dir(dataset)
+        prefix_numbers = await asyncio.to_thread(self.__order_by_popularity)
+        chunk_size = PwnedStorage.WARM_UP_CHUNK_SIZE
+        warmed_up_bytes = 0
+        start_ts = time.monotonic()
+        for chunk_start in range(0, len(prefix_numbers), chunk_size):
+            if warmed_up_bytes >= self.__warm_up_bytes:
+                break
+            prefixes = [
+                number_to_hex_code(prefix_number, PWNED_PREFIX_CAPACITY)
+                for prefix_number in prefix_numbers[
+                    chunk_start : chunk_start + chunk_size
+                ]
+            ]
+            warmed_up_bytes += await self.__prefetch(dataset_dir, prefixes)
+            self.__revision.progress = min(
+                100, 100 * warmed_up_bytes // self.__warm_up_bytes
+            )
+            if self.__warm_up_rate > 0:
+                # The reads are throttled so the warm-up does not starve serving requests.
+                await asyncio.sleep(
+                    start_ts + warmed_up_bytes / self.__warm_up_rate - time.monotonic()
+                )
+
+    @staticmethod
+    async def __prefetch(dataset_dir: str, prefixes: List[str]) -> int:
+        def prefetch_range(prefix: str) -> int:
+            try:
+                return prefetch(join_paths(dataset_dir, f"{prefix}.txt"))
+            except FileNotFoundError:
+                return 0
+
+        def prefetch_ranges() -> int:
+            with ThreadPoolExecutor(PwnedStorage.DEFAULT_THREAD_NUMBER) as executor:
+                return sum(executor.map(prefetch_range, prefixes))
+
+        return await asyncio.to_thread(prefetch_ranges)
+
+    async def __sync_dataset(self, dataset: DatasetID) -> None:
+        # Range files are written without per-file syncs, so the whole dataset is
+        # flushed in one batched pass before it can be referenced by the state file.
+        dataset_dir = self.__get_dataset_dir(dataset)
+        await asyncio.to_thread(lambda: sync_file_system(dataset_dir))
+
+    def __wait_for_exports(self) -> None:
+        # Exports started after the switch read the new dataset, so it's enough
+        # to wait until the ones holding the lock are finished.
+        with lock_file(self.__export_lock_path):
+            pass
+
     async def __remove_dataset(self, dataset: DatasetID) -> None:
         try:
             await asyncio.to_thread(lambda: remove_dir(self.__get_dataset_dir(dataset)))
-        except Exception as error:
-            pass
+        except Exception:
+            # A leftover dataset is overwritten by the next update, so it's not fatal.
+            logger.warning(
+                "Failed to remove the dataset %s.", dataset.value, exc_info=True
+            )
 
     def __dump_state(self) -> None:
         state = dict()
         if self.__state.active_dataset is not None:
             state[StoredStateKeys.ACTIVE_DATASET] = self.__state.active_dataset.value
-        if self.__state.is_to_be_ignored:
-            state[StoredStateKeys.IGNORE_STATE_IN_FILE] = self.__state.is_to_be_ignored
-        write(self.__state_file_path, json.dumps(state), overwrite=True)
+            state[StoredStateKeys.GENERATION] = self.__state.generation
+            if not self.__dataset_shard.is_full:
+                state[StoredStateKeys.SHARD] = str(self.__dataset_shard)
+        if self.__state.is_partial:
+            state[StoredStateKeys.PARTIAL] = True
+        replace(self.__state_file_path, json.dumps(state))
+        self.__state_file_mtime = get_modification_time(self.__state_file_path)
+
+    def __refresh_state(self) -> None:
+        # Picks up datasets committed by other processes (e.g. the update program).
+        now = time.monotonic()
+        # A background filling does not stop it, only a transition of this process.
+        if now < self.__next_state_check_ts or self.__revision.is_transiting:
+            return
+        self.__next_state_check_ts = now + PwnedStorage.STATE_CHECK_INTERVAL_SECONDS
+        if get_modification_time(self.__state_file_path) != self.__state_file_mtime:
+            self.__import_state_from_file()
 
     def __import_state_from_file(self) -> None:
-        if not is_file(self.__state_file_path):
+        self.__state_file_mtime = get_modification_time(self.__state_file_path)
+        if self.__state_file_mtime is None:
             return
         try:
             state = json.loads(read(self.__state_file_path))
@@ -200,11 +1081,73 @@ class PwnedStorage:
             and state[StoredStateKeys.IGNORE_STATE_IN_FILE]
         ):
             return
-        if StoredStateKeys.ACTIVE_DATASET in state:
-            for dataset in DatasetID:
-                if dataset.value == state[StoredStateKeys.ACTIVE_DATASET]:
-                    self.__state.active_dataset = dataset
+        active_dataset = None
+        for dataset in DatasetID:
+            if dataset.value == state.get(StoredStateKeys.ACTIVE_DATASET):
+                active_dataset = dataset
+        generation = state.get(StoredStateKeys.GENERATION, 1)
+        try:
+            stored_shard = PrefixShard.parse(state[StoredStateKeys.SHARD])
+        except (KeyError, TypeError, ValueError):
+            stored_shard = PrefixShard.full()
+        if not self.__is_shard_configured:
+            self.__shard = stored_shard
+        # A dataset built for another shard stays active until the storage is updated,
+        # so the update does not overwrite it while other processes still serve it.
+        self.__dataset_shard = stored_shard
+        if active_dataset is None or not isinstance(generation, int) or generation < 1:
+            generation = 0
+        previous_dataset = self.__state.active_dataset
+        previous_generation = self.__state.generation
+        self.__state.active_dataset = active_dataset
+        self.__state.generation = generation
+        self.__state.is_partial = state.get(StoredStateKeys.PARTIAL) is True
+        self.__invalidate_cache(previous_dataset, previous_generation)
+
+    def __invalidate_cache(
+        self, previous_dataset: Optional[DatasetID], previous_generation: int
+    ) -> None:
+        dataset, generation = self.__state.active_dataset, self.__state.generation
+        if dataset == previous_dataset and generation == previous_generation:
+            return
+        prefix_numbers = None
+        if dataset == previous_dataset and generation > previous_generation:
+            # The dataset has been refreshed in place, its change records tell
+            # which ranges are outdated.
+            prefix_numbers = read_changes_since(
+                self.__changes_dir,
+                previous_generation,
+                generation,
+                PwnedStorage.CHANGE_HISTORY_LENGTH,
+            )
+        if prefix_numbers is None:
+            # All cached ranges are dropped by starting to use new keys.
+            self.__eviction_number += 1
+            self.__cache_generation = generation
+        else:
+            self.__evict_ranges(prefix_numbers)
+
+    def __evict_ranges(self, prefix_numbers: Iterable[int]) -> None:
+        self.__eviction_number += 1
+        for prefix_number in prefix_numbers:
+            prefix = number_to_hex_code(prefix_number, PWNED_PREFIX_CAPACITY)
+            for is_binary in [False, True]:
+                self.__cache.remove((self.__cache_generation, prefix, is_binary))
 
     def __initialize(self) -> None:
         make_dir_if_not_exists(self.__resource_dir)
         self.__import_state_from_file()
+        if self.__state.active_dataset is None and self.__read_through_provider:
+            # Workers start at once, only the first one creates the dataset.
+            with lock_file(self.__state_lock_path):
+                self.__import_state_from_file()
+                if self.__state.active_dataset is None:
+                    self.__start_partial_dataset()
+
+    def __start_partial_dataset(self) -> None:
+        make_empty_dir(self.__get_dataset_dir(DatasetID.A))
+        self.__state.active_dataset = DatasetID.A
+        self.__dataset_shard = self.__shard
+        self.__state.generation += 1
+        self.__state.is_partial = True
+        self.__dump_state()
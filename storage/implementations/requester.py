@@ -1,10 +1,16 @@
+import asyncio
 import ssl
+import time
+from email.utils import parsedate_to_datetime
+from typing import Mapping, Optional, Set
 
 import aiohttp
 import certifi
 import urllib3
 
+from storage.auxiliary.latency import LatencyTracker
 from storage.core.models.range_provider import PwnedRangeProvider
+from storage.core.models.request_statistics import RequestStatistics
 
 urllib3.disable_warnings(urllib3.exceptions.InsecureRequestWarning)
 
@@ -16,18 +22,198 @@ class PwnedRequester(PwnedRangeProvider):
     USER_AGENT = {
         "user-agent": "axhse-petrkamnev-password-checking-service",
     }
+    DEFAULT_CONNECT_TIMEOUT_SECONDS = 10
+    DEFAULT_READ_TIMEOUT_SECONDS = 30
+    DEFAULT_PREFIX_DEADLINE_SECONDS = 300
+    RETRY_PAUSE_SECONDS = 1
+
+    def __init__(
+        self,
+        range_url: str = PWNED_RANGE_URL,
+        connect_timeout_seconds: float = DEFAULT_CONNECT_TIMEOUT_SECONDS,
+        read_timeout_seconds: float = DEFAULT_READ_TIMEOUT_SECONDS,
+        prefix_deadline_seconds: float = DEFAULT_PREFIX_DEADLINE_SECONDS,
+        hedging_percentile: Optional[float] = None,
+        ca_file: Optional[str] = None,
+    ):
+        """
+        Initialize a new PwnedRequester instance.
+
+        :param range_url: The range API URL the hash prefix is appended to.
+        :param connect_timeout_seconds: The timeout of connecting to the server.
+        :param read_timeout_seconds: The timeout of reading a piece of the response.
+        :param prefix_deadline_seconds: The time within which failed requests for a
+            prefix are retried.
+        :param hedging_percentile: If specified, the latency percentile (from 0 to 100)
+            after which a second request for the same prefix is sent if the first
+            one has not finished yet. The percentile is learned from recent requests.
+        :param ca_file: The file of trusted CA certificates (certifi ones by default).
+        """
+        self.__range_url: str = range_url
+        self.__timeout: aiohttp.ClientTimeout = aiohttp.ClientTimeout(
+            sock_connect=connect_timeout_seconds, sock_read=read_timeout_seconds
+        )
+        self.__prefix_deadline_seconds: float = prefix_deadline_seconds
+        self.__latency_tracker: Optional[LatencyTracker] = (
+            None if hedging_percentile is None else LatencyTracker(hedging_percentile)
+        )
+        self.__ca_file: str = ca_file or certifi.where()
+        self.__session: Optional[aiohttp.ClientSession] = None
+        self.__session_loop: Optional[asyncio.AbstractEventLoop] = None
+        self.__prefix_number: int = 0
+        self.__request_number: int = 0
+        self.__failed_request_number: int = 0
+        self.__hedged_request_number: int = 0
+        self.__hedge_win_number: int = 0
+
+    @property
+    def statistics(self) -> RequestStatistics:
+        """
+        Get the statistics of the requests made.
+        :return: The request statistics.
+        """
+        return RequestStatistics(
+            self.__prefix_number,
+            self.__request_number,
+            self.__failed_request_number,
+            self.__hedged_request_number,
+            self.__hedge_win_number,
+        )
+
+    def include_statistics(self, statistics: RequestStatistics) -> None:
+        """
+        Add the statistics of requests made by a copy of the client (e.g. in another process).
+        :param statistics: The request statistics to be added.
+        """
+        self.__prefix_number += statistics.prefix_number
+        self.__request_number += statistics.request_number
+        self.__failed_request_number += statistics.failed_request_number
+        self.__hedged_request_number += statistics.hedged_request_number
+        self.__hedge_win_number += statistics.hedge_win_number
+
+    async def open(self) -> None:
+        """
+        Open a connection pool shared by requests from the running event loop.
+        Without it, every request uses its own connection.
+        """
+        await self.close()
+        self.__session = self.__create_session(limit=0)
+        self.__session_loop = asyncio.get_running_loop()
+
+    async def close(self) -> None:
+        """Close the connection pool."""
+        if self.__session is not None:
+            session, self.__session = self.__session, None
+            self.__session_loop = None
+            await session.close()
 
     async def get_range(self, hash_prefix: str) -> str:
         """
         Requests the Pwned password leak record range for a hash prefix.
 
+        Requests failed due to network errors, timeouts, throttling (429) and server
+        errors (5xx) are retried until the prefix deadline expires, honoring
+        the Retry-After header. Other client errors (4xx) are not retried.
+
         :param hash_prefix: The hash prefix to query.
         :return: The range as plain text.
+        :raises aiohttp.ClientResponseError: If the request is rejected as invalid.
+        :raises asyncio.TimeoutError: If the prefix deadline expires.
         """
-        ssl_context = ssl.create_default_context(cafile=certifi.where())
-        conn = aiohttp.TCPConnector(ssl=ssl_context)
-        async with aiohttp.ClientSession(connector=conn) as session:
-            async with session.get(
-                f"{self.PWNED_RANGE_URL}{hash_prefix}", headers=self.USER_AGENT
-            ) as resp:
-                return (await resp.text()).replace("\r\n", "\n")
+        records = await asyncio.wait_for(
+            self.__request_until_succeeded(hash_prefix),
+            self.__prefix_deadline_seconds,
+        )
+        self.__prefix_number += 1
+        return records
+
+    async def __request_until_succeeded(self, hash_prefix: str) -> str:
+        while True:
+            try:
+                return await self.__request_hedged(hash_prefix)
+            except aiohttp.ClientResponseError as error:
+                if error.status != 429 and error.status < 500:
+                    raise
+                await asyncio.sleep(PwnedRequester.__get_retry_pause(error.headers))
+            except (aiohttp.ClientError, asyncio.TimeoutError):
+                await asyncio.sleep(PwnedRequester.RETRY_PAUSE_SECONDS)
+
+    @staticmethod
+    def __get_retry_pause(headers: Optional[Mapping[str, str]]) -> float:
+        retry_after = (headers or {}).get("Retry-After")
+        if retry_after is None:
+            return PwnedRequester.RETRY_PAUSE_SECONDS
+        if retry_after.strip().isdigit():
+            return float(retry_after)
+        # The header can also be an HTTP date.
+        try:
+            return max(
+                0.0, parsedate_to_datetime(retry_after).timestamp() - time.time()
+            )
+        except (TypeError, ValueError):
+            return PwnedRequester.RETRY_PAUSE_SECONDS
+
+    async def __request_hedged(self, hash_prefix: str) -> str:
+        hedging_delay = self.__latency_tracker and self.__latency_tracker.value
+        first_request = asyncio.ensure_future(self.__request(hash_prefix))
+        if not hedging_delay:
+            return await first_request
+        pending: Set[asyncio.Future] = {first_request}
+        try:
+            done, pending = await asyncio.wait(pending, timeout=hedging_delay)
+            if not done:
+                self.__hedged_request_number += 1
+                pending.add(asyncio.ensure_future(self.__request(hash_prefix)))
+            error = None
+            while True:
+                for request in done:
+                    if request.exception() is None:
+                        if request is not first_request:
+                            self.__hedge_win_number += 1
+                        return request.result()
+                    error = error or request.exception()
+                if not pending:
+                    raise error
+                done, pending = await asyncio.wait(
+                    pending, return_when=asyncio.FIRST_COMPLETED
+                )
+        finally:
+            for request in pending:
+                request.cancel()
+
+    async def __request(self, hash_prefix: str) -> str:
+        self.__request_number += 1
+        start_ts = time.monotonic()
+        try:
+            if self.__session_loop is asyncio.get_running_loop():
+                records = await self.__request_with(self.__session, hash_prefix)
+            else:
+                async with self.__create_session() as session:
+                    records = await self.__request_with(session, hash_prefix)
+        except (aiohttp.ClientError, asyncio.TimeoutError):
+            self.__failed_request_number += 1
+            raise
+        if self.__latency_tracker is not None:
+            self.__latency_tracker.add(time.monotonic() - start_ts)
+        return records
+
+    async def __request_with(
+        self, session: aiohttp.ClientSession, hash_prefix: str
+    ) -> str:
+        async with session.get(
+            f"{self.__range_url}{hash_prefix}", headers=self.USER_AGENT
+        ) as resp:
+            resp.raise_for_status()
+            return (await resp.text()).replace("\r\n", "\n")
+
+    def __create_session(self, limit: int = 100) -> aiohttp.ClientSession:
+        ssl_context = ssl.create_default_context(cafile=self.__ca_file)
+        connector = aiohttp.TCPConnector(ssl=ssl_context, limit=limit)
+        return aiohttp.ClientSession(connector=connector, timeout=self.__timeout)
+
+    def __getstate__(self) -> dict:
+        # The connection pool belongs to the event loop of its process.
+        state = self.__dict__.copy()
+        state["_PwnedRequester__session"] = None
+        state["_PwnedRequester__session_loop"] = None
+        return state
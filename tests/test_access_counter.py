@@ -0,0 +1,103 @@
+import multiprocessing
+import threading
+
+import pytest
+
+from storage.auxiliary.access_counter import (
+    AccessCounter,
+    get_hottest_prefix_numbers,
+    read_access_counts,
+)
+from storage.auxiliary.filetools import join_paths, make_empty_dir
+from storage.core.models.prefix_shard import PrefixShard
+from storage.implementations.mocked_requester import MockedPwnedRequester
+from storage.implementations.pwned_storage import PwnedStorage
+from tests.shared import temp_dir
+
+
+class RecordingRequester(MockedPwnedRequester):
+    def __init__(self):
+        super().__init__()
+        self.prefixes = []
+
+    async def get_range(self, hash_prefix: str) -> str:
+        self.prefixes.append(hash_prefix)
+        return await super().get_range(hash_prefix)
+
+
+def test_merge(temp_dir: str):
+    access_dir = join_paths(temp_dir, "access")
+    make_empty_dir(access_dir)
+    path = join_paths(access_dir, "access.bin")
+    first_counter, second_counter = AccessCounter(path, 60), AccessCounter(path, 60)
+    for prefix_number in [5, 5, 7]:
+        first_counter.count(prefix_number)
+    for prefix_number in [7, 7, 9]:
+        second_counter.count(prefix_number)
+    first_counter.persist()
+    second_counter.persist()
+    first_counter.persist()
+    counts = read_access_counts(path)
+    assert (counts[5], counts[7], counts[9]) == (2, 3, 1)
+    assert get_hottest_prefix_numbers(counts, 2) == [7, 5]
+    assert get_hottest_prefix_numbers(counts, 10) == [7, 5, 9]
+
+
+def count_accesses(path: str, prefix_number: int, amount: int) -> None:
+    counter = AccessCounter(path, 60)
+    for _ in range(amount):
+        counter.count(prefix_number)
+        counter.persist()
+
+
+def test_merge_in_processes(temp_dir: str):
+    access_dir = join_paths(temp_dir, "access-processes")
+    make_empty_dir(access_dir)
+    path = join_paths(access_dir, "access.bin")
+    context = multiprocessing.get_context("spawn")
+    processes = [
+        context.Process(target=count_accesses, args=(path, 5, 5)) for _ in range(4)
+    ]
+    for process in processes:
+        process.start()
+    for process in processes:
+        process.join()
+    assert read_access_counts(path)[5] == 20
+
+
+def test_merge_in_threads(temp_dir: str):
+    access_dir = join_paths(temp_dir, "access-threads")
+    make_empty_dir(access_dir)
+    path = join_paths(access_dir, "access.bin")
+    counter = AccessCounter(path, 60)
+
+    def count() -> None:
+        for _ in range(20000):
+            counter.count(5)
+
+    threads = [threading.Thread(target=count) for _ in range(4)]
+    for thread in threads:
+        thread.start()
+    # Counts are swapped out while other threads still count.
+    for _ in range(3):
+        counter.persist()
+    for thread in threads:
+        thread.join()
+    counter.persist()
+    assert read_access_counts(path)[5] == 80000
+
+
+@pytest.mark.asyncio
+async def test_hot_first_update(temp_dir: str):
+    resource_dir = join_paths(temp_dir, "access-storage")
+    shard = PrefixShard.parse("FAD00-FADFF")
+    storage = PwnedStorage(
+        resource_dir, 1, MockedPwnedRequester(), shard=shard, track_access=True
+    )
+    await storage.update()
+    for prefix in ["FADED", "FADED", "FAD42"]:
+        await storage.get_range(prefix)
+    assert storage.get_access_counts() == [("FADED", 2), ("FAD42", 1)]
+    requester = RecordingRequester()
+    await PwnedStorage(resource_dir, 1, requester, shard=shard).update()
+    assert requester.prefixes[:3] == ["FADED", "FAD42", "FAD00"]
@@ -0,0 +1,40 @@
+import threading
+import time
+
+import pytest
+
+from service.auxiliary.admission import AdmissionController, Rejection
+
+
+def test_rate_limit():
+    admission = AdmissionController(client_rate=1, client_burst=2)
+    for _ in range(2):
+        admission.acquire("client")
+        admission.release()
+    with pytest.raises(Rejection) as rejection:
+        admission.acquire("client")
+    assert rejection.value.status_code == 429
+    assert rejection.value.retry_after_seconds == 1
+    admission.acquire("other client")
+    admission.release()
+
+
+def test_queue():
+    admission = AdmissionController(1, 1, 0.2)
+    admission.acquire("client")
+    waiter = threading.Thread(target=lambda: admission.acquire("client"))
+    waiter.start()
+    time.sleep(0.05)
+    with pytest.raises(Rejection) as rejection:
+        admission.acquire("client")
+    assert rejection.value.status_code == 503
+    admission.release()
+    waiter.join()
+    with pytest.raises(Rejection):
+        admission.acquire("client")
+    assert admission.statistics == {
+        "admitted": 2,
+        "rejected": 2,
+        "in_flight": 1,
+        "waiting": 0,
+    }
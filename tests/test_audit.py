@@ -0,0 +1,63 @@
+import hashlib
+
+import numpy as np
+import pytest
+
+from devops_cli.auxiliary.audit import HASH_LENGTH, audit_hashes, load_hashes
+from storage.auxiliary.filetools import join_paths, make_empty_dir, write
+from storage.core.models.prefix_shard import OutOfShardError, PrefixShard
+from storage.implementations.mocked_requester import MockedPwnedRequester
+from storage.implementations.pwned_storage import PwnedStorage
+from tests.shared import temp_dir
+
+
+async def __create_storage(resource_dir: str) -> PwnedStorage:
+    shard = PrefixShard.parse("FAD00-FADFF")
+    storage = PwnedStorage(resource_dir, 4, MockedPwnedRequester(), shard=shard)
+    await storage.update()
+    return storage
+
+
+def __to_hashes(hashes: list) -> np.ndarray:
+    return np.array(hashes, dtype=f"S{HASH_LENGTH}")
+
+
+@pytest.mark.asyncio
+async def test_audit(temp_dir: str):
+    storage = await __create_storage(join_paths(temp_dir, "audited-storage"))
+    records = MockedPwnedRequester().generate_range("FADED").splitlines()
+    leaks = [record.split(":") for record in records[:2]]
+    leaked_hashes = [f"FADED{suffix}" for suffix, _ in leaks]
+    known_suffixes = {record.split(":")[0] for record in records}
+    safe_hash = next(
+        f"FADED{suffix}"
+        for suffix in [f"{index:035X}" for index in range(len(records) + 1)]
+        if suffix not in known_suffixes
+    )
+    hashes = __to_hashes([leaked_hashes[1], safe_hash, leaked_hashes[0]])
+    counts = await audit_hashes(storage, hashes)
+    assert counts.tolist() == [int(leaks[1][1]), 0, int(leaks[0][1])]
+
+
+@pytest.mark.asyncio
+async def test_audit_missing_prefix(temp_dir: str):
+    storage = await __create_storage(join_paths(temp_dir, "partly-audited-storage"))
+    # Ranges of prefixes missing in the storage cannot be checked.
+    with pytest.raises(OutOfShardError):
+        await audit_hashes(storage, __to_hashes(["FAE00" + "0" * 35]))
+
+
+def test_load_hashes(temp_dir: str):
+    input_dir = join_paths(temp_dir, "audit-input")
+    make_empty_dir(input_dir)
+    password_path = join_paths(input_dir, "passwords.txt")
+    write(password_path, "password\nqwerty\n")
+    hashes = load_hashes(password_path, False, 1)
+    assert [password_hash.decode() for password_hash in hashes] == [
+        hashlib.sha1(password.encode()).hexdigest().upper()
+        for password in ["password", "qwerty"]
+    ]
+    hash_path = join_paths(input_dir, "hashes.txt")
+    write(hash_path, hashes[0].decode().lower() + "\nFADED\n")
+    with pytest.raises(ValueError):
+        load_hashes(hash_path, True, 1)
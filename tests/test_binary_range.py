@@ -0,0 +1,25 @@
+import pytest
+
+from storage.implementations.binary_range import (
+    SUFFIX_SIZE,
+    decode_range,
+    decode_range_to_text,
+    encode_range,
+)
+from storage.implementations.mocked_requester import MockedPwnedRequester
+
+
+def test_roundtrip():
+    records = "0018A45C4D1DEF81644B54AB7F969B88D65:1\nFFFFFFFFFFFFFFFFFFFFFFFFFFFFFFFFFFF:4294967295"
+    data = encode_range(records)
+    assert len(data) == 4 + 2 * (SUFFIX_SIZE + 4)
+    assert decode_range(data)[1] == ("F" * 35, 4294967295)
+    assert decode_range_to_text(data) == records
+    assert decode_range(encode_range("")) == []
+
+
+@pytest.mark.asyncio
+async def test_mocked_range():
+    records = await MockedPwnedRequester().get_range("FADED")
+    assert decode_range_to_text(encode_range(records)) == records
+    assert decode_range_to_text(encode_range(records.replace("\n", "\r\n"))) == records
@@ -0,0 +1,41 @@
+import pytest
+
+from storage.auxiliary.filetools import join_paths
+from storage.core.models.prefix_shard import PrefixShard
+from storage.implementations.mocked_requester import MockedPwnedRequester
+from storage.implementations.pwned_storage import PwnedStorage
+from tests.shared import temp_dir
+
+
+@pytest.mark.asyncio
+async def test_changes(temp_dir: str, monkeypatch: pytest.MonkeyPatch):
+    monkeypatch.setattr(PwnedStorage, "TRICKLE_BATCH_INTERVAL_SECONDS", 0)
+    resource_dir = join_paths(temp_dir, "changed-storage")
+    shard = PrefixShard.parse("FAD00-FADFF")
+    storage = PwnedStorage(resource_dir, 4, MockedPwnedRequester(), shard=shard)
+    await storage.update()
+    change_set = storage.get_changes(0)
+    assert change_set.generation == 1
+    assert len(change_set.changes) == shard.size
+    # Digests are computed by the writers of every download process.
+    storage = PwnedStorage(
+        resource_dir, 4, MockedPwnedRequester(), shard=shard, process_number=2
+    )
+    await storage.update()
+    assert storage.get_changes(1).changes == []
+
+    requester = MockedPwnedRequester(range_size=3)
+    storage = PwnedStorage(resource_dir, 4, requester)
+    await storage.trickle_refresh(16, 2)
+    change_set = storage.get_changes(2)
+    assert change_set.generation == 4
+    assert [prefix for prefix, _ in change_set.changes] == [
+        f"FAD{index:02X}" for index in range(32)
+    ]
+    assert storage.get_changes(3).changes == change_set.changes[16:]
+    assert storage.get_changes(-1) is None
+    assert storage.get_changes(4 - PwnedStorage.CHANGE_HISTORY_LENGTH - 1) is None
+
+    # Digests of refreshed ranges match the ones of a rebuilt dataset.
+    await storage.update()
+    assert len(storage.get_changes(4).changes) == shard.size - 32
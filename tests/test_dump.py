@@ -0,0 +1,44 @@
+import os
+
+import pytest
+
+from storage.auxiliary.filetools import is_file, join_paths, make_empty_dir
+from storage.implementations.dump_range_provider import DumpRangeProvider
+from storage.implementations.file_range_provider import FileRangeImporter
+from storage.implementations.mocked_requester import MockedPwnedRequester
+from tests.shared import temp_dir
+
+DUMP_PREFIXES = ["00000", "00001", "00003", "7FFFF", "FFFFF"]
+
+
+def write_dump(path: str, prefixes: list) -> None:
+    requester = MockedPwnedRequester(range_size=20)
+    with open(path, "wb") as dump:
+        for prefix in prefixes:
+            for record in requester.generate_range(prefix).split("\n"):
+                dump.write(f"{prefix}{record}\r\n".encode())
+
+
+@pytest.mark.asyncio
+async def test_dump_range_provider(temp_dir: str):
+    dump_dir = join_paths(temp_dir, "dump")
+    make_empty_dir(dump_dir)
+    dump_path = join_paths(dump_dir, "pwned.txt")
+    write_dump(dump_path, DUMP_PREFIXES)
+    provider = DumpRangeProvider(dump_path)
+    assert is_file(dump_path + ".idx")
+    importer = FileRangeImporter(dump_path)
+    for prefix in DUMP_PREFIXES + ["00002", "80000"]:
+        assert await provider.get_range(prefix) == await importer.get_range(prefix)
+    assert await provider.get_range("00002") == ""
+    with pytest.raises(ValueError):
+        provider.read_range("0000G")
+
+    # An outdated index is rebuilt only if it's allowed.
+    write_dump(dump_path, DUMP_PREFIXES + ["FFFFF"])
+    os.utime(dump_path, ns=(0, 0))
+    with pytest.raises(RuntimeError):
+        DumpRangeProvider(dump_path, build_index=False)
+    provider = DumpRangeProvider(dump_path)
+    expected_range = MockedPwnedRequester(range_size=20).generate_range("FFFFF")
+    assert await provider.get_range("FFFFF") == f"{expected_range}\n{expected_range}"
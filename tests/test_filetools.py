@@ -0,0 +1,31 @@
+import os
+
+from storage.auxiliary.filetools import (
+    join_paths,
+    make_empty_dir,
+    read,
+    replace,
+    sync_file_system,
+    write,
+)
+from tests.shared import temp_dir
+
+
+def test_replace(temp_dir: str):
+    dir_path = join_paths(temp_dir, "filetools-replace")
+    make_empty_dir(dir_path)
+    file_path = join_paths(dir_path, "state.json")
+    replace(file_path, '{"dataset": "a"}')
+    replace(file_path, '{"dataset": "b"}')
+    assert read(file_path) == '{"dataset": "b"}'
+    assert os.listdir(dir_path) == ["state.json"]
+
+
+def test_overwrite_and_sync(temp_dir: str):
+    dir_path = join_paths(temp_dir, "filetools-sync")
+    make_empty_dir(dir_path)
+    file_path = join_paths(dir_path, "FADED.txt")
+    for _ in range(2):
+        write(file_path, ["A:1\n", "B:2"], overwrite=True)
+    sync_file_system(dir_path)
+    assert read(file_path) == "A:1\nB:2"
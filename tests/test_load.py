@@ -0,0 +1,78 @@
+import asyncio
+from collections import Counter
+
+import pytest
+from aiohttp import web
+
+from devops_cli.auxiliary.load import (
+    LoadResult,
+    PrefixDistribution,
+    create_prefix_sampler,
+    generate_load,
+    read_logged_prefixes,
+)
+from storage.auxiliary.filetools import join_paths
+from tests.shared import temp_dir
+
+
+def test_zipf_skew():
+    sample_prefix = create_prefix_sampler(PrefixDistribution.ZIPF, seed=1)
+    counts = Counter(sample_prefix() for _ in range(10000))
+    assert all(len(prefix) == 5 for prefix in counts)
+    # The most popular prefix receives about 7% of requests with the exponent of 1.
+    assert counts.most_common(1)[0][1] > 500
+
+
+def test_log_replay(temp_dir: str):
+    log_path = join_paths(temp_dir, "access.log")
+    with open(log_path, "w") as log:
+        log.write('127.0.0.1 - - [19/Oct/2026] "GET /range/faded HTTP/1.1" 200 -\n')
+        log.write('127.0.0.1 - - [19/Oct/2026] "GET /stats HTTP/1.1" 200 -\n')
+        log.write("00000\n")
+    assert read_logged_prefixes(log_path) == ["FADED", "00000"]
+    sample_prefix = create_prefix_sampler(PrefixDistribution.LOG, log_path=log_path)
+    assert [sample_prefix() for _ in range(3)] == ["FADED", "00000", "FADED"]
+
+
+def test_report():
+    result = LoadResult()
+    for index in range(1000):
+        result.add(index / 1000, "200" if index % 100 else "503", 10)
+    result.add(1, "ClientConnectionError", 0)
+    result.elapsed_seconds = 2
+    report = result.to_report()
+    assert report["requests"] == 1001
+    assert report["latency_ms"]["p50"] == 500
+    assert report["statuses"] == {"200": 990, "503": 10, "ClientConnectionError": 1}
+    assert report["error_rate"] == round(11 / 1001, 6)
+    assert report["response_size"]["total"] == 10000
+
+
+@pytest.mark.asyncio
+async def test_bounded_rate():
+    in_flight, max_in_flight = 0, 0
+
+    async def handle(request: web.Request) -> web.Response:
+        nonlocal in_flight, max_in_flight
+        in_flight += 1
+        max_in_flight = max(max_in_flight, in_flight)
+        await asyncio.sleep(0.2)
+        in_flight -= 1
+        return web.Response(text="SUFFIX:1")
+
+    app = web.Application()
+    app.router.add_get("/range/{prefix}", handle)
+    runner = web.AppRunner(app)
+    await runner.setup()
+    await web.TCPSite(runner, "127.0.0.1", 0).start()
+    try:
+        url = f"http://127.0.0.1:{runner.addresses[0][1]}/range/"
+        result = await generate_load(url, lambda: "FADED", 0.5, 100, 2)
+    finally:
+        await runner.cleanup()
+    report = result.to_report()
+    assert max_in_flight <= 2
+    # Requests due while both slots are taken by the slow server are dropped.
+    assert report["requests"] + report["dropped"] == 50
+    assert report["dropped"] > 0
+    assert report["statuses"] == {"200": report["requests"]}
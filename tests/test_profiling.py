@@ -0,0 +1,59 @@
+import threading
+
+import pytest
+
+from service.auxiliary.profiling import StackSampler
+from storage.auxiliary.filetools import join_paths
+from storage.auxiliary.timing import get_timer, start_timing
+from storage.core.models.prefix_shard import PrefixShard
+from storage.implementations.mocked_requester import MockedPwnedRequester
+from storage.implementations.pwned_storage import PwnedStorage
+from tests.shared import temp_dir
+
+
+@pytest.mark.asyncio
+async def test_phases(temp_dir: str):
+    resource_dir = join_paths(temp_dir, "timed-storage")
+    storage = PwnedStorage(
+        resource_dir,
+        4,
+        MockedPwnedRequester(),
+        shard=PrefixShard.parse("FAD00-FADFF"),
+        cache_size=16,
+    )
+    await storage.update()
+    assert get_timer() is None
+    timer = start_timing()
+    await storage.get_binary_range("FADED")
+    await storage.get_binary_range("FADED")
+    phases = [name for name, _ in timer.phases]
+    assert phases == ["validate", "wait", "cache", "read", "encode"] + [
+        "validate",
+        "wait",
+        "cache",
+    ]
+    assert timer.to_server_timing().startswith("validate;dur=")
+
+
+def test_stack_sampler():
+    stop_event = threading.Event()
+
+    def spin_in_busy_function() -> None:
+        while not stop_event.is_set():
+            sum(range(1000))
+
+    thread = threading.Thread(target=spin_in_busy_function, name="busy")
+    thread.start()
+    sampler = StackSampler(0.001)
+    try:
+        sampler.sample_for(0.3)
+    finally:
+        stop_event.set()
+        thread.join()
+    busy_stacks = [
+        line
+        for line in sampler.to_folded().splitlines()
+        if line.startswith("busy;") and "spin_in_busy_function" in line
+    ]
+    assert busy_stacks
+    assert all(int(line.rsplit(" ", 1)[1]) > 0 for line in busy_stacks)
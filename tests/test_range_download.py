@@ -0,0 +1,52 @@
+import asyncio
+from array import array
+
+import pytest
+
+from storage.auxiliary.change_log import compute_digest
+from storage.auxiliary.filetools import join_paths, make_empty_dir, read
+from storage.auxiliary.range_download import download_ranges
+from storage.core.models.range_provider import PwnedRangeProvider
+from storage.core.models.revision import Revision
+from storage.implementations.mocked_requester import MockedPwnedRequester
+from storage.implementations.pwned_storage import PwnedStorage, UpdateResult
+from tests.shared import temp_dir
+
+
+class FailingProvider(PwnedRangeProvider):
+    async def get_range(self, hash_prefix: str) -> str:
+        await asyncio.sleep(0)
+        if hash_prefix == "00100":
+            raise ValueError("The upstream is broken.")
+        return "SUFFIX:1"
+
+
+@pytest.mark.asyncio
+async def test_download(temp_dir: str):
+    dataset_dir = join_paths(temp_dir, "download")
+    make_empty_dir(dataset_dir)
+    downloaded = []
+    provider = MockedPwnedRequester()
+    digests = array("Q", bytes(8 * 300))
+    statistics = await download_ranges(
+        provider, dataset_dir, range(1, 300), 8, downloaded.append, 2, 16, digests
+    )
+    assert sum(downloaded) == statistics.range_number == 299
+    assert len(downloaded) == statistics.write_batch_number
+    assert 0 < statistics.max_queue_depth <= 16
+    for prefix in ["00001", "0012B"]:
+        expected_range = provider.generate_range(prefix)
+        assert read(join_paths(dataset_dir, f"{prefix}.txt")) == expected_range
+        assert digests[int(prefix, 16)] == compute_digest(expected_range.encode())
+    assert digests[0] == 0
+
+
+@pytest.mark.asyncio
+async def test_failure_in_process(temp_dir: str):
+    resource_dir = join_paths(temp_dir, "download-failure")
+    storage = PwnedStorage(resource_dir, 4, FailingProvider(), process_number=2)
+    assert await storage.update() == UpdateResult.FAILED
+    revision = storage.revision
+    assert revision.status == Revision.Status.FAILED
+    assert str(revision.error) == "The upstream is broken."
+    assert storage.active_dataset is None
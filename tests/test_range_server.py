@@ -0,0 +1,52 @@
+import aiohttp
+import pytest
+from aiohttp import web
+
+from devops_cli.auxiliary.range_server import RangeServerSettings, create_range_server
+from storage.implementations.mocked_requester import MockedPwnedRequester
+from storage.implementations.requester import PwnedRequester
+
+
+async def __start_server(settings: RangeServerSettings) -> web.AppRunner:
+    runner = web.AppRunner(create_range_server(settings))
+    await runner.setup()
+    await web.TCPSite(runner, "127.0.0.1", 0).start()
+    return runner
+
+
+def __get_range_url(runner: web.AppRunner) -> str:
+    port = runner.addresses[0][1]
+    return f"http://127.0.0.1:{port}/range/"
+
+
+@pytest.mark.asyncio
+async def test_generated_ranges(monkeypatch):
+    monkeypatch.setattr(PwnedRequester, "RETRY_PAUSE_SECONDS", 0)
+    runner = await __start_server(
+        RangeServerSettings(error_rate=0.2, throttle_rate=0.2)
+    )
+    try:
+        requester = PwnedRequester(__get_range_url(runner))
+        for prefix in ["00000", "FADED", "fffff", "12345", "ABCDE", "54321"]:
+            expected_range = MockedPwnedRequester().generate_range(prefix)
+            assert await requester.get_range(prefix) == expected_range
+        assert requester.statistics.failed_request_number > 0
+    finally:
+        await runner.cleanup()
+
+
+@pytest.mark.asyncio
+async def test_etag():
+    runner = await __start_server(RangeServerSettings(range_size=1000))
+    try:
+        url = f"{__get_range_url(runner)}FADED"
+        async with aiohttp.ClientSession() as session:
+            async with session.get(url) as resp:
+                assert len((await resp.text()).splitlines()) > 900
+                etag = resp.headers["ETag"]
+            async with session.get(url, headers={"If-None-Match": etag}) as resp:
+                assert resp.status == 304
+            async with session.get(f"{__get_range_url(runner)}FADE") as resp:
+                assert resp.status == 400
+    finally:
+        await runner.cleanup()
@@ -0,0 +1,118 @@
+import asyncio
+
+import aiohttp
+import pytest
+from aiohttp import web
+
+from storage.auxiliary.latency import LatencyTracker
+from storage.implementations.requester import PwnedRequester
+
+
+async def __start_server(handler) -> web.AppRunner:
+    app = web.Application()
+    app.router.add_get("/range/{prefix}", handler)
+    runner = web.AppRunner(app)
+    await runner.setup()
+    await web.TCPSite(runner, "127.0.0.1", 0).start()
+    return runner
+
+
+def __get_range_url(runner: web.AppRunner) -> str:
+    port = runner.addresses[0][1]
+    return f"http://127.0.0.1:{port}/range/"
+
+
+@pytest.mark.asyncio
+async def test_retry_after_timeout(monkeypatch):
+    calls = []
+
+    async def handle(request: web.Request) -> web.Response:
+        calls.append(True)
+        if len(calls) == 1:
+            await asyncio.sleep(1)
+        return web.Response(text="SUFFIX:1")
+
+    runner = await __start_server(handle)
+    try:
+        monkeypatch.setattr(PwnedRequester, "RETRY_PAUSE_SECONDS", 0)
+        requester = PwnedRequester(__get_range_url(runner), read_timeout_seconds=0.2)
+        assert await requester.get_range("00000") == "SUFFIX:1"
+        statistics = requester.statistics
+        assert statistics.prefix_number == 1
+        assert statistics.request_number == 2
+        assert statistics.failed_request_number == 1
+    finally:
+        await runner.cleanup()
+
+
+@pytest.mark.asyncio
+async def test_deadline():
+    async def handle(request: web.Request) -> web.Response:
+        await asyncio.sleep(1)
+        return web.Response(text="SUFFIX:1")
+
+    runner = await __start_server(handle)
+    try:
+        requester = PwnedRequester(__get_range_url(runner), prefix_deadline_seconds=0.2)
+        with pytest.raises(asyncio.TimeoutError):
+            await requester.get_range("00000")
+    finally:
+        await runner.cleanup()
+
+
+@pytest.mark.asyncio
+async def test_retry_policy(monkeypatch):
+    statuses = {"00001": [429, 503, 200], "00002": [404, 200]}
+    calls = []
+
+    async def handle(request: web.Request) -> web.Response:
+        prefix = request.match_info["prefix"]
+        calls.append(prefix)
+        status = statuses[prefix].pop(0)
+        # Throttled requests are retried after the given pause instead of the default.
+        return web.Response(
+            text="SUFFIX:1", status=status, headers={"Retry-After": "0"}
+        )
+
+    runner = await __start_server(handle)
+    try:
+        monkeypatch.setattr(PwnedRequester, "RETRY_PAUSE_SECONDS", 10)
+        requester = PwnedRequester(__get_range_url(runner), prefix_deadline_seconds=5)
+        assert await requester.get_range("00001") == "SUFFIX:1"
+        with pytest.raises(aiohttp.ClientResponseError):
+            await requester.get_range("00002")
+        assert calls == ["00001", "00001", "00001", "00002"]
+    finally:
+        await runner.cleanup()
+
+
+@pytest.mark.asyncio
+async def test_hedging():
+    # The first requests for these prefixes never finish, so they must be hedged.
+    stuck_prefixes = {
+        f"{LatencyTracker.MIN_SAMPLE_NUMBER + offset:05X}" for offset in [5, 15, 25]
+    }
+    release = asyncio.Event()
+
+    async def handle(request: web.Request) -> web.Response:
+        prefix = request.match_info["prefix"]
+        if prefix in stuck_prefixes:
+            stuck_prefixes.remove(prefix)
+            await release.wait()
+        return web.Response(text="SUFFIX:1")
+
+    runner = await __start_server(handle)
+    try:
+        requester = PwnedRequester(__get_range_url(runner), hedging_percentile=90)
+        await requester.open()
+        for prefix_number in range(1, LatencyTracker.MIN_SAMPLE_NUMBER + 30):
+            assert await requester.get_range(f"{prefix_number:05X}")
+        statistics = requester.statistics
+        assert not stuck_prefixes
+        assert statistics.hedged_request_number >= 3
+        assert statistics.hedge_win_number >= 3
+        assert statistics.failed_request_number == 0
+        await requester.close()
+    finally:
+        release.set()
+        await runner.cleanup()
@@ -0,0 +1,112 @@
+import io
+
+import aiohttp
+import pytest
+from aiohttp import web
+
+from service.router import ShardRouter, create_router, parse_routes
+from storage.auxiliary.filetools import join_paths
+from storage.core.models.prefix_shard import OutOfShardError, PrefixShard
+from storage.implementations.mocked_requester import MockedPwnedRequester
+from storage.implementations.pwned_storage import PwnedStorage, UpdateResult
+from tests.shared import temp_dir
+
+
+def test_prefix_shard():
+    shard = PrefixShard.parse("00000-7ffff")
+    assert str(shard) == "00000-7FFFF"
+    assert shard.size == 2**19
+    assert shard.contains("7FFFF") and not shard.contains("80000")
+    assert PrefixShard.full().is_full and not shard.is_full
+    with pytest.raises(ValueError):
+        PrefixShard.parse("80000-7FFFF")
+
+
+@pytest.mark.asyncio
+async def test_shard_storage(temp_dir: str):
+    resource_dir = join_paths(temp_dir, "shard")
+    shard = PrefixShard.parse("FAD00-FADFF")
+    storage = PwnedStorage(resource_dir, 4, MockedPwnedRequester(), shard=shard)
+    assert await storage.update() == UpdateResult.DONE
+    assert await storage.get_range("FADED") == MockedPwnedRequester().generate_range(
+        "FADED"
+    )
+    with pytest.raises(OutOfShardError):
+        await storage.get_range("FAE00")
+    assert PwnedStorage(resource_dir).shard == shard
+
+    archive = io.BytesIO(b"".join(storage.export_snapshot()))
+    restored_dir = join_paths(temp_dir, "shard-restored")
+    restored_storage = PwnedStorage(restored_dir, shard=shard)
+    assert await restored_storage.restore(archive) == UpdateResult.DONE
+    assert await restored_storage.get_range("FADED") == await storage.get_range("FADED")
+
+    # The dataset of the previous shard is kept until the new one is built next to it.
+    other_shard = PrefixShard.parse("FAE00-FAEFF")
+    other_storage = PwnedStorage(
+        resource_dir, 4, MockedPwnedRequester(), shard=other_shard
+    )
+    previous_dataset = storage.active_dataset
+    assert other_storage.active_dataset == previous_dataset
+    with pytest.raises(RuntimeError):
+        await other_storage.get_range("FAE00")
+    assert await other_storage.update() == UpdateResult.DONE
+    assert other_storage.active_dataset != previous_dataset
+    assert await other_storage.get_range("FAE00") == (
+        MockedPwnedRequester().generate_range("FAE00")
+    )
+
+
+async def __start_app(app: web.Application) -> web.AppRunner:
+    runner = web.AppRunner(app)
+    await runner.setup()
+    await web.TCPSite(runner, "127.0.0.1", 0).start()
+    return runner
+
+
+def __get_url(runner: web.AppRunner) -> str:
+    return f"http://127.0.0.1:{runner.addresses[0][1]}"
+
+
+def __create_backend(name: str) -> web.Application:
+    async def get_range(request: web.Request) -> web.Response:
+        return web.Response(text=f"{name}:{request.match_info['prefix']}")
+
+    app = web.Application()
+    app.router.add_get("/range/{prefix}", get_range)
+    return app
+
+
+@pytest.mark.asyncio
+async def test_router():
+    low_backend = await __start_app(__create_backend("low"))
+    high_backend = await __start_app(__create_backend("high"))
+    dead_url = "http://127.0.0.1:9"
+    routes = parse_routes(
+        f"00000-7FFFF={__get_url(low_backend)};"
+        f"80000-FFFFF={dead_url},{__get_url(high_backend)}"
+    )
+    router = await __start_app(create_router(ShardRouter(routes)))
+    try:
+        async with aiohttp.ClientSession() as session:
+            for prefix, expected_text in [
+                ("12345", "low:12345"),
+                ("FADED", "high:FADED"),
+                ("faded", "high:FADED"),
+                ("80000", "high:80000"),
+            ]:
+                async with session.get(f"{__get_url(router)}/range/{prefix}") as resp:
+                    assert resp.status == 200
+                    assert await resp.text() == expected_text
+            async with session.get(f"{__get_url(router)}/range/XYZ") as resp:
+                assert resp.status == 400
+            async with session.get(f"{__get_url(router)}/stats") as resp:
+                statistics = await resp.json()
+        assert statistics["shards"] == {"00000-7FFFF": 1, "80000-FFFFF": 3}
+        assert statistics["cooling_down"] == [dead_url]
+    finally:
+        for runner in [router, low_backend, high_backend]:
+            await runner.cleanup()
+
+    with pytest.raises(ValueError):
+        ShardRouter(parse_routes(f"00000-7FFFF={dead_url}"))
@@ -0,0 +1,57 @@
+import asyncio
+import threading
+
+import pytest
+
+from storage.auxiliary.single_flight import SingleFlight
+
+
+@pytest.mark.asyncio
+async def test_coalescing():
+    single_flight = SingleFlight(4)
+    release = threading.Event()
+    calls = []
+
+    def read_range() -> str:
+        calls.append(True)
+        release.wait()
+        return "SUFFIX:1"
+
+    tasks = [
+        asyncio.ensure_future(single_flight.run((1, "FADED"), read_range))
+        for _ in range(10)
+    ]
+    other_generation_task = asyncio.ensure_future(
+        single_flight.run((2, "FADED"), read_range)
+    )
+    await asyncio.sleep(0.1)
+    release.set()
+    results = await asyncio.gather(*tasks)
+    await other_generation_task
+    assert len(calls) == 2
+    assert all(result is results[0] for result in results)
+    statistics = single_flight.statistics
+    assert statistics.request_number == 11
+    assert statistics.read_number == 2
+    assert statistics.coalesced_request_number == 9
+    assert statistics.in_flight_read_number == 0
+
+
+@pytest.mark.asyncio
+async def test_failure_is_shared_and_not_cached():
+    single_flight = SingleFlight(4)
+    release = threading.Event()
+
+    def fail() -> str:
+        release.wait()
+        raise FileNotFoundError()
+
+    tasks = [
+        asyncio.ensure_future(single_flight.run((1, "FADED"), fail)) for _ in range(3)
+    ]
+    await asyncio.sleep(0.1)
+    release.set()
+    results = await asyncio.gather(*tasks, return_exceptions=True)
+    assert all(isinstance(result, FileNotFoundError) for result in results)
+    assert await single_flight.run((1, "FADED"), lambda: "SUFFIX:1") == "SUFFIX:1"
+    assert single_flight.statistics.failed_read_number == 1
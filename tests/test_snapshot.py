@@ -0,0 +1,107 @@
+import asyncio
+import io
+
+import pytest
+
+from storage.auxiliary.filetools import join_paths, make_empty_dir, read, write
+from storage.auxiliary.snapshot import (
+    export_snapshot,
+    read_snapshot_header,
+    restore_snapshot,
+)
+from storage.core.models.prefix_shard import PrefixShard
+from storage.implementations.mocked_requester import MockedPwnedRequester
+from storage.implementations.pwned_storage import PwnedStorage, UpdateResult
+from tests.shared import temp_dir
+
+RANGES = {
+    "00000": "0005AD76BD555C1D6D771DE417A4B87E4B4:10\n000A8DAE4228F821FB418F59826079BF368:4",
+    "00001": "",
+    "FADED": "0018A45C4D1DEF81644B54AB7F969B88D65:1",
+}
+PREFIX_NUMBERS = [int(prefix, 16) for prefix in RANGES]
+
+
+def export_ranges(source_dir: str) -> bytes:
+    make_empty_dir(source_dir)
+    for prefix, records in RANGES.items():
+        write(join_paths(source_dir, f"{prefix}.txt"), records, overwrite=True)
+    chunks = export_snapshot(
+        PREFIX_NUMBERS,
+        len(PREFIX_NUMBERS),
+        7,
+        lambda prefix: join_paths(source_dir, f"{prefix}.txt"),
+    )
+    return b"".join(chunks)
+
+
+class Stream(io.RawIOBase):
+    def __init__(self, data: bytes):
+        self.__data = io.BytesIO(data)
+
+    def readable(self) -> bool:
+        return True
+
+    def read(self, size: int = -1) -> bytes:
+        return self.__data.read(min(size, 5))
+
+
+@pytest.mark.parametrize("is_seekable", [True, False])
+def test_snapshot_roundtrip(temp_dir: str, is_seekable: bool):
+    data = export_ranges(join_paths(temp_dir, "snapshot-source"))
+    target_dir = join_paths(temp_dir, "snapshot-target")
+    make_empty_dir(target_dir)
+    archive = io.BytesIO(data) if is_seekable else Stream(data)
+    generation, record_amount = read_snapshot_header(archive)
+    assert (generation, record_amount) == (7, len(RANGES))
+    restored = []
+    restore_snapshot(
+        archive,
+        record_amount,
+        lambda prefix: join_paths(target_dir, f"{prefix}.txt"),
+        2,
+        lambda: restored.append(True),
+    )
+    assert len(restored) == len(RANGES)
+    for prefix, records in RANGES.items():
+        assert read(join_paths(target_dir, f"{prefix}.txt")) == records
+
+
+def test_corrupted_snapshot(temp_dir: str):
+    data = bytearray(export_ranges(join_paths(temp_dir, "snapshot-source")))
+    data[data.index(b"FB418F")] = ord("0")
+    archive = Stream(bytes(data))
+    _, record_amount = read_snapshot_header(archive)
+    with pytest.raises(ValueError):
+        restore_snapshot(
+            archive,
+            record_amount,
+            lambda prefix: join_paths(temp_dir, f"{prefix}.txt"),
+            1,
+            lambda: None,
+        )
+
+
+@pytest.mark.asyncio
+async def test_export_during_update(temp_dir: str):
+    resource_dir = join_paths(temp_dir, "exported-storage")
+    shard = PrefixShard.parse("FAD00-FADFF")
+    storage = PwnedStorage(resource_dir, 4, MockedPwnedRequester(), shard=shard)
+    await storage.update()
+    chunks = storage.export_snapshot()
+    first_chunk = next(chunks)
+    # Another storage instance stands for an update program in another process.
+    updater = PwnedStorage(resource_dir, 4, MockedPwnedRequester(), shard=shard)
+    update = asyncio.ensure_future(updater.update())
+    await asyncio.sleep(0.5)
+    assert not update.done()
+    archive = io.BytesIO(first_chunk + b"".join(chunks))
+    assert await update == UpdateResult.DONE
+
+    restored_storage = PwnedStorage(
+        join_paths(temp_dir, "exported-restored"), shard=shard
+    )
+    assert await restored_storage.restore(archive) == UpdateResult.DONE
+    assert await restored_storage.get_range("FADED") == (
+        MockedPwnedRequester().generate_range("FADED")
+    )
@@ -1,12 +1,14 @@
 import asyncio
+import threading
 
 import pytest
 
 from storage.auxiliary import hasher
 from storage.auxiliary.filetools import join_paths, make_empty_dir
+from storage.core.models.prefix_shard import PrefixShard
 from storage.core.models.revision import Revision
 from storage.implementations.mocked_requester import MockedPwnedRequester
-from storage.implementations.pwned_storage import PwnedStorage
+from storage.implementations.pwned_storage import PwnedStorage, UpdateResult
 from tests.shared import temp_dir
 
 
@@ -60,3 +62,132 @@ async def test_leak_check(updated_storage: PwnedStorage):
         not_expected_suffix = password_hash[5:]
         assert not_expected_suffix not in records1
         assert not_expected_suffix not in records2
+
+
+@pytest.mark.asyncio
+async def test_read_through(temp_dir: str):
+    resource_dir = join_paths(temp_dir, "read-through-storage")
+    make_empty_dir(resource_dir)
+    lazy_storage = PwnedStorage(
+        resource_dir, 1, MockedPwnedRequester(), MockedPwnedRequester()
+    )
+    assert lazy_storage.generation == 1
+    found_range = await lazy_storage.get_range("FADED")
+    assert found_range == await MockedPwnedRequester().get_range("FADED")
+    reopened_storage = PwnedStorage(resource_dir, 1, MockedPwnedRequester())
+    assert await reopened_storage.get_range("FADED") == found_range
+    with pytest.raises(FileNotFoundError):
+        await reopened_storage.get_range("BEEF0")
+
+
+class StuckProvider(MockedPwnedRequester):
+    def __init__(self):
+        super().__init__()
+        self.release = threading.Event()
+
+    async def get_range(self, hash_prefix: str) -> str:
+        while not self.release.is_set():
+            await asyncio.sleep(0.01)
+        return await super().get_range(hash_prefix)
+
+
+@pytest.mark.asyncio
+async def test_stuck_read_through(temp_dir: str, monkeypatch: pytest.MonkeyPatch):
+    resource_dir = join_paths(temp_dir, "stuck-read-through-storage")
+    make_empty_dir(resource_dir)
+    provider = StuckProvider()
+    lazy_storage = PwnedStorage(resource_dir, read_through_provider=provider)
+    await PwnedStorage(
+        resource_dir, read_through_provider=MockedPwnedRequester()
+    ).get_range("FADED")
+    stuck_reads = [
+        asyncio.ensure_future(lazy_storage.get_range(f"BEE{index:02X}"))
+        for index in range(PwnedStorage.DEFAULT_THREAD_NUMBER)
+    ]
+    # Stored ranges are read while the read-through provider is stuck.
+    found_range = await asyncio.wait_for(lazy_storage.get_range("FADED"), 10)
+    assert found_range == MockedPwnedRequester().generate_range("FADED")
+    assert not any(stuck_read.done() for stuck_read in stuck_reads)
+    provider.release.set()
+    await asyncio.gather(*stuck_reads)
+
+    monkeypatch.setattr(PwnedStorage, "READ_THROUGH_DEADLINE_SECONDS", 0.1)
+    provider.release.clear()
+    with pytest.raises(asyncio.TimeoutError):
+        await lazy_storage.get_range("BEEF0")
+
+
+@pytest.mark.asyncio
+async def test_concurrent_fill(temp_dir: str, monkeypatch: pytest.MonkeyPatch):
+    monkeypatch.setattr(PwnedStorage, "FILL_PAUSE_SECONDS", 0)
+    resource_dir = join_paths(temp_dir, "concurrently-filled-storage")
+    make_empty_dir(resource_dir)
+    shard = PrefixShard.parse("FADE0-FADEF")
+    lazy_storages = [
+        PwnedStorage(
+            resource_dir, read_through_provider=MockedPwnedRequester(), shard=shard
+        )
+        for _ in range(2)
+    ]
+    # The second process waits for the first one and finds the dataset complete.
+    results = await asyncio.gather(*[storage.fill() for storage in lazy_storages])
+    assert set(results) == {UpdateResult.DONE, UpdateResult.IRRELEVANT}
+    assert await lazy_storages[1].fill() == UpdateResult.IRRELEVANT
+
+
+@pytest.mark.asyncio
+async def test_state_refresh(temp_dir: str, monkeypatch: pytest.MonkeyPatch):
+    monkeypatch.setattr(PwnedStorage, "STATE_CHECK_INTERVAL_SECONDS", 0)
+    resource_dir = join_paths(temp_dir, "refreshed-storage")
+    make_empty_dir(resource_dir)
+    serving_storage = PwnedStorage(resource_dir)
+    assert serving_storage.active_dataset is None
+    lazy_storage = PwnedStorage(
+        resource_dir, read_through_provider=MockedPwnedRequester()
+    )
+    found_range = await lazy_storage.get_range("FADED")
+    assert serving_storage.active_dataset == "a"
+    assert serving_storage.generation == lazy_storage.generation
+    assert await serving_storage.get_range("FADED") == found_range
+
+
+@pytest.mark.asyncio
+async def test_warm_up(temp_dir: str):
+    resource_dir = join_paths(temp_dir, "warmed-up-storage")
+    storage = PwnedStorage(
+        resource_dir,
+        4,
+        MockedPwnedRequester(range_size=100),
+        shard=PrefixShard.parse("FAD00-FADFF"),
+        warm_up_bytes=16000,
+        warm_up_rate=1000000,
+    )
+    revisions = []
+
+    async def watch() -> None:
+        while storage.revision.status != Revision.Status.COMPLETED:
+            revisions.append(storage.revision)
+            await asyncio.sleep(0.05)
+
+    await asyncio.gather(storage.update(), watch())
+    warm_up_progress = [
+        revision.progress
+        for revision in revisions
+        if revision.status == Revision.Status.WARM_UP
+    ]
+    assert warm_up_progress and warm_up_progress == sorted(warm_up_progress)
+    assert 0 < warm_up_progress[-1] <= 100
+
+
+@pytest.mark.asyncio
+async def test_unthrottled_warm_up(temp_dir: str):
+    storage = PwnedStorage(
+        join_paths(temp_dir, "unthrottled-storage"),
+        4,
+        MockedPwnedRequester(range_size=100),
+        shard=PrefixShard.parse("FAD00-FADFF"),
+        warm_up_bytes=16000,
+        warm_up_rate=0,
+    )
+    await storage.update()
+    assert storage.revision.status == Revision.Status.COMPLETED
@@ -0,0 +1,54 @@
+import pytest
+
+from storage.auxiliary.filetools import is_file, join_paths, write
+from storage.core.models.prefix_shard import PrefixShard
+from storage.implementations.mocked_requester import MockedPwnedRequester
+from storage.implementations.pwned_storage import PwnedStorage
+from tests.shared import temp_dir
+
+
+@pytest.mark.asyncio
+async def test_trickle_refresh(temp_dir: str, monkeypatch: pytest.MonkeyPatch):
+    monkeypatch.setattr(PwnedStorage, "TRICKLE_BATCH_INTERVAL_SECONDS", 0)
+    monkeypatch.setattr(PwnedStorage, "STATE_CHECK_INTERVAL_SECONDS", 0)
+    resource_dir = join_paths(temp_dir, "trickle-storage")
+    shard = PrefixShard.parse("FAD00-FADFF")
+    storage = PwnedStorage(
+        resource_dir, 4, MockedPwnedRequester(), shard=shard, cache_size=16
+    )
+    await storage.update()
+    generation = storage.generation
+    serving_storage = PwnedStorage(resource_dir, cache_size=16)
+    old_range = await serving_storage.get_range("FAD10")
+    kept_range = await serving_storage.get_range("FADF0")
+    batches = []
+
+    def on_refreshed(prefix: str, amount: int) -> None:
+        batches.append((prefix, amount))
+
+    storage = PwnedStorage(
+        resource_dir, 4, MockedPwnedRequester(range_size=3), cache_size=16
+    )
+    # A replacement interrupted by a crash leaves its temporary file behind.
+    temp_path = join_paths(
+        resource_dir, f"hashes-{storage.active_dataset}", "FAD10.txt.1-1.tmp"
+    )
+    write(temp_path, "")
+    await storage.trickle_refresh(200, 1, on_refreshed)
+    assert not is_file(temp_path)
+    # Only the refreshed ranges are evicted from the caches of other processes.
+    new_range = await serving_storage.get_range("FAD10")
+    assert new_range != old_range
+    assert new_range == MockedPwnedRequester(range_size=3).generate_range("FAD10")
+    assert await serving_storage.get_range("FADF0") == kept_range
+    assert serving_storage.coalescing_statistics.read_number == 3
+
+    await storage.trickle_refresh(200, 1, on_refreshed)
+    assert batches == [("FADC7", 200), ("FAD8F", 56)]
+    assert storage.generation == generation + 2
+    assert serving_storage.generation == generation + 2
+    assert await serving_storage.get_range("FADF0") != kept_range
+
+    # The refresh continues from the stored position, unchanged ranges are kept.
+    await storage.trickle_refresh(100, 1)
+    assert storage.generation == generation + 2